@@ -8,11 +8,14 @@ optional LLM synthesis step with deterministic fallback.
 
 from __future__ import annotations
 
+import asyncio
 import logging
 import re
 from dataclasses import dataclass, field
 
-from app.config import MISTRAL_API_KEY, MISTRAL_MODEL, MISTRAL_FALLBACK_MODELS, MISTRAL_TEMPERATURE
+from app.config import (
+    AGENT_CONCURRENCY, MISTRAL_API_KEY, MISTRAL_MODEL, MISTRAL_FALLBACK_MODELS, MISTRAL_TEMPERATURE,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -100,16 +103,45 @@ def generate_subquestions(topic: str, max_subquestions: int = 5) -> list[str]:
 # ── Internal RAG query (no HTTP) ───────────────────────────────────────
 
 
-def _query_rag(question: str, top_k: int = 4, include_context: bool = False) -> dict:
-    """Call the existing /query pipeline internally and return a plain dict.
-
-    Reuses the FastAPI handler directly — no HTTP round-trip, no new deps.
+def _query_rag_many(
+    questions: list[str],
+    top_k: int = 4,
+    include_context: bool = False,
+) -> list[dict | Exception]:
+    """Answer *questions* through the /query logic as one batch.
+
+    Reuses the FastAPI handlers directly — no HTTP round-trip, no new deps.
+    Retrieval for all questions runs as one pass (one embedding batch, one
+    dense lookup per candidate-pool size, one BM25 scoring pass); only the
+    generation calls fan out, at most AGENT_CONCURRENCY at once, sharing
+    the process-wide Mistral rate limiter.  Results come back in input
+    order; a failed question yields its exception instead of a dict.
     """
-    from app.main import query as _query_fn, QueryRequest  # lazy to avoid circular
+    # The handlers are async; the agent runs on a worker thread with no loop.
+    return asyncio.run(_gather_queries(questions, top_k, include_context))
 
-    body = QueryRequest(question=question, top_k=top_k, include_context=include_context)
-    response = _query_fn(body)
-    return response.model_dump()
+
+async def _gather_queries(
+    questions: list[str],
+    top_k: int,
+    include_context: bool,
+) -> list[dict | Exception]:
+    from app.db.chroma import close_async_connections
+    from app.generation.llm import close_async_client
+    from app.main import query_many, QueryRequest  # lazy to avoid circular
+
+    bodies = [
+        QueryRequest(question=q, top_k=top_k, include_context=include_context)
+        for q in questions
+    ]
+    try:
+        responses = await query_many(bodies, concurrency=AGENT_CONCURRENCY)
+    except Exception as exc:  # noqa: BLE001
+        return [exc] * len(questions)
+    finally:
+        await close_async_client()        # this loop ends with asyncio.run
+        await close_async_connections()
+    return [r if isinstance(r, Exception) else r.model_dump() for r in responses]
 
 
 # ── Gap-driven retry ──────────────────────────────────────────────────
@@ -142,21 +174,24 @@ def _retry_gaps(
 ) -> None:
     """Single-retry pass: re-query each gap with a reformulated question.
 
-    Mutates *findings* and *gaps* in place.
+    All retries run concurrently.  Mutates *findings* and *gaps* in place.
     """
-    gap_indices = [i for i, f in enumerate(findings) if f.status == "gap"]
+    gap_findings = [f for f in findings if f.status == "gap"]
     resolved_gap_subs: set[str] = set()
+    if not gap_findings:
+        return
 
-    for idx in gap_indices:
-        finding = findings[idx]
-        rephrased = _reformulate(finding.subquestion)
-        finding.retried_subquestion = rephrased
+    for finding in gap_findings:
+        finding.retried_subquestion = _reformulate(finding.subquestion)
         finding.attempts = 2
 
-        try:
-            result = _query_rag(rephrased, top_k=top_k, include_context=include_context)
-        except Exception as exc:  # noqa: BLE001
-            logger.warning("Retry query failed for %r: %s", rephrased, exc)
+    results = _query_rag_many(
+        [f.retried_subquestion for f in gap_findings],
+        top_k=top_k, include_context=include_context,
+    )
+    for finding, result in zip(gap_findings, results):
+        if isinstance(result, Exception):
+            logger.warning("Retry query failed for %r: %s", finding.retried_subquestion, result)
             continue
 
         answer = result.get("answer")
@@ -276,11 +311,11 @@ def run_research(
     findings: list[Finding] = []
     gaps: list[Gap] = []
 
-    for sq in subquestions:
-        try:
-            result = _query_rag(sq, top_k=top_k, include_context=include_context)
-        except Exception as exc:  # noqa: BLE001
-            logger.warning("RAG query failed for sub-question %r: %s", sq, exc)
+    # Sub-questions run concurrently; findings keep sub-question order.
+    results = _query_rag_many(subquestions, top_k=top_k, include_context=include_context)
+    for sq, result in zip(subquestions, results):
+        if isinstance(result, Exception):
+            logger.warning("RAG query failed for sub-question %r: %s", sq, result)
             result = {"answer": None, "citations": []}
 
         answer = result.get("answer")
@@ -413,6 +448,8 @@ def _llm_synthesise(
     """Use Mistral to synthesise findings into a summary."""
     from openai import OpenAI  # type: ignore
 
+    from app.generation.llm import acquire_mistral_slot
+
     findings_text = "\n".join(
         f"Q: {f.subquestion}\nA: {f.answer}"
         for f in answered[:6]
@@ -429,6 +466,7 @@ def _llm_synthesise(
     models = [MISTRAL_MODEL] + [m for m in MISTRAL_FALLBACK_MODELS if m != MISTRAL_MODEL]
     for model in models:
         try:
+            acquire_mistral_slot()
             completion = client.chat.completions.create(
                 model=model,
                 messages=[
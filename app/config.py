@@ -19,22 +19,37 @@ CHROMA_DIR: str = os.getenv("CHROMA_DIR", str(PROJECT_ROOT / "chroma"))
 CHUNK_SIZE: int = int(os.getenv("CHUNK_SIZE", "800"))
 CHUNK_OVERLAP: int = int(os.getenv("CHUNK_OVERLAP", "120"))
 MIN_DOC_LENGTH: int = int(os.getenv("MIN_DOC_LENGTH", "200"))
+INGEST_BATCH_SIZE: int = max(1, int(os.getenv("INGEST_BATCH_SIZE", "256")))  # chunks per embed/upsert batch
+INGEST_LOAD_WORKERS: int = int(os.getenv("INGEST_LOAD_WORKERS", "1")) or (os.cpu_count() or 1)  # 0 = one per CPU
+INGEST_MANIFEST_ENABLED: bool = os.getenv("INGEST_MANIFEST_ENABLED", "true").lower() in ("true", "1", "yes")
+INGEST_MANIFEST_PATH: str = os.getenv(
+    "INGEST_MANIFEST_PATH", str(Path(CHROMA_DIR).parent / "ingest_manifest.json")
+)
 
 # ── Embeddings ─────────────────────────────────────────────────────────
 EMBEDDING_MODEL: str = os.getenv(
     "EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"
 )
+EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))  # 0 disables
 
 # ── ChromaDB ───────────────────────────────────────────────────────────
 CHROMA_COLLECTION: str = os.getenv("CHROMA_COLLECTION", "bedrock_docs")
 CHROMA_HOST: str = os.getenv("CHROMA_HOST", "")
 CHROMA_PORT: int = int(os.getenv("CHROMA_PORT", "8000"))
 CHROMA_SSL: bool = os.getenv("CHROMA_SSL", "false").lower() in ("true", "1", "yes")
+CHROMA_BATCH_SIZE_CAP: int = int(os.getenv("CHROMA_BATCH_SIZE_CAP", "5000"))  # upper bound on server max_batch_size
+CHROMA_UPSERT_CONCURRENCY: int = int(os.getenv("CHROMA_UPSERT_CONCURRENCY", "4"))  # in-flight batches (remote only)
+CHROMA_UPSERT_RETRIES: int = int(os.getenv("CHROMA_UPSERT_RETRIES", "3"))
 
 # ── Query / Retrieval ─────────────────────────────────────────────────
 TOP_K: int = int(os.getenv("TOP_K", "4"))
 MAX_CHUNKS_PER_DOC: int = int(os.getenv("MAX_CHUNKS_PER_DOC", "2"))
 NO_ANSWER_MIN_SCORE: float = float(os.getenv("NO_ANSWER_MIN_SCORE", "0.3"))
+# Threads for embedding / BM25 / rerank work offloaded from the async /query path
+QUERY_CPU_WORKERS: int = int(os.getenv("QUERY_CPU_WORKERS", "4"))
+# Deadline for the concurrent dense (Chroma) + BM25 retrieval arms; query
+# embedding runs before it starts (0 = off, wait for both arms)
+RETRIEVAL_DEADLINE_MS: int = int(os.getenv("RETRIEVAL_DEADLINE_MS", "0"))
 
 # ── LLM (Mistral) ─────────────────────────────────────────────────────
 MISTRAL_API_KEY: str = os.getenv("MISTRAL_API_KEY", "")
@@ -45,6 +60,12 @@ MISTRAL_FALLBACK_MODELS: list[str] = [
     for model in os.getenv("MISTRAL_FALLBACK_MODELS", "mistral-small-latest").split(",")
     if model.strip()
 ]
+# Process-wide cap on Mistral requests, for accounts with a low quota (0 = off)
+MISTRAL_RATE_LIMIT_RPS: float = float(os.getenv("MISTRAL_RATE_LIMIT_RPS", "0"))
+MISTRAL_RATE_LIMIT_BURST: int = int(os.getenv("MISTRAL_RATE_LIMIT_BURST", "5"))
+
+# ── Research Agent ────────────────────────────────────────────────────
+AGENT_CONCURRENCY: int = int(os.getenv("AGENT_CONCURRENCY", "4"))  # sub-questions in flight
 
 # ── Multi-Hop Retrieval ────────────────────────────────────────────────
 MULTIHOP_POOL_SIZE: int = int(os.getenv("MULTIHOP_POOL_SIZE", "32"))
@@ -57,6 +78,13 @@ MULTIHOP_KEYWORD_BOOST: float = float(os.getenv("MULTIHOP_KEYWORD_BOOST", "0.45"
 HYBRID_ENABLED: bool = os.getenv("HYBRID_ENABLED", "true").lower() in ("true", "1", "yes")
 HYBRID_VECTOR_WEIGHT: float = float(os.getenv("HYBRID_VECTOR_WEIGHT", "0.6"))
 HYBRID_KEYWORD_WEIGHT: float = float(os.getenv("HYBRID_KEYWORD_WEIGHT", "0.4"))
+BM25_BACKEND: str = os.getenv("BM25_BACKEND", "python")  # "python" | "sparse"
+BM25_SNAPSHOT_ENABLED: bool = os.getenv("BM25_SNAPSHOT_ENABLED", "true").lower() in ("true", "1", "yes")
+BM25_SNAPSHOT_PATH: str = os.getenv(
+    "BM25_SNAPSHOT_PATH", str(Path(CHROMA_DIR).parent / "bm25_snapshot.bin")
+)
+# Seconds after the last ingest before the snapshot is rewritten (0 = only at shutdown)
+BM25_SNAPSHOT_DELAY_SEC: float = float(os.getenv("BM25_SNAPSHOT_DELAY_SEC", "30"))
 
 # ── Reranking ──────────────────────────────────────────────────────────
 RERANK_ENABLED: bool = os.getenv("RERANK_ENABLED", "false").lower() in ("true", "1", "yes")
@@ -64,7 +92,27 @@ RERANK_PROVIDER: str = os.getenv("RERANK_PROVIDER", "local")  # "local" | "coher
 COHERE_API_KEY: str = os.getenv("COHERE_API_KEY", "")
 RERANK_MODEL: str = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
 RERANK_POOL_SIZE: int = int(os.getenv("RERANK_POOL_SIZE", "20"))
+RERANK_SCORE_CACHE_SIZE: int = int(os.getenv("RERANK_SCORE_CACHE_SIZE", "20000"))  # 0 disables
 
 # ── Query Cache ────────────────────────────────────────────────────────
 QUERY_CACHE_ENABLED: bool = os.getenv("QUERY_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
-QUERY_CACHE_TTL_SEC: int = int(os.getenv("QUERY_CACHE_TTL_SEC", "300"))
+# Re-ingest invalidates cached answers per changed doc, so the TTL can be long
+# (for every worker only with the sqlite backend; the memory backend is per process).
+QUERY_CACHE_TTL_SEC: int = int(os.getenv("QUERY_CACHE_TTL_SEC", "3600"))
+QUERY_CACHE_BACKEND: str = os.getenv("QUERY_CACHE_BACKEND", "memory")  # "memory" | "sqlite" (shared by workers)
+QUERY_CACHE_PATH: str = os.getenv(
+    "QUERY_CACHE_PATH", str(Path(CHROMA_DIR).parent / "query_cache.sqlite3")
+)
+QUERY_CACHE_MAX_ENTRIES: int = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "2048"))
+QUERY_CACHE_MAX_MB: int = int(os.getenv("QUERY_CACHE_MAX_MB", "64"))        # serialised responses
+QUERY_CACHE_SWEEP_SEC: int = int(os.getenv("QUERY_CACHE_SWEEP_SEC", "60"))  # 0 disables the sweeper
+# Opt-in: serve paraphrases from the cache when question embeddings are this similar
+# (cosine) and they agree on negation, numbers and names.
+SEMANTIC_CACHE_ENABLED: bool = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() in ("true", "1", "yes")
+SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+# Fused / reranked candidate pools, reused across top_k, include_context and /query/stream.
+RETRIEVAL_CACHE_ENABLED: bool = os.getenv("RETRIEVAL_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
+RETRIEVAL_CACHE_TTL_SEC: int = int(os.getenv("RETRIEVAL_CACHE_TTL_SEC", "3600"))
+RETRIEVAL_CACHE_MAX_ENTRIES: int = int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", "1024"))
+# Concurrent identical /query misses wait on one computation instead of each running it.
+QUERY_COALESCE_ENABLED: bool = os.getenv("QUERY_COALESCE_ENABLED", "true").lower() in ("true", "1", "yes")
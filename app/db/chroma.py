@@ -2,16 +2,25 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
+import random
 import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 
 import chromadb
+from chromadb.api import AsyncClientAPI
+from chromadb.api.models.AsyncCollection import AsyncCollection
 from chromadb.config import Settings
 
 from app.config import (
-    CHROMA_COLLECTION, CHROMA_DIR, CHROMA_HOST, CHROMA_PORT, CHROMA_SSL,
-    MAX_CHUNKS_PER_DOC, TOP_K,
+    CHROMA_BATCH_SIZE_CAP, CHROMA_COLLECTION, CHROMA_DIR, CHROMA_HOST, CHROMA_PORT,
+    CHROMA_SSL, CHROMA_UPSERT_CONCURRENCY, CHROMA_UPSERT_RETRIES, MAX_CHUNKS_PER_DOC,
+    TOP_K,
 )
 from app.ingest.chunker import Chunk
 from app.retrieval.detection import is_list_style, is_multihop
@@ -19,6 +28,12 @@ from app.retrieval.detection import is_list_style, is_multihop
 logger = logging.getLogger(__name__)
 
 _client: chromadb.ClientAPI | None = None
+_async_client: AsyncClientAPI | None = None
+_max_batch_size: int | None = None
+
+_FALLBACK_BATCH_SIZE = 500
+_STALE_LOOKUP_DOCS = 500  # doc_ids per ``$in`` lookup
+_RETRY_BACKOFF_SEC = 0.5  # doubled per attempt, with jitter
 
 _BOILERPLATE_HINTS = (
     "table of contents",
@@ -39,6 +54,51 @@ _QUERY_STOPWORDS = frozenset(
 )
 
 
+class UpsertMetrics:
+    """Per-batch upsert timings (recent window) plus retry/failure counters."""
+
+    def __init__(self, window: int = 1000) -> None:
+        self._timings_ms: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._records = 0
+        self._retries = 0
+        self._failures = 0
+
+    def record_batch(self, records: int, seconds: float) -> None:
+        with self._lock:
+            self._batches += 1
+            self._records += records
+            self._timings_ms.append(seconds * 1000)
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self._retries += 1
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+
+    def stats(self) -> dict:
+        """Return counters and batch latency percentiles (ms)."""
+        with self._lock:
+            timings = sorted(self._timings_ms)
+            data = {
+                "batches": self._batches,
+                "records": self._records,
+                "retries": self._retries,
+                "failures": self._failures,
+            }
+        if timings:
+            data["batch_ms_p50"] = round(timings[len(timings) // 2], 2)
+            data["batch_ms_p95"] = round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2)
+            data["batch_ms_max"] = round(timings[-1], 2)
+        return data
+
+
+upsert_metrics = UpsertMetrics()
+
+
 @dataclass
 class RetrievedChunk:
     """A retrieved chunk with similarity score."""
@@ -83,65 +143,212 @@ def get_collection() -> chromadb.Collection:
     )
 
 
+async def get_async_collection() -> AsyncCollection:
+    """Get (or create) the default collection through the async HTTP client.
+
+    Only available with ``CHROMA_HOST``; the embedded PersistentClient has
+    no async API.  The client keeps one HTTP connection pool per event loop;
+    :func:`close_async_connections` releases the running loop's pool.
+    """
+    global _async_client  # noqa: PLW0603
+    if not CHROMA_HOST:
+        raise RuntimeError("Async Chroma client requires CHROMA_HOST")
+    if _async_client is None:
+        logger.info("Initialising ChromaDB async HTTP client at %s:%d", CHROMA_HOST, CHROMA_PORT)
+        _async_client = await chromadb.AsyncHttpClient(
+            host=CHROMA_HOST,
+            port=CHROMA_PORT,
+            ssl=CHROMA_SSL,
+            settings=Settings(anonymized_telemetry=False),
+        )
+    return await _async_client.get_or_create_collection(
+        name=CHROMA_COLLECTION,
+        metadata={"hnsw:space": "cosine"},
+    )
+
+
+async def close_async_connections() -> None:
+    """Close the async client's HTTP connection pool for the running loop.
+
+    Chroma's ``AsyncHttpClient`` opens one pool per event loop (keyed by
+    the loop's hash) and never closes them.  Callers that run a short-lived
+    loop (``asyncio.run``) await this before the loop ends, so the pool is
+    released and a later loop that happens to reuse the hash gets a fresh
+    one.  Pools of other loops are left alone.
+    """
+    if _async_client is None:
+        return
+    from chromadb.api.async_fastapi import AsyncFastAPI
+
+    pools = getattr(AsyncFastAPI, "_clients", None)
+    if pools is None:
+        return
+    pool = pools.pop(hash(asyncio.get_running_loop()), None)
+    if pool is not None:
+        await pool.aclose()
+
+
+def get_max_batch_size() -> int:
+    """Records per add/upsert/delete call: the server's limit, capped.
+
+    Chroma reports ``max_batch_size`` (SQLite-bound, ~40k locally); the
+    cap keeps HTTP request bodies reasonable.  Falls back to a
+    conservative default when the server cannot be asked.
+    """
+    global _max_batch_size  # noqa: PLW0603
+    if _max_batch_size is None:
+        try:
+            size = get_client().get_max_batch_size()
+        except Exception:  # noqa: BLE001
+            return min(_FALLBACK_BATCH_SIZE, CHROMA_BATCH_SIZE_CAP)
+        if not isinstance(size, int) or size <= 0:
+            return min(_FALLBACK_BATCH_SIZE, CHROMA_BATCH_SIZE_CAP)
+        _max_batch_size = max(1, min(size, CHROMA_BATCH_SIZE_CAP))
+    return _max_batch_size
+
+
+def find_stale_chunk_ids(chunks: list[Chunk]) -> list[str]:
+    """Return stored chunk IDs of the given docs that *chunks* no longer produce.
+
+    Re-ingesting a doc with a new chunking config can shrink its chunk count;
+    the leftover IDs are stale and must be removed from every index.  All
+    affected docs are looked up with ``doc_id $in [...]`` queries of
+    :data:`_STALE_LOOKUP_DOCS` docs each instead of one query per doc.
+    """
+    collection = get_collection()
+    doc_to_new_ids: dict[str, set[str]] = {}
+    for c in chunks:
+        doc_to_new_ids.setdefault(c.doc_id, set()).add(c.chunk_id)
+
+    doc_ids = list(doc_to_new_ids)
+    stale_ids: list[str] = []
+    for i in range(0, len(doc_ids), _STALE_LOOKUP_DOCS):
+        group = doc_ids[i : i + _STALE_LOOKUP_DOCS]
+        try:
+            existing = collection.get(where={"doc_id": {"$in": group}}, include=["metadatas"])
+        except Exception:  # noqa: BLE001
+            # Continue with upsert even if stale lookup fails for these docs.
+            continue
+        ids = existing.get("ids") or []
+        metadatas = existing.get("metadatas") or []
+        for cid, meta in zip(ids, metadatas):
+            new_ids = doc_to_new_ids.get((meta or {}).get("doc_id"))
+            if new_ids is not None and cid not in new_ids:
+                stale_ids.append(cid)
+    return stale_ids
+
+
+def delete_chunk_ids(ids: list[str]) -> int:
+    """Delete *ids* in server-sized batches. Returns the number requested."""
+    if not ids:
+        return 0
+    collection = get_collection()
+    batch_size = get_max_batch_size()
+    for i in range(0, len(ids), batch_size):
+        collection.delete(ids=ids[i : i + batch_size])
+    return len(ids)
+
+
 def upsert_chunks(
     chunks: list[Chunk],
     embeddings: list[list[float]],
+    stale_ids: list[str] | None = None,
 ) -> int:
     """Upsert chunks + embeddings into ChromaDB.
 
     Also deletes stale chunk IDs for ingested docs so re-ingestion with a new
-    chunking config stays idempotent (no orphaned old chunks).
+    chunking config stays idempotent (no orphaned old chunks).  Pass
+    *stale_ids* when the caller already computed the diff with
+    :func:`find_stale_chunk_ids`.
     """
     collection = get_collection()
-    if not chunks:
-        return 0
 
-    # Remove stale chunks per doc_id before upsert.
-    doc_to_new_ids: dict[str, set[str]] = {}
-    for c in chunks:
-        doc_to_new_ids.setdefault(c.doc_id, set()).add(c.chunk_id)
-
-    for doc_id, new_ids in doc_to_new_ids.items():
+    # Remove stale chunks of the ingested docs before upsert.
+    if stale_ids is None:
+        stale_ids = find_stale_chunk_ids(chunks) if chunks else []
+    if stale_ids:
         try:
-            existing = collection.get(where={"doc_id": doc_id}, include=[])
-            existing_ids = set(existing.get("ids", []) or [])
-            stale_ids = [cid for cid in existing_ids if cid not in new_ids]
-            if stale_ids:
-                collection.delete(ids=stale_ids)
+            delete_chunk_ids(stale_ids)
         except Exception:  # noqa: BLE001
-            # Continue with upsert even if stale cleanup fails for a doc.
+            # Continue with upsert even if stale cleanup fails.
             pass
 
-    # ChromaDB allows batches up to ~5 000; we batch at 500 for safety.
-    batch_size = 500
-    total = 0
-
-    for i in range(0, len(chunks), batch_size):
-        batch_chunks = chunks[i : i + batch_size]
-        batch_embeds = embeddings[i : i + batch_size]
-
-        ids = [c.chunk_id for c in batch_chunks]
-        documents = [c.text for c in batch_chunks]
-        metadatas = [
-            {
-                "doc_id": c.doc_id,
-                "chunk_id": c.chunk_id,
-                "source_path": c.source_path,
-                "content_type": c.content_type,
-                "chunk_index": c.chunk_index,
-            }
-            for c in batch_chunks
-        ]
-
-        collection.upsert(
-            ids=ids,
-            documents=documents,
-            embeddings=batch_embeds,
-            metadatas=metadatas,
-        )
-        total += len(batch_chunks)
+    if not chunks:
+        return 0
+
+    batch_size = get_max_batch_size()
+    batches = [
+        (chunks[i : i + batch_size], embeddings[i : i + batch_size])
+        for i in range(0, len(chunks), batch_size)
+    ]
+    workers = min(upsert_concurrency(), len(batches))
+    if workers <= 1:
+        for batch_chunks, batch_embeds in batches:
+            _upsert_batch(collection, batch_chunks, batch_embeds)
+    else:
+        # Pipelined: up to *workers* batches in flight against the server.
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chroma-upsert") as pool:
+            futures = [
+                pool.submit(_upsert_batch, collection, batch_chunks, batch_embeds)
+                for batch_chunks, batch_embeds in batches
+            ]
+            for future in futures:
+                future.result()
+
+    return len(chunks)
+
+
+def upsert_concurrency() -> int:
+    """Upsert batches allowed in flight: pipelined only for a remote server.
+
+    A local PersistentClient serialises writes on SQLite anyway, so there
+    concurrency would only add contention.
+    """
+    return max(1, CHROMA_UPSERT_CONCURRENCY) if CHROMA_HOST else 1
+
+
+def _upsert_batch(
+    collection: chromadb.Collection,
+    batch_chunks: list[Chunk],
+    batch_embeds: list[list[float]],
+) -> None:
+    """Upsert one batch, retrying with exponential backoff on failure."""
+    ids = [c.chunk_id for c in batch_chunks]
+    documents = [c.text for c in batch_chunks]
+    metadatas = [
+        {
+            "doc_id": c.doc_id,
+            "chunk_id": c.chunk_id,
+            "source_path": c.source_path,
+            "content_type": c.content_type,
+            "chunk_index": c.chunk_index,
+        }
+        for c in batch_chunks
+    ]
 
-    return total
+    for attempt in range(CHROMA_UPSERT_RETRIES + 1):
+        t0 = time.perf_counter()
+        try:
+            collection.upsert(
+                ids=ids,
+                documents=documents,
+                embeddings=batch_embeds,
+                metadatas=metadatas,
+            )
+        except Exception as exc:
+            if attempt >= CHROMA_UPSERT_RETRIES:
+                upsert_metrics.record_failure()
+                raise
+            delay = _RETRY_BACKOFF_SEC * (2 ** attempt) * (1 + random.random() / 2)
+            logger.warning(
+                "Upsert of %d chunks failed (%s); retry %d/%d in %.1fs",
+                len(ids), exc, attempt + 1, CHROMA_UPSERT_RETRIES, delay,
+            )
+            upsert_metrics.record_retry()
+            time.sleep(delay)
+            continue
+        upsert_metrics.record_batch(len(ids), time.perf_counter() - t0)
+        return
 
 
 def heartbeat() -> bool:
@@ -196,30 +403,107 @@ def query_chunks(
     Returns up to *top_k* chunks, re-ranked to ensure diversity across docs.
     Scores are cosine distances (lower = more similar); we convert to similarity.
     """
+    return query_chunks_many(
+        [query_embedding], top_k=top_k, max_per_doc=max_per_doc, questions=[question],
+    )[0]
+
+
+def query_chunks_many(
+    query_embeddings: list[list[float]],
+    top_k: int = TOP_K,
+    max_per_doc: int = MAX_CHUNKS_PER_DOC,
+    questions: list[str] | None = None,
+) -> list[list[RetrievedChunk]]:
+    """Run :func:`query_chunks` for several embeddings in one Chroma round-trip.
+
+    ``questions[i]`` is the query text behind ``query_embeddings[i]``; it
+    drives the per-query fetch size, lexical adjustment and diversity rules.
+    Returns one result list per embedding, in input order.
+    """
+    if not query_embeddings:
+        return []
+    if questions is None:
+        questions = [""] * len(query_embeddings)
+    fetch_ks = [_fetch_k(top_k, question) for question in questions]
+
     collection = get_collection()
+    results = collection.query(
+        query_embeddings=list(query_embeddings),
+        n_results=max(fetch_ks),
+    )
+    return _runs_from_results(results, questions, fetch_ks, top_k, max_per_doc)
 
-    # Fetch more than top_k to allow for diversity and filtering.
+
+async def query_chunks_many_async(
+    query_embeddings: list[list[float]],
+    top_k: int = TOP_K,
+    max_per_doc: int = MAX_CHUNKS_PER_DOC,
+    questions: list[str] | None = None,
+) -> list[list[RetrievedChunk]]:
+    """:func:`query_chunks_many` over the async HTTP client (remote Chroma only)."""
+    if not query_embeddings:
+        return []
+    if questions is None:
+        questions = [""] * len(query_embeddings)
+    fetch_ks = [_fetch_k(top_k, question) for question in questions]
+
+    collection = await get_async_collection()
+    results = await collection.query(
+        query_embeddings=list(query_embeddings),
+        n_results=max(fetch_ks),
+    )
+    return _runs_from_results(results, questions, fetch_ks, top_k, max_per_doc)
+
+
+def _runs_from_results(
+    results: dict,
+    questions: list[str],
+    fetch_ks: list[int],
+    top_k: int,
+    max_per_doc: int,
+) -> list[list[RetrievedChunk]]:
+    runs: list[list[RetrievedChunk]] = []
+    for i, (question, fetch_k) in enumerate(zip(questions, fetch_ks)):
+        if not results["ids"] or i >= len(results["ids"]) or not results["ids"][i]:
+            runs.append([])
+            continue
+        # Results are distance-ordered, so trimming to this query's own
+        # fetch size reproduces what a dedicated query would have returned.
+        runs.append(_select_chunks(
+            results["ids"][i][:fetch_k],
+            results["documents"][i][:fetch_k],
+            results["metadatas"][i][:fetch_k],
+            results["distances"][i][:fetch_k],
+            question=question,
+            top_k=top_k,
+            max_per_doc=max_per_doc,
+        ))
+    return runs
+
+
+def _fetch_k(top_k: int, question: str) -> int:
+    """Candidates to fetch for *question*, leaving room for diversity/filtering."""
     fetch_k = max(top_k * 4, 24)
-    multi_hop_query = is_multihop(question)
-    list_style_query = is_list_style(question)
-    if multi_hop_query:
+    if is_multihop(question):
         fetch_k = max(fetch_k, top_k * 10, 60)
-    if list_style_query:
+    if is_list_style(question):
         # List-style prompts often need multiple adjacent chunks from one doc.
         fetch_k = max(fetch_k, top_k * 8, 48)
+    return fetch_k
 
-    results = collection.query(
-        query_embeddings=[query_embedding],
-        n_results=fetch_k,
-    )
-
-    if not results["ids"] or not results["ids"][0]:
-        return []
 
-    ids = results["ids"][0]
-    documents = results["documents"][0]
-    metadatas = results["metadatas"][0]
-    distances = results["distances"][0]
+def _select_chunks(
+    ids: list[str],
+    documents: list[str],
+    metadatas: list[dict],
+    distances: list[float],
+    question: str,
+    top_k: int,
+    max_per_doc: int,
+) -> list[RetrievedChunk]:
+    """Filter, re-score, diversify and balance one query's raw results."""
+    multi_hop_query = is_multihop(question)
+    list_style_query = is_list_style(question)
 
     # Build candidate list with similarity scores (1 - distance for cosine)
     candidates = [
@@ -0,0 +1,153 @@
+"""Dedicated executors for blocking work on the query path.
+
+Embedding, BM25 scoring, reranking and embedded-Chroma lookups block the
+calling thread.  The async ``/query`` handler runs them on the CPU executor
+instead of on the event loop (which would stall every in-flight request)
+or on the AnyIO threadpool (which sync endpoints share and can exhaust).
+
+The retrieval arms (dense and BM25) of one request run concurrently under
+a deadline via :func:`gather_arms` (async callers) or :func:`run_arms`
+(sync callers such as multi-hop retrieval, which itself already runs on
+the CPU executor and therefore submits to a separate arm pool).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import functools
+import logging
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, TypeVar
+
+from app.config import QUERY_CPU_WORKERS
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+_executor: ThreadPoolExecutor | None = None
+_arm_executor: ThreadPoolExecutor | None = None
+_lock = threading.Lock()
+
+
+def get_cpu_executor() -> ThreadPoolExecutor:
+    """Return the process-wide CPU executor (created on first use)."""
+    global _executor  # noqa: PLW0603
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, QUERY_CPU_WORKERS), thread_name_prefix="query-cpu",
+            )
+        return _executor
+
+
+async def run_cpu(fn: Callable[..., T], /, *args, **kwargs) -> T:
+    """Await ``fn(*args, **kwargs)`` executed on the CPU executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_cpu_executor(), functools.partial(fn, *args, **kwargs))
+
+
+def shutdown_cpu_executor() -> None:
+    """Stop the executors; the next call starts fresh ones."""
+    global _executor, _arm_executor  # noqa: PLW0603
+    with _lock:
+        for pool in (_executor, _arm_executor):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        _executor = _arm_executor = None
+
+
+# ── Concurrent retrieval arms ──────────────────────────────────────────
+
+
+@dataclass
+class ArmResults:
+    """Outcome of running several retrieval arms side by side."""
+
+    results: dict[str, Any] = field(default_factory=dict)
+    timings_ms: dict[str, float] = field(default_factory=dict)
+    timed_out: list[str] = field(default_factory=list)
+    wall_ms: float = 0.0
+
+    @property
+    def saved_ms(self) -> float:
+        """Latency saved versus running the finished arms one after another."""
+        return round(max(0.0, sum(self.timings_ms.values()) - self.wall_ms), 2)
+
+
+async def gather_arms(
+    arms: dict[str, Awaitable[Any]],
+    deadline_sec: float | None = None,
+) -> ArmResults:
+    """Await *arms* concurrently; arms unfinished at the deadline are dropped.
+
+    An arm that raises re-raises here, as it would have when run inline.
+    """
+    async def _timed(aw: Awaitable[Any]) -> tuple[Any, float]:
+        t0 = time.perf_counter()
+        value = await aw
+        return value, (time.perf_counter() - t0) * 1000
+
+    if not arms:
+        return ArmResults()
+    t0 = time.perf_counter()
+    tasks = {name: asyncio.ensure_future(_timed(aw)) for name, aw in arms.items()}
+    await asyncio.wait(tasks.values(), timeout=deadline_sec)
+    out = ArmResults(wall_ms=round((time.perf_counter() - t0) * 1000, 2))
+    for name, task in tasks.items():
+        if not task.done():
+            task.cancel()
+            out.timed_out.append(name)
+            continue
+        value, ms = task.result()
+        out.results[name] = value
+        out.timings_ms[name] = round(ms, 2)
+    if out.timed_out:
+        logger.warning("Retrieval arms missed the %.2fs deadline: %s", deadline_sec, out.timed_out)
+    return out
+
+
+def run_arms(
+    arms: dict[str, Callable[[], Any]],
+    deadline_sec: float | None = None,
+) -> ArmResults:
+    """Sync :func:`gather_arms`: run the callables on the arm pool.
+
+    A timed-out arm keeps running in its thread; only its result is dropped.
+    """
+    def _timed(fn: Callable[[], Any]) -> tuple[Any, float]:
+        t0 = time.perf_counter()
+        value = fn()
+        return value, (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    pool = _get_arm_executor()
+    futures = {name: pool.submit(_timed, fn) for name, fn in arms.items()}
+    concurrent.futures.wait(futures.values(), timeout=deadline_sec)
+    out = ArmResults(wall_ms=round((time.perf_counter() - t0) * 1000, 2))
+    for name, future in futures.items():
+        if not future.done():
+            future.cancel()
+            out.timed_out.append(name)
+            continue
+        value, ms = future.result()
+        out.results[name] = value
+        out.timings_ms[name] = round(ms, 2)
+    if out.timed_out:
+        logger.warning("Retrieval arms missed the %.2fs deadline: %s", deadline_sec, out.timed_out)
+    return out
+
+
+def _get_arm_executor() -> ThreadPoolExecutor:
+    global _arm_executor  # noqa: PLW0603
+    with _lock:
+        if _arm_executor is None:
+            _arm_executor = ThreadPoolExecutor(
+                max_workers=max(2, 2 * QUERY_CPU_WORKERS), thread_name_prefix="retrieval-arm",
+            )
+        return _arm_executor
@@ -2,15 +2,30 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
 import re
+import weakref
 from dataclasses import dataclass
 
-from app.config import MISTRAL_API_KEY, MISTRAL_FALLBACK_MODELS, MISTRAL_MODEL, MISTRAL_TEMPERATURE
+from app.config import (
+    MISTRAL_API_KEY, MISTRAL_FALLBACK_MODELS, MISTRAL_MODEL, MISTRAL_RATE_LIMIT_BURST,
+    MISTRAL_RATE_LIMIT_RPS, MISTRAL_TEMPERATURE,
+)
 from app.db.chroma import RetrievedChunk
+from app.generation.ratelimit import RateLimiter
 
 logger = logging.getLogger(__name__)
 
+_async_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()  # loop → AsyncOpenAI
+
+# Shared by every Mistral generation in the process (query, stream, agent);
+# the readiness probe bypasses it.  Off unless MISTRAL_RATE_LIMIT_RPS > 0.
+mistral_limiter: RateLimiter | None = (
+    RateLimiter(MISTRAL_RATE_LIMIT_RPS, burst=MISTRAL_RATE_LIMIT_BURST)
+    if MISTRAL_RATE_LIMIT_RPS > 0 else None
+)
+
 
 @dataclass
 class Citation:
@@ -170,24 +185,26 @@ def check_llm_ready() -> dict:
         return {"ready": False, "reason": f"Mistral API probe failed: {exc}"}
 
 
-def generate_answer(
+async def generate_answer_async(
     question: str,
     contexts: list[RetrievedChunk],
 ) -> GeneratedAnswer:
-    """Generate an answer using Mistral LLM (or fallback if unavailable)."""
+    """Generate an answer using Mistral LLM (or fallback if unavailable).
+
+    Awaits Mistral without holding a thread.
+    """
     if not is_llm_available():
         return _fallback_answer(contexts)
 
     try:
-        from openai import OpenAI  # type: ignore
-
-        client = OpenAI(api_key=MISTRAL_API_KEY, base_url="https://api.mistral.ai/v1")
+        client = _get_async_client()
         user_prompt = _build_user_prompt(question, contexts)
         last_exc: Exception | None = None
 
         for model in _candidate_models():
             try:
-                completion = client.chat.completions.create(
+                await acquire_mistral_slot_async()
+                completion = await client.chat.completions.create(
                     model=model,
                     messages=[
                         {"role": "system", "content": SYSTEM_PROMPT},
@@ -196,23 +213,7 @@ def generate_answer(
                     temperature=MISTRAL_TEMPERATURE,
                     max_tokens=1024,
                 )
-
-                answer = (completion.choices[0].message.content or "").strip()
-                if not answer:
-                    answer = "I don't know based on the provided documents."
-
-                # If model says it doesn't know, comply with API contract
-                if _is_unknown_answer(answer):
-                    return GeneratedAnswer(answer=None, citations=[])
-
-                citations = _extract_citations(answer, contexts)
-
-                # Let caller apply citation fallback if model omitted markers.
-                if not citations:
-                    logger.info("LLM answer had no [Chunk N] markers; returning answer without citations")
-                    return GeneratedAnswer(answer=answer, citations=[])
-
-                return GeneratedAnswer(answer=answer, citations=citations)
+                return _to_generated_answer(completion.choices[0].message.content, contexts)
             except Exception as exc:  # noqa: BLE001
                 last_exc = exc
                 logger.warning("LLM generation failed for model %s: %s", model, exc)
@@ -225,6 +226,66 @@ def generate_answer(
         return _fallback_answer(contexts)
 
 
+def acquire_mistral_slot() -> None:
+    """Block until the shared Mistral rate limit allows one more request."""
+    if mistral_limiter is not None:
+        mistral_limiter.acquire()
+
+
+async def acquire_mistral_slot_async() -> None:
+    """Async :func:`acquire_mistral_slot`."""
+    if mistral_limiter is not None:
+        await mistral_limiter.acquire_async()
+
+
+def _get_async_client():
+    """Shared AsyncOpenAI client for the running event loop.
+
+    Its connection pool is bound to the loop it was first used on, so one
+    client is kept per loop (the app loop, plus short-lived loops of sync
+    callers such as the research agent).
+    """
+    from openai import AsyncOpenAI  # type: ignore
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = AsyncOpenAI(api_key=MISTRAL_API_KEY, base_url="https://api.mistral.ai/v1")
+        _async_clients[loop] = client
+    return client
+
+
+async def close_async_client() -> None:
+    """Close the running loop's client, if any.
+
+    Callers that run a short-lived loop (``asyncio.run``) await this before
+    the loop ends so its connection pool is released, not left for GC.
+    """
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
+def _to_generated_answer(content: str | None, contexts: list[RetrievedChunk]) -> GeneratedAnswer:
+    """Apply the answer contract to raw completion text."""
+    answer = (content or "").strip()
+    if not answer:
+        answer = "I don't know based on the provided documents."
+
+    # If model says it doesn't know, comply with API contract
+    if _is_unknown_answer(answer):
+        return GeneratedAnswer(answer=None, citations=[])
+
+    citations = _extract_citations(answer, contexts)
+
+    # Let caller apply citation fallback if model omitted markers.
+    if not citations:
+        logger.info("LLM answer had no [Chunk N] markers; returning answer without citations")
+        return GeneratedAnswer(answer=answer, citations=[])
+
+    return GeneratedAnswer(answer=answer, citations=citations)
+
+
 def generate_answer_stream(
     question: str,
     contexts: list[RetrievedChunk],
@@ -247,6 +308,7 @@ def generate_answer_stream(
 
         for model in _candidate_models():
             try:
+                acquire_mistral_slot()
                 stream = client.chat.completions.create(
                     model=model,
                     messages=[
@@ -0,0 +1,54 @@
+"""Token-bucket rate limiter shared by sync and async Mistral callers.
+
+One limiter instance guards every Mistral request in the process: the
+async ``/query`` path, the blocking stream call and the
+research agent, which runs its own event loop on a worker thread.  The
+bucket therefore uses a thread lock rather than asyncio primitives, and
+callers sleep outside the lock.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+
+class RateLimiter:
+    """Allow *rate_per_sec* requests on average with bursts up to *burst*."""
+
+    def __init__(self, rate_per_sec: float, burst: int = 1) -> None:
+        if rate_per_sec <= 0:
+            raise ValueError("rate_per_sec must be positive")
+        self._rate = rate_per_sec
+        self._burst = max(1, burst)
+        self._tokens = float(self._burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._waits = 0
+
+    def _reserve(self) -> float:
+        """Take one token (possibly borrowed) and return the seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            self._waits += 1
+            return -self._tokens / self._rate
+
+    def acquire(self) -> None:
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def acquire_async(self) -> None:
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"rate_per_sec": self._rate, "burst": self._burst, "throttled": self._waits}
@@ -1,11 +1,22 @@
-"""Thin wrapper around sentence-transformers for embedding."""
+"""Thin wrapper around sentence-transformers for embedding.
+
+Vectors are memoised in a bounded LRU keyed by ``EMBEDDING_MODEL`` plus the
+whitespace-normalised text, so repeated sub-queries and unchanged chunks
+are never re-encoded.  Entries are stored as float32 numpy rows.
+"""
 
 from __future__ import annotations
 
+import hashlib
 import logging
+import threading
+import unicodedata
+from collections import OrderedDict
 from typing import TYPE_CHECKING
 
-from app.config import EMBEDDING_MODEL
+import numpy as np
+
+from app.config import EMBEDDING_CACHE_SIZE, EMBEDDING_MODEL
 
 if TYPE_CHECKING:
     from sentence_transformers import SentenceTransformer
@@ -27,8 +38,112 @@ def get_model() -> SentenceTransformer:
     return _model
 
 
-def embed_texts(texts: list[str]) -> list[list[float]]:
-    """Return L2-normalised embeddings for a list of strings."""
+# ── Embedding cache ───────────────────────────────────────────────────
+
+
+class EmbeddingCache:
+    """Thread-safe LRU of float32 embedding vectors."""
+
+    def __init__(self, max_entries: int = 10_000) -> None:
+        self._entries: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        normalised = " ".join(unicodedata.normalize("NFC", text).split())
+        return hashlib.sha256(f"{model}\0{normalised}".encode()).hexdigest()
+
+    def get(self, key: str) -> np.ndarray | None:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return vector
+
+    def set(self, key: str, vector: np.ndarray) -> None:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._entries[key] = vector
+            self._bytes += vector.nbytes
+            while len(self._entries) > self._max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self._evictions += 1
+
+    def clear(self) -> int:
+        """Remove all entries. Returns the number removed."""
+        with self._lock:
+            n = len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+            return n
+
+    def stats(self) -> dict:
+        """Return cache statistics."""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_entries": self._max_entries,
+                "bytes": self._bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+
+
+_cache: EmbeddingCache | None = (
+    EmbeddingCache(EMBEDDING_CACHE_SIZE) if EMBEDDING_CACHE_SIZE > 0 else None
+)
+
+
+def get_embedding_cache() -> EmbeddingCache | None:
+    """Return the process-wide embedding cache (``None`` when disabled)."""
+    return _cache
+
+
+def _encode(texts: list[str]) -> np.ndarray:
     model = get_model()
-    embeddings = model.encode(texts, normalize_embeddings=True, show_progress_bar=False)
-    return embeddings.tolist()
+    return model.encode(texts, normalize_embeddings=True, show_progress_bar=False)
+
+
+def embed_texts(texts: list[str]) -> list[list[float]]:
+    """Return L2-normalised embeddings for a list of strings.
+
+    Cached texts are served from the LRU; the rest (deduplicated) are
+    encoded in one batch and added to it.
+    """
+    cache = _cache
+    if cache is None:
+        return _encode(texts).tolist()
+    if not texts:
+        return []
+
+    keys = [cache.make_key(EMBEDDING_MODEL, t) for t in texts]
+    vectors: list[np.ndarray | None] = [cache.get(k) for k in keys]
+
+    # First position of every distinct uncached text.
+    missing: dict[str, int] = {}
+    for i, (key, vector) in enumerate(zip(keys, vectors)):
+        if vector is None and key not in missing:
+            missing[key] = i
+
+    if missing:
+        encoded = _encode([texts[i] for i in missing.values()])
+        fresh: dict[str, np.ndarray] = {}
+        for key, row in zip(missing, encoded):
+            vector = np.array(row, dtype=np.float32)
+            cache.set(key, vector)
+            fresh[key] = vector
+        vectors = [fresh[k] if v is None else v for k, v in zip(keys, vectors)]
+
+    return [v.tolist() for v in vectors]
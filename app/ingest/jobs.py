@@ -0,0 +1,113 @@
+"""Background ingest jobs.
+
+Jobs run one at a time on a dedicated thread, so a long ingest never holds
+one of the request-serving workers and two ingests never race on the
+collection, the BM25 index or the manifest.  Cancellation is cooperative:
+the pipeline checks :attr:`IngestJob.cancel_event` between batches, so
+everything stored so far stays consistent.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from app.ingest.pipeline import IngestProgress
+
+logger = logging.getLogger(__name__)
+
+MAX_JOBS_KEPT = 50  # finished jobs retained for status lookups
+
+
+@dataclass
+class IngestJob:
+    """One submitted ingest run."""
+
+    job_id: str
+    path: str
+    progress: IngestProgress = field(default_factory=IngestProgress)
+    cancel_event: threading.Event = field(default_factory=threading.Event)
+    future: Future | None = None
+    result: dict | None = None
+    error: str | None = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def snapshot(self) -> dict:
+        """Status dict for ``GET /ingest/{job_id}``."""
+        return {
+            "job_id": self.job_id,
+            "path": self.path,
+            **self.progress.snapshot(),
+            "cancel_requested": self.cancelled,
+            "error": self.error,
+            "result": self.result,
+        }
+
+
+class IngestJobManager:
+    """Queue of ingest jobs executed serially on one background thread."""
+
+    def __init__(self, max_jobs_kept: int = MAX_JOBS_KEPT) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest")
+        self._jobs: OrderedDict[str, IngestJob] = OrderedDict()
+        self._max_jobs_kept = max_jobs_kept
+        self._lock = threading.Lock()
+
+    def submit(self, path: str, run: Callable[[IngestJob], dict]) -> IngestJob:
+        """Queue ``run(job)``; its return value becomes ``job.result``."""
+        job = IngestJob(job_id=uuid.uuid4().hex, path=path)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._trim_locked()
+            job.future = self._executor.submit(self._execute, job, run)
+        return job
+
+    def get(self, job_id: str) -> IngestJob | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def latest(self) -> IngestJob | None:
+        with self._lock:
+            return next(reversed(self._jobs.values()), None)
+
+    def cancel(self, job_id: str) -> IngestJob | None:
+        """Request cancellation; a job still queued never starts."""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            job.progress.set_phase("cancelled")
+        return job
+
+    # ── internal ───────────────────────────────────────────────────
+
+    def _execute(self, job: IngestJob, run: Callable[[IngestJob], dict]) -> dict:
+        job.progress.set_phase("running")
+        try:
+            job.result = run(job)
+        except Exception as exc:
+            logger.exception("Ingest job %s failed", job.job_id)
+            job.error = str(exc)
+            job.progress.set_phase("failed")
+            raise
+        job.progress.set_phase("cancelled" if job.cancelled else "done")
+        return job.result
+
+    def _trim_locked(self) -> None:
+        """Forget the oldest finished jobs beyond the retention limit."""
+        excess = len(self._jobs) - self._max_jobs_kept
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id].progress.phase in ("done", "failed", "cancelled"):
+                del self._jobs[job_id]
+                excess -= 1
@@ -3,6 +3,11 @@
 from __future__ import annotations
 
 import logging
+import multiprocessing
+import re
+from collections import deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
 from dataclasses import dataclass, field
 from pathlib import Path
 
@@ -44,61 +49,62 @@ class LoadResult:
 
     docs: list[LoadedDoc] = field(default_factory=list)
     errors: list[dict[str, str]] = field(default_factory=list)
+    skipped: list[str] = field(default_factory=list)  # doc_ids rejected by ``skip``
 
 
 # ── Helpers ────────────────────────────────────────────────────────────
 
+_BOILERPLATE_LINES = frozenset({
+    "table of contents",
+    "contents",
+    "on this page",
+    "related resources",
+    "was this page helpful",
+    "feedback",
+    "learn more",
+    "documentation amazon bedrock",
+    "javascript is disabled or is unavailable in your browser",
+})
+
+# Regex patterns for noisy corpus artefacts
+_WS_RE = re.compile(r"\s+")
+_HSPACE_RE = re.compile(r"[ \t]+")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+_SOURCE_HEADER_RE = re.compile(r"^(Source|Fetched[- ]?At)\s*:", re.IGNORECASE)
+_YES_NO_TOK_RE = re.compile(r"\b(?:Yes|No)\b")
+_MODEL_ID_RE = re.compile(r"\b[a-z][a-z0-9]*\.[a-z][a-z0-9]+-[a-z0-9]+-[a-z0-9]+")
+
+
 def _normalize(text: str) -> str:
     """Normalize text while removing navigation boilerplate and noisy table rows."""
-    import re
-
-    boilerplate = {
-        "table of contents",
-        "contents",
-        "on this page",
-        "related resources",
-        "was this page helpful",
-        "feedback",
-        "learn more",
-        "documentation amazon bedrock",
-        "javascript is disabled or is unavailable in your browser",
-    }
-
-    # Regex patterns for noisy corpus artefacts
-    _source_header_re = re.compile(r"^(Source|Fetched[- ]?At)\s*:", re.IGNORECASE)
-    _yes_no_tok_re = re.compile(r"\b(?:Yes|No)\b")
-    _model_id_re = re.compile(
-        r"\b[a-z][a-z0-9]*\.[a-z][a-z0-9]+-[a-z0-9]+-[a-z0-9]+"
-    )
-
     cleaned_lines: list[str] = []
     prev = ""
     for raw in text.splitlines():
-        line = re.sub(r"\s+", " ", raw).strip()
+        line = _WS_RE.sub(" ", raw).strip()
         if not line:
             continue
         low = line.lower()
-        if low in boilerplate:
+        if low in _BOILERPLATE_LINES:
             continue
         if len(low) < 3 and not any(ch.isdigit() for ch in low):
             continue
         if line == prev:
             continue
         # Strip Source: / Fetched-At: download headers
-        if _source_header_re.match(line):
+        if _SOURCE_HEADER_RE.match(line):
             continue
         # Strip region-availability table rows (5+ Yes/No tokens on one line)
-        if len(_yes_no_tok_re.findall(line)) >= 5:
+        if len(_YES_NO_TOK_RE.findall(line)) >= 5:
             continue
         # Strip detailed model-table rows (model ID + region pattern)
-        if _model_id_re.search(line) and len(line) > 100:
+        if _MODEL_ID_RE.search(line) and len(line) > 100:
             continue
         cleaned_lines.append(line)
         prev = line
 
     normalized = "\n".join(cleaned_lines)
-    normalized = re.sub(r"[ \t]+", " ", normalized)
-    normalized = re.sub(r"\n{3,}", "\n\n", normalized)
+    normalized = _HSPACE_RE.sub(" ", normalized)
+    normalized = _BLANK_LINES_RE.sub("\n\n", normalized)
     return normalized.strip()
 
 
@@ -112,21 +118,8 @@ def _read_pdf(path: Path) -> str:
     return _normalize("\n".join(pages))
 
 
-# ── Public API ─────────────────────────────────────────────────────────
-
-def load_folder(root: Path, min_doc_length: int = 200) -> LoadResult:
-    """Recursively load all supported files under *root*.
-
-    Returns a :class:`LoadResult` with successfully loaded docs and any
-    errors encountered (capped at detail level).
-    """
-    result = LoadResult()
-    root = root.resolve()
-
-    if not root.is_dir():
-        result.errors.append({"doc_id": str(root), "error": "Path is not a directory"})
-        return result
-
+def _iter_source_files(root: Path) -> Iterator[tuple[Path, str, str]]:
+    """Yield ``(path, doc_id, content_type)`` for loadable files, sorted by path."""
     for path in sorted(root.rglob("*")):
         if path.is_dir():
             continue
@@ -139,32 +132,122 @@ def load_folder(root: Path, min_doc_length: int = 200) -> LoadResult:
         if any(stem_lower.startswith(ns) for ns in IGNORED_STEMS):
             logger.info("Skipping noise file: %s", path.name)
             continue
+        yield path, str(path.relative_to(root)), path.suffix.lstrip(".").lower()
 
-        doc_id = str(path.relative_to(root))
-        content_type = path.suffix.lstrip(".").lower()
 
-        try:
-            if content_type in ("txt", "md"):
-                text = _read_text(path)
-            elif content_type == "pdf":
-                text = _read_pdf(path)
-            else:
-                continue
+def _load_file(
+    path: str,
+    doc_id: str,
+    content_type: str,
+    min_doc_length: int,
+) -> tuple[LoadedDoc | None, int, str | None]:
+    """Read, normalize and length-filter one file.
 
-            if len(text) < min_doc_length:
-                logger.info("Skipping %s — too short (%d chars)", doc_id, len(text))
-                continue
+    Returns ``(doc, text_length, error)``; ``doc`` is ``None`` when the
+    file is too short or failed.  Runs inside pool workers, so it reports
+    instead of logging.
+    """
+    try:
+        if content_type in ("txt", "md"):
+            text = _read_text(Path(path))
+        else:
+            text = _read_pdf(Path(path))
+    except Exception as exc:  # noqa: BLE001
+        return None, 0, str(exc)
 
-            result.docs.append(
-                LoadedDoc(
-                    doc_id=doc_id,
-                    text=text,
-                    source_path=str(path),
-                    content_type=content_type,
-                )
-            )
-        except Exception as exc:  # noqa: BLE001
-            logger.warning("Failed to load %s: %s", doc_id, exc)
-            result.errors.append({"doc_id": doc_id, "error": str(exc)})
+    if len(text) < min_doc_length:
+        return None, len(text), None
+    doc = LoadedDoc(doc_id=doc_id, text=text, source_path=path, content_type=content_type)
+    return doc, len(text), None
 
+
+# ── Public API ─────────────────────────────────────────────────────────
+
+def load_folder(
+    root: Path,
+    min_doc_length: int = 200,
+    skip: Callable[[str, Path], bool] | None = None,
+    workers: int = 1,
+) -> LoadResult:
+    """Recursively load all supported files under *root*.
+
+    Returns a :class:`LoadResult` with successfully loaded docs and any
+    errors encountered (capped at detail level).  See :func:`iter_folder`
+    for *skip* and *workers*.
+    """
+    result = LoadResult()
+    result.docs.extend(
+        iter_folder(root, result, min_doc_length=min_doc_length, skip=skip, workers=workers)
+    )
     return result
+
+
+def iter_folder(
+    root: Path,
+    result: LoadResult,
+    min_doc_length: int = 200,
+    skip: Callable[[str, Path], bool] | None = None,
+    workers: int = 1,
+) -> Iterator[LoadedDoc]:
+    """Lazily yield the docs under *root* in sorted path order.
+
+    Errors and skipped doc_ids are appended to *result* as they occur
+    (``result.docs`` is left alone).  Files for which ``skip(doc_id, path)``
+    returns True are not read.  With ``workers > 1`` files are parsed and
+    normalized in a process pool; only a small window of files is in
+    flight, so memory stays bounded however large the folder is.
+    """
+    root = root.resolve()
+
+    if not root.is_dir():
+        result.errors.append({"doc_id": str(root), "error": "Path is not a directory"})
+        return
+
+    def pending() -> Iterator[tuple[str, str, str, int]]:
+        for path, doc_id, content_type in _iter_source_files(root):
+            try:
+                if skip is not None and skip(doc_id, path):
+                    result.skipped.append(doc_id)
+                    continue
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("Failed to load %s: %s", doc_id, exc)
+                result.errors.append({"doc_id": doc_id, "error": str(exc)})
+                continue
+            yield str(path), doc_id, content_type, min_doc_length
+
+    if workers > 1:
+        outcomes = _load_in_pool(pending(), workers)
+    else:
+        outcomes = ((args[1], _load_file(*args)) for args in pending())
+
+    for doc_id, (doc, text_len, error) in outcomes:
+        if error is not None:
+            logger.warning("Failed to load %s: %s", doc_id, error)
+            result.errors.append({"doc_id": doc_id, "error": error})
+        elif doc is None:
+            logger.info("Skipping %s — too short (%d chars)", doc_id, text_len)
+        else:
+            yield doc
+
+
+def _load_in_pool(
+    tasks: Iterator[tuple[str, str, str, int]],
+    workers: int,
+) -> Iterator[tuple[str, tuple[LoadedDoc | None, int, str | None]]]:
+    """Run :func:`_load_file` in a process pool, yielding results in task order.
+
+    At most ``4 × workers`` files are in flight; a slow consumer therefore
+    stalls submission instead of piling up parsed documents.
+    """
+    window: deque[tuple[str, Future]] = deque()
+    # "spawn": forking a threaded server process is unsafe.
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        for args in tasks:
+            window.append((args[1], pool.submit(_load_file, *args)))
+            if len(window) >= 4 * workers:
+                doc_id, future = window.popleft()
+                yield doc_id, future.result()
+        while window:
+            doc_id, future = window.popleft()
+            yield doc_id, future.result()
@@ -0,0 +1,170 @@
+"""Content-hash manifest for incremental ingestion.
+
+Records, per ingested file, its size / mtime, a SHA-256 of the raw bytes,
+the chunk-config fingerprint it was chunked with and a short hash of every
+chunk's text.  ``/ingest`` uses it to:
+
+* skip unchanged files without reading or parsing them (stat fast path,
+  falling back to the content hash when only the mtime moved), and
+* re-embed only the chunks of a changed file whose text actually changed.
+
+The manifest lives in a JSON file next to the Chroma directory and is
+rewritten atomically after each successful ingest.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from app.ingest.chunker import Chunk
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+_CHUNK_HASH_LEN = 16  # hex chars; change detection only, not integrity
+
+
+@dataclass
+class FileRecord:
+    """Manifest entry for one ingested file."""
+
+    source_path: str
+    size: int
+    mtime_ns: int
+    sha256: str                 # raw file bytes
+    config: str                 # chunk-config fingerprint
+    chunks: dict[str, str] = field(default_factory=dict)  # chunk_id → text hash
+
+
+@dataclass
+class ChunkDiff:
+    """Chunks of the loaded docs split by what the manifest already covers."""
+
+    changed: list[Chunk]        # need embedding + upsert
+    stale_ids: list[str]        # previously stored IDs the docs no longer produce
+    unknown: list[Chunk]        # chunks of docs missing from the manifest
+
+
+def chunk_config_fingerprint(
+    chunk_size: int, chunk_overlap: int, embedding_model: str,
+) -> str:
+    """Fingerprint of every setting that changes stored chunks or vectors."""
+    raw = f"v{MANIFEST_VERSION}|{chunk_size}|{chunk_overlap}|{embedding_model}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:_CHUNK_HASH_LEN]
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()[:_CHUNK_HASH_LEN]
+
+
+def _file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestManifest:
+    """``doc_id → FileRecord`` map persisted as JSON."""
+
+    def __init__(self, path: Path, files: dict[str, FileRecord] | None = None) -> None:
+        self.path = path
+        self._files: dict[str, FileRecord] = files or {}
+
+    @classmethod
+    def load(cls, path: Path) -> IngestManifest:
+        """Read *path*; a missing, corrupt or outdated file yields an empty manifest."""
+        try:
+            raw = json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return cls(path)
+        except (OSError, ValueError) as exc:
+            logger.warning("Ingest manifest %s unreadable (%s) — starting fresh", path, exc)
+            return cls(path)
+        if raw.get("version") != MANIFEST_VERSION:
+            logger.info("Ingest manifest %s has another version — starting fresh", path)
+            return cls(path)
+        files = {doc_id: FileRecord(**rec) for doc_id, rec in raw.get("files", {}).items()}
+        return cls(path, files)
+
+    def save(self) -> None:
+        """Write the manifest atomically."""
+        payload = {
+            "version": MANIFEST_VERSION,
+            "files": {doc_id: asdict(rec) for doc_id, rec in self._files.items()},
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(payload, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def get(self, doc_id: str) -> FileRecord | None:
+        return self._files.get(doc_id)
+
+    def clear(self) -> None:
+        self._files.clear()
+
+    # ── change detection ───────────────────────────────────────────
+
+    def is_unchanged(self, doc_id: str, path: Path, config: str) -> bool:
+        """True when *path* was ingested before with identical bytes and *config*."""
+        rec = self._files.get(doc_id)
+        if rec is None or rec.config != config or rec.source_path != str(path):
+            return False
+        try:
+            st = path.stat()
+            if st.st_size != rec.size:
+                return False
+            if st.st_mtime_ns == rec.mtime_ns:
+                return True
+            # Touched but maybe not edited: compare content, refresh the stat.
+            if _file_digest(path) != rec.sha256:
+                return False
+        except OSError:
+            return False
+        rec.mtime_ns = st.st_mtime_ns
+        return True
+
+    def diff(self, chunks: list[Chunk], config: str) -> ChunkDiff:
+        """Compare freshly produced *chunks* against the recorded ones."""
+        by_doc: dict[str, list[Chunk]] = {}
+        for c in chunks:
+            by_doc.setdefault(c.doc_id, []).append(c)
+
+        result = ChunkDiff(changed=[], stale_ids=[], unknown=[])
+        for doc_id, doc_chunks in by_doc.items():
+            rec = self._files.get(doc_id)
+            if rec is None:
+                result.unknown.extend(doc_chunks)
+                result.changed.extend(doc_chunks)
+                continue
+            new_ids = {c.chunk_id for c in doc_chunks}
+            result.stale_ids.extend(cid for cid in rec.chunks if cid not in new_ids)
+            # Stored vectors/metadata are only reusable under the same config and path.
+            reusable = rec.config == config and rec.source_path == doc_chunks[0].source_path
+            result.changed.extend(
+                c for c in doc_chunks
+                if not reusable or rec.chunks.get(c.chunk_id) != text_hash(c.text)
+            )
+        return result
+
+    def record(self, doc_id: str, path: Path, config: str, chunks: list[Chunk]) -> None:
+        """Remember *doc_id* as ingested from *path* into *chunks*."""
+        st = path.stat()
+        self._files[doc_id] = FileRecord(
+            source_path=str(path),
+            size=st.st_size,
+            mtime_ns=st.st_mtime_ns,
+            sha256=_file_digest(path),
+            config=config,
+            chunks={c.chunk_id: text_hash(c.text) for c in chunks},
+        )
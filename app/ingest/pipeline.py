@@ -0,0 +1,102 @@
+"""Streaming building blocks for ``/ingest``.
+
+Documents flow load → chunk → embed → upsert in bounded batches: the
+loader is a generator, :func:`iter_chunk_batches` pulls only as many docs
+as fit in one batch, and the caller embeds / upserts that batch before
+pulling the next.  Peak memory is therefore one batch of chunks plus
+their vectors, independent of corpus size.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field, fields
+
+from app.ingest.chunker import Chunk, chunk_text
+from app.ingest.loader import LoadedDoc
+
+
+@dataclass
+class ChunkBatch:
+    """Whole documents and their chunks, flushed together."""
+
+    docs: list[LoadedDoc]
+    chunks: list[Chunk]
+
+
+@dataclass
+class IngestProgress:
+    """Live counters of one ingest run (thread-safe updates)."""
+
+    phase: str = "pending"          # pending | running | done | cancelled | failed
+    docs_loaded: int = 0
+    docs_unchanged: int = 0
+    docs_failed: int = 0
+    chunks_total: int = 0
+    chunks_embedded: int = 0
+    chunks_indexed: int = 0
+    stale_removed: int = 0
+    batches: int = 0
+    started_at: float = field(default_factory=time.time)
+    finished_at: float | None = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def add(self, **deltas: int) -> None:
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def set(self, **values: int) -> None:
+        with self._lock:
+            for name, value in values.items():
+                setattr(self, name, value)
+
+    def set_phase(self, phase: str) -> None:
+        with self._lock:
+            self.phase = phase
+            if phase == "running":
+                self.started_at = time.time()
+            elif phase in ("done", "cancelled", "failed"):
+                self.finished_at = time.time()
+
+    def snapshot(self) -> dict:
+        """Plain-dict copy, safe to serialise while the run continues."""
+        with self._lock:
+            data = {f.name: getattr(self, f.name) for f in fields(self) if not f.name.startswith("_")}
+        end = data["finished_at"] or time.time()
+        elapsed = max(end - data["started_at"], 1e-9)
+        data["elapsed_sec"] = round(elapsed, 2)
+        data["docs_per_sec"] = round(data["docs_loaded"] / elapsed, 2)
+        data["chunks_per_sec"] = round(data["chunks_indexed"] / elapsed, 2)
+        return data
+
+
+def iter_chunk_batches(
+    docs: Iterable[LoadedDoc],
+    batch_size: int,
+    chunk_size: int,
+    chunk_overlap: int,
+) -> Iterator[ChunkBatch]:
+    """Chunk *docs* lazily and group them into batches of ≈ *batch_size* chunks.
+
+    A document is never split across batches, so a batch can exceed
+    *batch_size* by at most one document's chunks.
+    """
+    batch = ChunkBatch(docs=[], chunks=[])
+    for doc in docs:
+        batch.docs.append(doc)
+        batch.chunks.extend(chunk_text(
+            text=doc.text,
+            doc_id=doc.doc_id,
+            source_path=doc.source_path,
+            content_type=doc.content_type,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+        ))
+        if len(batch.chunks) >= batch_size:
+            yield batch
+            batch = ChunkBatch(docs=[], chunks=[])
+    if batch.docs:
+        yield batch
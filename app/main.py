@@ -1,38 +1,58 @@
-"""FastAPI application — endpoints: /health, /ingest, /query, /query/stream, /agent/research, /ui."""
+"""FastAPI application — endpoints: /health, /ingest (+ background jobs), /query, /query/stream, /agent/research, /ui."""
 
 from __future__ import annotations
 
+import asyncio
+import functools
 import json
 import logging
 import re
+import threading
 import time
+from collections import deque
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
 from contextlib import asynccontextmanager
 from pathlib import Path
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel, Field
+from starlette.concurrency import iterate_in_threadpool
 from starlette.responses import FileResponse, StreamingResponse
 
 from app.config import (
-    CHUNK_OVERLAP, CHUNK_SIZE, HYBRID_ENABLED, MAX_CHUNKS_PER_DOC,
-    MIN_DOC_LENGTH, MULTIHOP_POOL_SIZE, MULTIHOP_TOP_K, QUERY_CACHE_ENABLED,
-    QUERY_CACHE_TTL_SEC, RERANK_ENABLED, RERANK_POOL_SIZE, TOP_K,
+    CHROMA_HOST, CHUNK_OVERLAP, CHUNK_SIZE, EMBEDDING_MODEL, HYBRID_ENABLED, INGEST_BATCH_SIZE,
+    INGEST_LOAD_WORKERS, INGEST_MANIFEST_ENABLED, INGEST_MANIFEST_PATH, MIN_DOC_LENGTH,
+    MULTIHOP_POOL_SIZE, MULTIHOP_TOP_K, QUERY_CACHE_SWEEP_SEC, QUERY_COALESCE_ENABLED,
+    RERANK_ENABLED, RERANK_POOL_SIZE, RETRIEVAL_DEADLINE_MS, TOP_K,
+)
+from app.db.chroma import (
+    RetrievedChunk, find_stale_chunk_ids, get_collection, heartbeat, query_chunks_many,
+    query_chunks_many_async, upsert_chunks, upsert_concurrency, upsert_metrics,
 )
-from app.db.chroma import RetrievedChunk, get_collection, heartbeat, query_chunks, upsert_chunks
 from app.generation.llm import (
-    check_llm_ready, generate_answer, generate_answer_stream, is_llm_available,
+    check_llm_ready, generate_answer_async, generate_answer_stream, is_llm_available,
+    mistral_limiter,
 )
-from app.ingest.chunker import Chunk, chunk_text
-from app.ingest.embedder import embed_texts
-from app.ingest.loader import load_folder
-from app.retrieval.cache import QueryCache
+from app.executors import run_cpu, shutdown_cpu_executor
+from app.ingest.chunker import Chunk
+from app.ingest.embedder import embed_texts, get_embedding_cache
+from app.ingest.loader import LoadResult, iter_folder
+from app.ingest.manifest import IngestManifest, chunk_config_fingerprint
+from app.ingest.jobs import IngestJob, IngestJobManager
+from app.ingest.pipeline import ChunkBatch, IngestProgress, iter_chunk_batches
+from app.retrieval.cache import QueryCache, RetrievalCache, make_query_cache, make_retrieval_cache
+from app.retrieval.corpus_version import get_corpus_version
 from app.retrieval.hybrid import (
-    expand_query_variants, fuse_bm25_runs, fuse_vector_runs, get_bm25_index,
-    hybrid_merge, rebuild_bm25_index, select_multi_hop_contexts,
+    finish_bm25_snapshot_update, flush_bm25_snapshot, get_bm25_index, load_or_rebuild_bm25_index,
+    mark_bm25_snapshot_stale, rebuild_bm25_index, update_bm25_index,
 )
-from app.retrieval.detection import is_list_style
 from app.retrieval.multihop import extract_intents, retrieve_multihop
-from app.retrieval.reranker import rerank_chunks
+from app.retrieval.pipeline import (
+    MultihopStage, PlanStage, PoolCacheStage, RerankStage, RetrievalPipeline, RetrievalState,
+    RetrieveStage, SelectStage, Stage,
+)
+from app.retrieval.reranker import get_rerank_score_cache, rerank_chunks
+from app.singleflight import SingleFlight
 
 logging.basicConfig(
     level=logging.INFO,
@@ -41,22 +61,34 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # ── Cache singleton ────────────────────────────────────────────────────
-query_cache: QueryCache | None = (
-    QueryCache(ttl_sec=QUERY_CACHE_TTL_SEC) if QUERY_CACHE_ENABLED else None
-)
+query_cache: QueryCache | None = make_query_cache(embed=embed_texts)
+retrieval_cache: RetrievalCache | None = make_retrieval_cache()
+query_flights: SingleFlight | None = SingleFlight() if QUERY_COALESCE_ENABLED else None
+
+# ── Ingest job queue ───────────────────────────────────────────────────
+ingest_jobs = IngestJobManager()
 
 
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
-    """Build BM25 index on startup if hybrid retrieval is enabled."""
+    """Load (or build) the BM25 index on startup if hybrid retrieval is enabled.
+
+    Also runs the query-cache TTL sweeper for the lifetime of the app.
+    """
     if HYBRID_ENABLED:
         try:
             collection = get_collection()
             if collection.count() > 0:
-                rebuild_bm25_index(collection)
+                load_or_rebuild_bm25_index(collection)
         except Exception as exc:  # noqa: BLE001
             logger.warning("BM25 index build failed on startup: %s", exc)
+    if query_cache is not None:
+        query_cache.start_sweeper(QUERY_CACHE_SWEEP_SEC)
     yield
+    if query_cache is not None:
+        query_cache.stop_sweeper()
+    flush_bm25_snapshot()
+    shutdown_cpu_executor()
 
 
 app = FastAPI(title="Bedrock RAG Service", version="0.2.0", lifespan=lifespan)
@@ -82,6 +114,7 @@ class IngestRequest(BaseModel):
     path: str  # folder to ingest, e.g. "data/corpus_raw"
     chunk_size: int | None = None   # override CHUNK_SIZE for this run
     chunk_overlap: int | None = None  # override CHUNK_OVERLAP for this run
+    force: bool = False  # ignore the ingest manifest and re-embed everything
 
 
 class IngestError(BaseModel):
@@ -95,10 +128,32 @@ class IngestResponse(BaseModel):
     docs_failed: int
     chunks_total: int
     chunks_indexed: int
+    docs_unchanged: int = 0
+    cancelled: bool = False
     duration_sec: float
     errors: list[IngestError]
 
 
+class IngestJobResponse(BaseModel):
+    job_id: str
+    path: str
+    phase: str  # "pending" | "running" | "done" | "cancelled" | "failed"
+    docs_loaded: int
+    docs_unchanged: int
+    docs_failed: int
+    chunks_total: int
+    chunks_embedded: int
+    chunks_indexed: int
+    stale_removed: int
+    batches: int
+    elapsed_sec: float
+    docs_per_sec: float
+    chunks_per_sec: float
+    cancel_requested: bool
+    error: str | None = None
+    result: IngestResponse | None = None
+
+
 class HealthResponse(BaseModel):
     status: str
     chroma: str
@@ -111,6 +166,14 @@ class StatsResponse(BaseModel):
     by_content_type: dict[str, int]
     top_docs: list[dict]
     md_count: int
+    embedding_cache: dict[str, int] | None = None
+    rerank_cache: dict[str, int] | None = None
+    query_cache: dict[str, float | None] | None = None
+    retrieval_cache: dict[str, float] | None = None
+    query_coalescing: dict[str, int] | None = None
+    mistral_rate_limit: dict[str, float] | None = None
+    corpus_version: dict[str, int] | None = None
+    chroma_upserts: dict[str, float] | None = None
 
 
 class QueryRequest(BaseModel):
@@ -209,10 +272,27 @@ def stats() -> StatsResponse:
 
     collection = get_collection()
     total = collection.count()
+    embedding_cache = get_embedding_cache()
+    embedding_cache_stats = embedding_cache.stats() if embedding_cache is not None else None
+    rerank_cache = get_rerank_score_cache()
+    rerank_cache_stats = rerank_cache.stats() if rerank_cache is not None else None
+    query_cache_stats = query_cache.stats() if query_cache is not None else None
+    retrieval_cache_stats = retrieval_cache.stats() if retrieval_cache is not None else None
+    coalescing_stats = query_flights.stats() if query_flights is not None else None
+    rate_limit_stats = mistral_limiter.stats() if mistral_limiter is not None else None
+    corpus_version_stats = get_corpus_version().stats()
 
     if total == 0:
         return StatsResponse(
             total_chunks=0, by_content_type={}, top_docs=[], md_count=0,
+            embedding_cache=embedding_cache_stats,
+            rerank_cache=rerank_cache_stats,
+            query_cache=query_cache_stats,
+            retrieval_cache=retrieval_cache_stats,
+            query_coalescing=coalescing_stats,
+            mistral_rate_limit=rate_limit_stats,
+            corpus_version=corpus_version_stats,
+            chroma_upserts=upsert_metrics.stats(),
         )
 
     all_data = collection.get(include=["metadatas"])
@@ -234,159 +314,399 @@ def stats() -> StatsResponse:
         by_content_type=dict(type_counter),
         top_docs=top_docs,
         md_count=type_counter.get("md", 0),
+        embedding_cache=embedding_cache_stats,
+        rerank_cache=rerank_cache_stats,
+        query_cache=query_cache_stats,
+        retrieval_cache=retrieval_cache_stats,
+        query_coalescing=coalescing_stats,
+        mistral_rate_limit=rate_limit_stats,
+        corpus_version=corpus_version_stats,
+        chroma_upserts=upsert_metrics.stats(),
     )
 
 
 @app.post("/ingest", response_model=IngestResponse)
 def ingest(body: IngestRequest) -> IngestResponse:
-    t0 = time.perf_counter()
+    """Ingest a folder and wait for the result (queued behind any running job).
 
+    Returns 409 if the job is cancelled before it starts.
+    """
+    job = _submit_ingest(body)
+    try:
+        result = job.future.result()
+    except CancelledError:
+        raise HTTPException(
+            status_code=409, detail=f"Ingest job {job.job_id} was cancelled before it started",
+        ) from None
+    return IngestResponse(**result)
+
+
+@app.post("/ingest/jobs", response_model=IngestJobResponse, status_code=202)
+def ingest_submit(body: IngestRequest) -> IngestJobResponse:
+    """Start ingestion in the background; poll ``GET /ingest/{job_id}``."""
+    job = _submit_ingest(body)
+    return IngestJobResponse(**job.snapshot())
+
+
+@app.get("/ingest/progress")
+def ingest_progress() -> dict:
+    """Counters of the running (or most recent) ingest."""
+    job = ingest_jobs.latest()
+    if job is None:
+        return {"phase": "idle"}
+    return job.snapshot()
+
+
+@app.get("/ingest/{job_id}", response_model=IngestJobResponse)
+def ingest_status(job_id: str) -> IngestJobResponse:
+    """Progress, throughput and (once finished) the result of an ingest job."""
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown ingest job")
+    return IngestJobResponse(**job.snapshot())
+
+
+@app.delete("/ingest/{job_id}", response_model=IngestJobResponse)
+def ingest_cancel(job_id: str) -> IngestJobResponse:
+    """Cancel an ingest job; a running job stops after its current batch."""
+    job = ingest_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown ingest job")
+    return IngestJobResponse(**job.snapshot())
+
+
+def _submit_ingest(body: IngestRequest) -> IngestJob:
     root = Path(body.path)
     if not root.is_absolute():
         root = Path.cwd() / root  # resolve relative to working dir
 
-    logger.info("Starting ingestion from %s", root)
+    logger.info("Queueing ingestion from %s", root)
+    return ingest_jobs.submit(str(root), lambda job: _ingest_job(root, body, job).model_dump())
+
+
+def _ingest_job(root: Path, body: IngestRequest, job: IngestJob) -> IngestResponse:
+    """Body of one ingest job (runs on the ingest thread)."""
+    t0 = time.perf_counter()
+    logger.info("Starting ingestion from %s (job %s)", root, job.job_id)
+
+    progress = job.progress
+    load_result = _run_ingest(root, body, progress, job.cancel_event)
+
+    duration = round(time.perf_counter() - t0, 2)
+    logger.info(
+        "Ingestion %s: %d/%d chunks indexed, %d stale removed in %.2fs",
+        "cancelled" if job.cancelled else "complete",
+        progress.chunks_indexed, progress.chunks_total, progress.stale_removed, duration,
+    )
+
+    return IngestResponse(
+        docs_total=progress.docs_loaded + progress.docs_unchanged + progress.docs_failed,
+        docs_ok=progress.docs_loaded + progress.docs_unchanged,
+        docs_failed=progress.docs_failed,
+        chunks_total=progress.chunks_total,
+        chunks_indexed=progress.chunks_indexed,
+        docs_unchanged=progress.docs_unchanged,
+        cancelled=job.cancelled,
+        duration_sec=duration,
+        errors=[IngestError(**e) for e in load_result.errors[:10]],
+    )
 
-    # 1. Load documents ─────────────────────────────────────────────────
-    load_result = load_folder(root, min_doc_length=MIN_DOC_LENGTH)
-    docs = load_result.docs
-    errors = load_result.errors
 
-    logger.info("Loaded %d docs, %d errors", len(docs), len(errors))
+def _run_ingest(
+    root: Path,
+    body: IngestRequest,
+    progress: IngestProgress,
+    cancel_event: threading.Event | None = None,
+) -> LoadResult:
+    """Stream load → chunk → embed → upsert in batches of INGEST_BATCH_SIZE chunks.
 
-    # 2. Chunk ──────────────────────────────────────────────────────────
+    At most ``upsert_concurrency()`` batches of chunks and vectors are
+    alive at a time; the loader generator is pulled lazily, so a slow
+    embed/upsert step throttles file parsing instead of letting documents
+    pile up.  Setting *cancel_event* stops the run at the next batch
+    boundary; batches already stored are kept and recorded.
+    """
     # Use request overrides or defaults; clamp to safe ranges
     cs = max(100, min(body.chunk_size or CHUNK_SIZE, 4000))
     co = max(0, min(body.chunk_overlap or CHUNK_OVERLAP, cs // 2))
+    config_fp = chunk_config_fingerprint(cs, co, EMBEDDING_MODEL)
+
+    manifest = _load_ingest_manifest(force=body.force)
+    skip = None
+    if manifest is not None and not body.force:
+        def skip(doc_id: str, path: Path) -> bool:
+            if manifest.is_unchanged(doc_id, path, config_fp):
+                progress.add(docs_unchanged=1)
+                return True
+            return False
+
+    load_result = LoadResult()
+    docs = iter_folder(
+        root, load_result, min_doc_length=MIN_DOC_LENGTH, skip=skip, workers=INGEST_LOAD_WORKERS,
+    )
+    bm25_dirty = False
+    bm25_incremental = HYBRID_ENABLED and get_bm25_index().ready
+    snapshot_marked = False
+
+    # Against a remote Chroma, upserts of up to `concurrency` batches run on
+    # a small pool while the next batch is loaded and embedded, so ingest
+    # throughput is bound by the server rather than per-batch round trips.
+    concurrency = upsert_concurrency()
+    store = (
+        ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ingest-store")
+        if concurrency > 1 else None
+    )
+    pending: deque[tuple[Future, ChunkBatch, list[Chunk], list[str]]] = deque()
+
+    def _finish_batch(
+        future: Future, batch: ChunkBatch, changed_chunks: list[Chunk], stale_ids: list[str],
+    ) -> None:
+        nonlocal bm25_dirty, bm25_incremental
+        indexed = future.result()
+        progress.add(chunks_indexed=indexed, stale_removed=len(stale_ids))
+
+        # Keep BM25 in step batch by batch; a never-built index is rebuilt
+        # once from the collection at the end instead.
+        if HYBRID_ENABLED and (indexed > 0 or stale_ids):
+            bm25_dirty = True
+            if bm25_incremental:
+                try:
+                    update_bm25_index(changed_chunks, stale_ids)
+                except Exception as exc:  # noqa: BLE001
+                    logger.warning("BM25 index update failed after ingest: %s", exc)
+                    bm25_incremental = False
+
+        if manifest is not None:
+            _record_ingested(manifest, batch, config_fp)
+
+        # Cached answers built from these docs are stale from here on.
+        if indexed > 0 or stale_ids:
+            get_corpus_version().bump(
+                {c.doc_id for c in changed_chunks} | {cid.rsplit("#", 1)[0] for cid in stale_ids},
+            )
 
-    all_chunks: list[Chunk] = []
-    for doc in docs:
-        chunks = chunk_text(
-            text=doc.text,
-            doc_id=doc.doc_id,
-            source_path=doc.source_path,
-            content_type=doc.content_type,
-            chunk_size=cs,
-            chunk_overlap=co,
-        )
-        all_chunks.extend(chunks)
+    def _persist() -> None:
+        synced = bm25_dirty
+        if bm25_dirty and not bm25_incremental:
+            try:
+                rebuild_bm25_index(get_collection())
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("BM25 index update failed after ingest: %s", exc)
+                synced = False
+        if snapshot_marked:
+            # The snapshot write is O(corpus); it is debounced off the ingest.
+            finish_bm25_snapshot_update(save=synced)
+
+        if manifest is not None and progress.docs_loaded:
+            try:
+                manifest.save()
+            except OSError as exc:
+                logger.warning("Could not update ingest manifest: %s", exc)
+
+    try:
+        for batch in iter_chunk_batches(docs, INGEST_BATCH_SIZE, cs, co):
+            if cancel_event is not None and cancel_event.is_set():
+                logger.info("Ingest cancelled after %d batches", progress.batches)
+                break
+            progress.add(batches=1, docs_loaded=len(batch.docs), chunks_total=len(batch.chunks))
+            progress.set(docs_failed=len(load_result.errors))
+
+            # Diff against the manifest: only chunks whose text changed are
+            # re-embedded; docs the manifest has never seen need a Chroma lookup.
+            if manifest is not None:
+                diff = manifest.diff(batch.chunks, config_fp)
+                changed_chunks = diff.changed
+                stale_ids = diff.stale_ids
+                if diff.unknown:
+                    stale_ids += find_stale_chunk_ids(diff.unknown)
+            else:
+                changed_chunks = batch.chunks
+                stale_ids = find_stale_chunk_ids(batch.chunks) if batch.chunks else []
+
+            texts = [c.text for c in changed_chunks]
+            embeddings = embed_texts(texts) if texts else []
+            progress.add(chunks_embedded=len(texts))
+
+            if (changed_chunks or stale_ids) and not snapshot_marked:
+                # Write-ahead: the saved BM25 snapshot stops matching before Chroma changes.
+                mark_bm25_snapshot_stale()
+                snapshot_marked = True
+
+            if not (changed_chunks or stale_ids):
+                pending.append((_done_future(0), batch, changed_chunks, stale_ids))
+            elif store is None:
+                indexed = upsert_chunks(changed_chunks, embeddings, stale_ids=stale_ids)
+                pending.append((_done_future(indexed), batch, changed_chunks, stale_ids))
+            else:
+                pending.append((
+                    store.submit(upsert_chunks, changed_chunks, embeddings, stale_ids=stale_ids),
+                    batch, changed_chunks, stale_ids,
+                ))
+            # Bound the in-flight window; finish stored batches in order.
+            while len(pending) >= concurrency:
+                _finish_batch(*pending.popleft())
+
+        while pending:
+            _finish_batch(*pending.popleft())
+    except BaseException:
+        # Batches already upserted must still reach the manifest, BM25 and
+        # the corpus version, or their docs stay stale until a restart.
+        if store is not None:
+            store.shutdown(wait=True, cancel_futures=True)
+        while pending:
+            future, *rest = pending.popleft()
+            if future.cancelled() or future.exception() is not None:
+                continue
+            try:
+                _finish_batch(future, *rest)
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("Could not finish an upserted batch after ingest failed: %s", exc)
+        _persist()
+        raise
+    finally:
+        if store is not None:
+            store.shutdown(wait=True, cancel_futures=True)
+
+    progress.set(docs_failed=len(load_result.errors))
+    _persist()
+    return load_result
+
+
+def _done_future(value: int) -> Future:
+    future: Future = Future()
+    future.set_result(value)
+    return future
+
+
+def _record_ingested(manifest: IngestManifest, batch: ChunkBatch, config_fp: str) -> None:
+    """Record the docs of a flushed batch in the manifest."""
+    chunks_by_doc: dict[str, list[Chunk]] = {}
+    for c in batch.chunks:
+        chunks_by_doc.setdefault(c.doc_id, []).append(c)
+    for doc in batch.docs:
+        try:
+            manifest.record(
+                doc.doc_id, Path(doc.source_path), config_fp, chunks_by_doc.get(doc.doc_id, []),
+            )
+        except OSError as exc:
+            logger.warning("Could not record %s in ingest manifest: %s", doc.doc_id, exc)
 
-    logger.info("Created %d chunks from %d docs", len(all_chunks), len(docs))
 
-    # 3. Embed ──────────────────────────────────────────────────────────
-    texts = [c.text for c in all_chunks]
-    embeddings = embed_texts(texts) if texts else []
+@app.post("/query", response_model=QueryResponse)
+async def query(body: QueryRequest) -> QueryResponse:
+    """Answer a question using RAG with grounded citations.
 
-    # 4. Upsert into ChromaDB ──────────────────────────────────────────
-    indexed = upsert_chunks(all_chunks, embeddings) if all_chunks else 0
+    Runs on the event loop: blocking retrieval steps go to the CPU executor
+    and the LLM call is awaited, so slow generations hold no thread.
+    Concurrent misses for the same cache key share one computation.
+    """
+    logger.info("Query: %s", body.question)
 
-    duration = round(time.perf_counter() - t0, 2)
-    logger.info("Ingestion complete: %d chunks indexed in %.2fs", indexed, duration)
+    cached = await _cached_response(body)
+    if cached is not None:
+        return cached
 
-    # 5. Rebuild BM25 index for hybrid retrieval ───────────────────────
-    if HYBRID_ENABLED and indexed > 0:
-        try:
-            rebuild_bm25_index(get_collection())
-        except Exception as exc:  # noqa: BLE001
-            logger.warning("BM25 index rebuild failed after ingest: %s", exc)
+    async def _compute() -> QueryResponse:
+        # 1-2. Retrieval (multi-hop intents or variants → dense/BM25/rerank) ──
+        retrieval = await _retrieval_pipeline().run(body.question, body.top_k)
+        return await _answer(body, retrieval)
 
-    return IngestResponse(
-        docs_total=len(docs) + len(errors),
-        docs_ok=len(docs),
-        docs_failed=len(errors),
-        chunks_total=len(all_chunks),
-        chunks_indexed=indexed,
-        duration_sec=duration,
-        errors=[IngestError(**e) for e in errors[:10]],
+    if query_flights is None:
+        return await _compute()
+    key = (body.question.strip().lower(), body.top_k, body.include_context)  # as QueryCache keys
+    return await query_flights.do(key, _compute)
+
+
+async def query_many(
+    bodies: list[QueryRequest], concurrency: int = 1,
+) -> list[QueryResponse | Exception]:
+    """Answer several questions with one shared retrieval pass.
+
+    Cache hits are served first; the remaining questions are embedded,
+    searched and BM25-scored together (``RetrievalPipeline.run_many``) and
+    only the generation calls fan out, at most *concurrency* at once.
+    Results come back in input order; a failed answer yields its exception.
+    """
+    responses: list[QueryResponse | Exception | None] = list(
+        await asyncio.gather(*(_cached_response(b) for b in bodies)),
     )
+    pending = [i for i, response in enumerate(responses) if response is None]
+    if not pending:
+        return responses
 
+    retrievals = await _retrieval_pipeline().run_many(
+        [(bodies[i].question, bodies[i].top_k) for i in pending],
+    )
+    limit = asyncio.Semaphore(max(1, concurrency))
 
-@app.post("/query", response_model=QueryResponse)
-def query(body: QueryRequest) -> QueryResponse:
-    """Answer a question using RAG with grounded citations."""
-    logger.info("Query: %s", body.question)
+    async def _one(body: QueryRequest, retrieval: RetrievalState) -> QueryResponse:
+        async with limit:
+            return await _answer(body, retrieval)
 
-    # ── Cache check ───────────────────────────────────────────────────
-    if query_cache is not None:
-        cached = query_cache.get(
-            body.question, body.top_k, include_context=body.include_context,
+    answers = await asyncio.gather(
+        *(_one(bodies[i], r) for i, r in zip(pending, retrievals)), return_exceptions=True,
+    )
+    for i, answer in zip(pending, answers):
+        responses[i] = answer
+    return responses
+
+
+async def _cached_response(body: QueryRequest) -> QueryResponse | None:
+    cached = await _cache_get(body)
+    if cached is None:
+        return None
+    logger.info("Cache HIT for: %s", body.question[:60])
+    return QueryResponse(**{**cached, "cache_hit": True})
+
+
+async def _cache_get(body: QueryRequest) -> dict | None:
+    """Cache lookup; the semantic tier embeds, so it runs on the CPU executor."""
+    if query_cache is None:
+        return None
+    if query_cache.semantic_enabled:
+        return await run_cpu(
+            query_cache.get, body.question, body.top_k, include_context=body.include_context,
         )
-        if cached is not None:
-            logger.info("Cache HIT for: %s", body.question[:60])
-            return QueryResponse(**{**cached, "cache_hit": True})
+    return query_cache.get(body.question, body.top_k, include_context=body.include_context)
+
 
-    # 1. Multi-hop intent extraction ───────────────────────────────────
-    intents = extract_intents(body.question)
-    is_multihop_query = bool(intents)
-    intent_covered: list[bool] = []
+async def _cache_set(body: QueryRequest, data: dict, retrieval: RetrievalState) -> None:
+    """Cache *data*, tagged with the docs and corpus generation it came from.
 
+    Answers built on a degraded retrieval (an arm dropped at the deadline,
+    a pool left unranked) are not cached, like their pools.
+    """
+    if query_cache is None or retrieval.timed_out or retrieval.rerank_failed:
+        return
+    store = functools.partial(
+        query_cache.set, body.question, body.top_k, data,
+        include_context=body.include_context,
+        doc_ids={c.doc_id for c in retrieval.chunks},
+        generation=retrieval.corpus_generation,
+    )
+    if query_cache.semantic_enabled:
+        await run_cpu(store)
+    else:
+        store()
+
+
+async def _answer(body: QueryRequest, retrieval: RetrievalState) -> QueryResponse:
+    """Gate, generate and cache the answer for one finished retrieval."""
+    if not retrieval.intents and not retrieval.variants:
+        return QueryResponse(answer=None, citations=[])
+    logger.info(
+        "Retrieval stage timings (ms): %s; arm overlap saved %.1f ms",
+        retrieval.timings_ms, retrieval.overlap_saved_ms,
+    )
+    retrieved = retrieval.chunks
+    is_multihop_query = retrieval.is_multihop
+    intent_covered = retrieval.intent_covered
     if is_multihop_query:
-        # ── Multi-hop pipeline: per-intent retrieval + coverage ───
-        retrieved, intent_covered = retrieve_multihop(
-            body.question, intents,
-            pool_size=MULTIHOP_POOL_SIZE,
-            top_k=MULTIHOP_TOP_K,
-        )
         logger.info(
             "Multi-hop retrieval: %d intents, coverage=%s, %d chunks",
-            len(intents), intent_covered, len(retrieved),
-        )
-    else:
-        # ── Standard retrieval pipeline ───────────────────────────
-        query_variants = expand_query_variants(body.question)
-        if not query_variants:
-            return QueryResponse(answer=None, citations=[])
-
-        is_multi_variant = len(query_variants) > 1
-        is_list_query = is_list_style(body.question)
-        # When reranking is on, widen the candidate pool so the
-        # cross-encoder can pick the best top_k from a larger set.
-        if RERANK_ENABLED:
-            dense_fetch_k = max(RERANK_POOL_SIZE, body.top_k * (3 if is_multi_variant else 1))
-        else:
-            dense_fetch_k = max(body.top_k * (3 if is_multi_variant else 1), body.top_k)
-        candidate_top_k = dense_fetch_k
-        base_per_doc_limit = 1 if is_multi_variant else MAX_CHUNKS_PER_DOC
-        per_doc_limit = max(base_per_doc_limit, min(body.top_k, 2)) if is_list_query else base_per_doc_limit
-
-        dense_runs: list[list[RetrievedChunk]] = []
-        for variant in query_variants:
-            embedding = embed_texts([variant])[0]
-            dense_runs.append(
-                query_chunks(embedding, top_k=dense_fetch_k, question=variant),
-            )
-
-        retrieved = fuse_vector_runs(
-            body.question,
-            dense_runs,
-            top_k=candidate_top_k,
-            max_per_doc=per_doc_limit,
+            len(retrieval.intents), intent_covered, len(retrieved),
         )
 
-        if HYBRID_ENABLED:
-            bm25_idx = get_bm25_index()
-            if bm25_idx.ready:
-                bm25_runs = [
-                    bm25_idx.query(variant, top_k=dense_fetch_k * 2)
-                    for variant in query_variants
-                ]
-                bm25_hits = fuse_bm25_runs(bm25_runs, top_k=dense_fetch_k * 3)
-                retrieved = hybrid_merge(
-                    retrieved,
-                    bm25_hits,
-                    bm25_idx,
-                    top_k=candidate_top_k,
-                    max_per_doc=per_doc_limit,
-                )
-
-        if RERANK_ENABLED and len(retrieved) > 1:
-            retrieved = rerank_chunks(body.question, retrieved, top_k=body.top_k)
-
-        if is_multi_variant:
-            retrieved = select_multi_hop_contexts(body.question, retrieved, top_k=body.top_k)
-        else:
-            retrieved = retrieved[:body.top_k]
-
     retrieved_count = len(retrieved)
     max_score = max((chunk.score for chunk in retrieved), default=None)
     token_overlap = _question_context_overlap(body.question, retrieved)
@@ -404,7 +724,7 @@ def query(body: QueryRequest) -> QueryResponse:
         )
 
     # 4. Generate answer with LLM ──────────────────────────────────────
-    result = generate_answer(body.question, retrieved)
+    result = await generate_answer_async(body.question, retrieved)
 
     # 5. If LLM generation is unavailable/failed, preserve strict null contract.
     if result.answer is None:
@@ -428,7 +748,7 @@ def query(body: QueryRequest) -> QueryResponse:
         if accept_refusal and is_multihop_query and intent_covered and all(intent_covered):
             logger.info(
                 "Multi-hop null guard: all %d intents covered, overriding refusal",
-                len(intents),
+                len(retrieval.intents),
             )
             accept_refusal = False
 
@@ -494,15 +814,79 @@ def query(body: QueryRequest) -> QueryResponse:
     )
 
     # ── Cache store (success path) ────────────────────────────────────
-    if query_cache is not None:
-        query_cache.set(
-            body.question, body.top_k, response.model_dump(),
-            include_context=body.include_context,
-        )
+    await _cache_set(body, response.model_dump(), retrieval)
 
     return response
 
 
+def _retrieval_pipeline() -> RetrievalPipeline:
+    """Retrieval stages for /query, /query/stream and the agent.
+
+    Built per request so stages follow this module's current settings.
+    """
+    pool_stages: list[Stage] = [
+        RetrieveStage(
+            _embed_queries,
+            _dense_search,
+            get_index=get_bm25_index if HYBRID_ENABLED else None,
+            deadline_sec=RETRIEVAL_DEADLINE_MS / 1000 if RETRIEVAL_DEADLINE_MS > 0 else None,
+        ),
+    ]
+    if RERANK_ENABLED:
+        pool_stages.append(RerankStage(functools.partial(rerank_chunks, strict=True)))
+    if retrieval_cache is not None:
+        signature = f"model={EMBEDDING_MODEL}|hybrid={int(HYBRID_ENABLED)}|rerank={int(RERANK_ENABLED)}"
+        pool_stages = [PoolCacheStage(retrieval_cache, pool_stages, signature=signature)]
+
+    stages: list[Stage] = [
+        PlanStage(extract_intents, rerank_enabled=RERANK_ENABLED, rerank_pool_size=RERANK_POOL_SIZE),
+        MultihopStage(retrieve_multihop, pool_size=MULTIHOP_POOL_SIZE, top_k=MULTIHOP_TOP_K),
+        *pool_stages,
+        SelectStage(),
+    ]
+    return RetrievalPipeline(stages, corpus=get_corpus_version())
+
+
+async def _embed_queries(texts: list[str]) -> list[list[float]]:
+    """Embed query variants in one batch on the CPU executor."""
+    return await run_cpu(embed_texts, texts)
+
+
+async def _dense_search(
+    groups: list[tuple[list[str], int]], vectors: dict[str, list[float]],
+) -> list[list[list[RetrievedChunk]]]:
+    """Run one dense lookup per group with the variants' precomputed *vectors*.
+
+    *groups* are ``(variants, top_k)`` pairs; the result holds one run per
+    variant, per group.  A remote Chroma is queried through its async
+    client; the embedded client has no async API and runs on the CPU
+    executor instead.
+    """
+    if CHROMA_HOST:
+        return list(await asyncio.gather(*(
+            query_chunks_many_async([vectors[v] for v in variants], top_k=top_k, questions=variants)
+            for variants, top_k in groups
+        )))
+    return await run_cpu(lambda: [
+        query_chunks_many([vectors[v] for v in variants], top_k=top_k, questions=variants)
+        for variants, top_k in groups
+    ])
+
+
+def _load_ingest_manifest(force: bool = False) -> IngestManifest | None:
+    """Return the ingest manifest, or ``None`` when disabled.
+
+    An empty collection means the stored vectors are gone (new Chroma dir,
+    wiped server), so the recorded files no longer count as ingested.
+    """
+    if not INGEST_MANIFEST_ENABLED:
+        return None
+    manifest = IngestManifest.load(Path(INGEST_MANIFEST_PATH))
+    if force or (len(manifest) and get_collection().count() == 0):
+        manifest.clear()
+    return manifest
+
+
 def _format_retrieved(chunks: list[RetrievedChunk]) -> list[RetrievedChunkResponse]:
     """Convert retrieved chunks to response format."""
     return [
@@ -589,7 +973,7 @@ def _sse_event(event: str, data: dict) -> str:
 
 
 @app.post("/query/stream")
-def query_stream(body: QueryRequest):
+async def query_stream(body: QueryRequest):
     """Stream answer tokens via Server-Sent Events.
 
     Events emitted:
@@ -598,78 +982,20 @@ def query_stream(body: QueryRequest):
       ``done``   — ``{"answer": "...", "citations": [...]}``
     """
 
-    def event_generator():
+    async def event_generator():
         # ── Cache check ──────────────────────────────────────────
-        if query_cache is not None:
-            cached = query_cache.get(
-                body.question, body.top_k, include_context=body.include_context,
-            )
-            if cached is not None:
-                logger.info("Stream cache HIT for: %s", body.question[:60])
-                yield _sse_event("cached", {**cached, "cache_hit": True})
-                return
+        cached = await _cache_get(body)
+        if cached is not None:
+            logger.info("Stream cache HIT for: %s", body.question[:60])
+            yield _sse_event("cached", {**cached, "cache_hit": True})
+            return
 
         # 1. Retrieve ─────────────────────────────────────────────
-        intents = extract_intents(body.question)
-
-        if intents:
-            # ── Multi-hop pipeline ───────────────────────────────
-            retrieved, _ = retrieve_multihop(
-                body.question, intents,
-                pool_size=MULTIHOP_POOL_SIZE,
-                top_k=MULTIHOP_TOP_K,
-            )
-        else:
-            # ── Standard pipeline ────────────────────────────────
-            query_variants = expand_query_variants(body.question)
-            if not query_variants:
-                yield _sse_event("done", {"answer": None, "citations": []})
-                return
-            is_multi_variant = len(query_variants) > 1
-            is_list_query = is_list_style(body.question)
-            if RERANK_ENABLED:
-                dense_fetch_k = max(RERANK_POOL_SIZE, body.top_k * (3 if is_multi_variant else 1))
-            else:
-                dense_fetch_k = max(body.top_k * (3 if is_multi_variant else 1), body.top_k)
-            candidate_top_k = dense_fetch_k
-            base_per_doc_limit = 1 if is_multi_variant else MAX_CHUNKS_PER_DOC
-            per_doc_limit = max(base_per_doc_limit, min(body.top_k, 2)) if is_list_query else base_per_doc_limit
-
-            dense_runs: list[list[RetrievedChunk]] = []
-            for variant in query_variants:
-                embedding = embed_texts([variant])[0]
-                dense_runs.append(
-                    query_chunks(embedding, top_k=dense_fetch_k, question=variant),
-                )
-            retrieved = fuse_vector_runs(
-                body.question,
-                dense_runs,
-                top_k=candidate_top_k,
-                max_per_doc=per_doc_limit,
-            )
-
-            if HYBRID_ENABLED:
-                bm25_idx = get_bm25_index()
-                if bm25_idx.ready:
-                    bm25_runs = [
-                        bm25_idx.query(variant, top_k=dense_fetch_k * 2)
-                        for variant in query_variants
-                    ]
-                    bm25_hits = fuse_bm25_runs(bm25_runs, top_k=dense_fetch_k * 3)
-                    retrieved = hybrid_merge(
-                        retrieved,
-                        bm25_hits,
-                        bm25_idx,
-                        top_k=candidate_top_k,
-                        max_per_doc=per_doc_limit,
-                    )
-
-            if RERANK_ENABLED and len(retrieved) > 1:
-                retrieved = rerank_chunks(body.question, retrieved, top_k=body.top_k)
-            if is_multi_variant:
-                retrieved = select_multi_hop_contexts(body.question, retrieved, top_k=body.top_k)
-            else:
-                retrieved = retrieved[:body.top_k]
+        retrieval = await _retrieval_pipeline().run(body.question, body.top_k)
+        if not retrieval.intents and not retrieval.variants:
+            yield _sse_event("done", {"answer": None, "citations": []})
+            return
+        retrieved = retrieval.chunks
 
         # 4. No-answer gate (empty retrieval) ─────────────────────
         if not retrieved:
@@ -679,7 +1005,8 @@ def query_stream(body: QueryRequest):
 
         # 5. Stream LLM tokens ────────────────────────────────────
         final_event = None
-        for event in generate_answer_stream(body.question, retrieved):
+        # The Mistral stream is blocking; iterate it off the event loop.
+        async for event in iterate_in_threadpool(generate_answer_stream(body.question, retrieved)):
             if event["type"] == "token":
                 yield _sse_event("token", {"token": event["token"]})
             elif event["type"] == "done":
@@ -697,11 +1024,7 @@ def query_stream(body: QueryRequest):
         yield _sse_event("done", result)
 
         # Cache store
-        if query_cache is not None:
-            query_cache.set(
-                body.question, body.top_k, result,
-                include_context=body.include_context,
-            )
+        await _cache_set(body, result, retrieval)
 
     return StreamingResponse(
         event_generator(),
@@ -780,8 +1103,9 @@ def ui():
 
 @app.post("/cache/clear", include_in_schema=False)
 def cache_clear():
-    """Clear the query cache. Returns number of evicted entries."""
+    """Clear the query and retrieval caches. Returns number of evicted entries."""
+    pools = retrieval_cache.clear() if retrieval_cache is not None else 0
     if query_cache is not None:
         n = query_cache.clear()
-        return {"cleared": n}
-    return {"cleared": 0, "reason": "cache disabled"}
+        return {"cleared": n, "retrieval_cleared": pools}
+    return {"cleared": 0, "retrieval_cleared": pools, "reason": "cache disabled"}
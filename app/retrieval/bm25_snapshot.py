@@ -0,0 +1,343 @@
+"""Binary snapshot format for the BM25 index, loaded with ``mmap``.
+
+Layout (all integers native-endian, sections 8-byte aligned)::
+
+    b"BM25SNP1" | u64 header_len | header JSON | sections...
+
+The JSON header carries the format version, the collection fingerprint the
+snapshot was built from, BM25 parameters, counters and the ``[offset,
+length]`` of each section:
+
+    terms        NUL-joined vocabulary (UTF-8)
+    term_ptr     u64[n_terms + 1]  postings offsets per term
+    post_slots   u32[nnz]          doc slots, ascending within each term
+    post_tfs     u32[nnz]          term frequencies
+    doc_lens     u32[n_slots]      token count per slot (0 = tombstone)
+    chunk_ids    NUL-joined chunk IDs per slot ("" = tombstone)
+    rec_ptr      u64[n_slots + 1]  offsets into ``records``
+    records      concatenated per-slot JSON chunk records
+
+Postings and chunk records stay in the mapped file and are only decoded on
+access, so every uvicorn worker shares the same page-cache pages.  Terms and
+records touched by an incremental update are copied into private arrays /
+dicts on first write (copy-on-write).
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import mmap
+import os
+import sys
+from array import array
+from collections.abc import Iterator, MutableMapping
+from dataclasses import dataclass
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"BM25SNP1"
+FORMAT_VERSION = 1
+_ALIGN = 8
+
+
+# ── Mapped containers ─────────────────────────────────────────────────
+
+
+class MappedPostings(MutableMapping):
+    """``term → (doc_slots, tfs)`` backed by mapped arrays, copy-on-write."""
+
+    def __init__(
+        self,
+        terms: list[str],
+        term_ptr: memoryview,
+        post_slots: memoryview,
+        post_tfs: memoryview,
+    ) -> None:
+        self._rows: dict[str, int] = dict(zip(terms, range(len(terms))))
+        self._ptr = term_ptr
+        self._slots = post_slots
+        self._tfs = post_tfs
+        self._overlay: dict[str, tuple[array, array]] = {}
+        self._deleted: set[str] = set()
+
+    def __getitem__(self, term: str) -> tuple:
+        plist = self._overlay.get(term)
+        if plist is not None:
+            return plist
+        if term in self._deleted:
+            raise KeyError(term)
+        row = self._rows[term]
+        lo, hi = self._ptr[row], self._ptr[row + 1]
+        return self._slots[lo:hi], self._tfs[lo:hi]
+
+    def __setitem__(self, term: str, plist: tuple[array, array]) -> None:
+        self._overlay[term] = plist
+        self._deleted.discard(term)
+
+    def __delitem__(self, term: str) -> None:
+        if term not in self:
+            raise KeyError(term)
+        self._overlay.pop(term, None)
+        if term in self._rows:
+            self._deleted.add(term)
+
+    def __contains__(self, term: object) -> bool:
+        if term in self._overlay:
+            return True
+        return term in self._rows and term not in self._deleted
+
+    def __iter__(self) -> Iterator[str]:
+        for term in self._rows:
+            if term not in self._deleted and term not in self._overlay:
+                yield term
+        yield from self._overlay
+
+    def __len__(self) -> int:
+        shadowed = sum(1 for t in self._overlay if t in self._rows and t not in self._deleted)
+        return len(self._rows) - len(self._deleted) + len(self._overlay) - shadowed
+
+    def mutable(self, term: str) -> tuple[array, array]:
+        """Return writable postings for *term*, copying them out of the map."""
+        plist = self._overlay.get(term)
+        if plist is None:
+            slots, tfs = self[term]
+            plist = (array("I", slots), array("I", tfs))
+            self._overlay[term] = plist
+        return plist
+
+    @property
+    def pristine(self) -> bool:
+        return not self._overlay and not self._deleted
+
+    def flat(self) -> tuple[memoryview, memoryview, memoryview]:
+        """``(term_ptr, post_slots, post_tfs)`` of the untouched mapping."""
+        return self._ptr, self._slots, self._tfs
+
+
+class MappedRecords(MutableMapping):
+    """``chunk_id → record dict`` decoded lazily from the mapped file."""
+
+    def __init__(
+        self,
+        slots: dict[str, int],
+        rec_ptr: memoryview,
+        records: memoryview,
+    ) -> None:
+        self._slot_of = dict(slots)
+        self._ptr = rec_ptr
+        self._records = records
+        self._overlay: dict[str, dict] = {}
+        self._deleted: set[str] = set()
+
+    def __getitem__(self, chunk_id: str) -> dict:
+        rec = self._overlay.get(chunk_id)
+        if rec is not None:
+            return rec
+        if chunk_id in self._deleted:
+            raise KeyError(chunk_id)
+        slot = self._slot_of[chunk_id]
+        return json.loads(bytes(self._records[self._ptr[slot]:self._ptr[slot + 1]]))
+
+    def __setitem__(self, chunk_id: str, record: dict) -> None:
+        self._overlay[chunk_id] = record
+        self._deleted.discard(chunk_id)
+
+    def __delitem__(self, chunk_id: str) -> None:
+        if chunk_id not in self:
+            raise KeyError(chunk_id)
+        self._overlay.pop(chunk_id, None)
+        if chunk_id in self._slot_of:
+            self._deleted.add(chunk_id)
+
+    def __contains__(self, chunk_id: object) -> bool:
+        if chunk_id in self._overlay:
+            return True
+        return chunk_id in self._slot_of and chunk_id not in self._deleted
+
+    def __iter__(self) -> Iterator[str]:
+        for cid in self._slot_of:
+            if cid not in self._deleted and cid not in self._overlay:
+                yield cid
+        yield from self._overlay
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+# ── Snapshot I/O ──────────────────────────────────────────────────────
+
+
+@dataclass
+class SnapshotData:
+    """Index state read back from a snapshot file."""
+
+    postings: MappedPostings
+    doc_lens: array
+    chunk_ids: list[str]
+    chunk_map: MappedRecords
+    total_len: int
+    n_docs: int
+    mapping: mmap.mmap
+
+
+def _u64(values) -> bytes:
+    return array("Q", values).tobytes()
+
+
+def write_snapshot(
+    path: Path,
+    fingerprint: str,
+    *,
+    k1: float,
+    b: float,
+    postings,
+    doc_lens: array,
+    chunk_ids: list[str],
+    chunk_map,
+    total_len: int,
+    n_docs: int,
+) -> int:
+    """Serialise index state to *path* atomically. Returns bytes written."""
+    terms = list(postings.keys())
+    term_ptr = [0]
+    slot_parts: list[bytes] = []
+    tf_parts: list[bytes] = []
+    for term in terms:
+        slots, tfs = postings[term]
+        slot_parts.append(array("I", slots).tobytes())
+        tf_parts.append(array("I", tfs).tobytes())
+        term_ptr.append(term_ptr[-1] + len(slots))
+
+    rec_ptr = [0]
+    rec_parts: list[bytes] = []
+    for cid in chunk_ids:
+        raw = json.dumps(chunk_map[cid], separators=(",", ":")).encode() if cid else b""
+        rec_parts.append(raw)
+        rec_ptr.append(rec_ptr[-1] + len(raw))
+
+    sections = {
+        "terms": "\0".join(terms).encode(),
+        "term_ptr": _u64(term_ptr),
+        "post_slots": b"".join(slot_parts),
+        "post_tfs": b"".join(tf_parts),
+        "doc_lens": array("I", doc_lens).tobytes(),
+        "chunk_ids": "\0".join(chunk_ids).encode(),
+        "rec_ptr": _u64(rec_ptr),
+        "records": b"".join(rec_parts),
+    }
+    header = {
+        "version": FORMAT_VERSION,
+        "fingerprint": fingerprint,
+        "byteorder": sys.byteorder,
+        "k1": k1,
+        "b": b,
+        "n_terms": len(terms),
+        "n_slots": len(chunk_ids),
+        "n_docs": n_docs,
+        "total_len": total_len,
+        "sections": {},
+    }
+
+    # Two passes: section offsets depend on the header length.
+    offsets: dict[str, list[int]] = {}
+    for _ in range(2):
+        header["sections"] = offsets
+        header_raw = json.dumps(header).encode()
+        pos = _aligned(len(MAGIC) + 8 + len(header_raw))
+        offsets = {}
+        for name, blob in sections.items():
+            offsets[name] = [pos, len(blob)]
+            pos = _aligned(pos + len(blob))
+    header["sections"] = offsets
+    header_raw = json.dumps(header).encode()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as fh:
+        fh.write(MAGIC)
+        fh.write(len(header_raw).to_bytes(8, sys.byteorder))
+        fh.write(header_raw)
+        for name, blob in sections.items():
+            fh.write(b"\0" * (offsets[name][0] - fh.tell()))
+            fh.write(blob)
+        size = fh.tell()
+    # Atomic swap: workers that still map the old file keep a valid inode.
+    os.replace(tmp, path)
+    return size
+
+
+def read_snapshot(
+    path: Path,
+    fingerprint: str,
+    *,
+    k1: float,
+    b: float,
+) -> SnapshotData | None:
+    """Map *path* and return its index state, or ``None`` if unusable."""
+    try:
+        with open(path, "rb") as fh:
+            mapping = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        if mapping[: len(MAGIC)] != MAGIC:
+            logger.warning("BM25 snapshot %s has a bad magic header — ignoring", path)
+            return None
+        header_len = int.from_bytes(mapping[len(MAGIC) : len(MAGIC) + 8], sys.byteorder)
+        start = len(MAGIC) + 8
+        header = json.loads(mapping[start : start + header_len])
+    except ValueError:
+        logger.warning("BM25 snapshot %s is corrupt — ignoring", path)
+        return None
+
+    if (
+        header.get("version") != FORMAT_VERSION
+        or header.get("byteorder") != sys.byteorder
+        or header.get("k1") != k1
+        or header.get("b") != b
+    ):
+        logger.info("BM25 snapshot %s was written with other settings — ignoring", path)
+        return None
+    if header.get("fingerprint") != fingerprint:
+        logger.info("BM25 snapshot %s is stale (collection changed) — ignoring", path)
+        return None
+
+    view = memoryview(mapping)
+    sec = header["sections"]
+
+    def raw(name: str) -> memoryview:
+        offset, length = sec[name]
+        return view[offset : offset + length]
+
+    def text_list(name: str, count: int) -> list[str]:
+        if count == 0:
+            return []
+        return bytes(raw(name)).decode().split("\0")
+
+    terms = text_list("terms", header["n_terms"])
+    chunk_ids = text_list("chunk_ids", header["n_slots"])
+    slots = {cid: i for i, cid in enumerate(chunk_ids) if cid}
+    doc_lens = array("I")
+    doc_lens.frombytes(raw("doc_lens"))
+
+    return SnapshotData(
+        postings=MappedPostings(
+            terms,
+            raw("term_ptr").cast("Q"),
+            raw("post_slots").cast("I"),
+            raw("post_tfs").cast("I"),
+        ),
+        doc_lens=doc_lens,
+        chunk_ids=chunk_ids,
+        chunk_map=MappedRecords(slots, raw("rec_ptr").cast("Q"), raw("records")),
+        total_len=header["total_len"],
+        n_docs=header["n_docs"],
+        mapping=mapping,
+    )
+
+
+def _aligned(pos: int) -> int:
+    return (pos + _ALIGN - 1) // _ALIGN * _ALIGN
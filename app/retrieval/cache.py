@@ -1,45 +1,257 @@
-"""In-memory TTL cache for query responses.
+"""In-memory TTL caches for query responses and retrieval candidate pools.
 
-Thread-safe, bounded by entry count, with automatic eviction of
-expired entries on ``set()``.
+Thread-safe LRU bounded by entry count and by the serialised size of the
+stored responses (``include_context`` answers carry chunk texts and can be
+large).  Expired entries are dropped when read and by an optional
+background sweeper; evictions are counted per reason.
+
+Entries are tagged with the corpus generation they were computed at and
+the doc_ids they were built from; once ``/ingest`` changes one of those
+docs the entry is stale (see :mod:`app.retrieval.corpus_version`).
+
+With an *embed* function the cache gets a semantic tier: every stored
+question's embedding goes into a small in-memory vector index, and an
+exact-key miss falls back to the most similar cached question (same
+``top_k`` / ``include_context``) whose cosine similarity reaches the
+threshold.  Paraphrases then share one answer instead of each paying for
+an LLM call.  Embeddings barely move for a flipped negation, a different
+number or a different product name, so a semantic match must also agree
+on those (:class:`_QuestionGuard`).  Embedding can block, so callers on an
+event loop should run ``get()`` / ``set()`` off it when the tier is on.
 """
 
 from __future__ import annotations
 
 import hashlib
+import json
 import logging
+import re
 import threading
 import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from app.db.chroma import RetrievedChunk
+    from app.retrieval.corpus_version import CorpusVersion
 
 logger = logging.getLogger(__name__)
 
-MAX_ENTRIES = 2048  # hard cap to avoid unbounded memory growth
+MAX_ENTRIES = 2048               # default entry cap
+MAX_BYTES = 64 * 1024 * 1024     # default budget for stored responses (serialised JSON)
+
+EmbedFn = Callable[[list[str]], list[list[float]]]
+
+_COUNTERS = (
+    "exact_hits", "semantic_hits", "misses",
+    "evictions_expired", "evictions_entries", "evictions_bytes", "evictions_stale",
+)
+
+
+_WORD = re.compile(r"[A-Za-z][A-Za-z0-9]*(?:'[A-Za-z]+)?|\d+(?:\.\d+)?")
+_NEGATIONS = frozenset({"not", "no", "never", "none", "nor", "without", "cannot"})
+
+
+@dataclass(frozen=True)
+class _QuestionGuard:
+    """Meaning-bearing details a semantic match must agree on.
+
+    Two questions are compatible when both or neither are negated, they
+    mention the same numbers, and every name in one (a capitalised word
+    after the first, an acronym, a mixed-case word) appears in the other.
+    """
+
+    negated: bool
+    numbers: frozenset[str]
+    names: frozenset[str]
+    words: frozenset[str]
+
+    @classmethod
+    def from_question(cls, question: str) -> _QuestionGuard:
+        tokens = _WORD.findall(question)
+        words = [t.lower().removesuffix("'s") for t in tokens]
+        return cls(
+            negated=any(w in _NEGATIONS or w.endswith("n't") for w in words),
+            numbers=frozenset(w for w in words if w[0].isdigit()),
+            names=frozenset(w for i, (t, w) in enumerate(zip(tokens, words)) if _is_name(t, i)),
+            words=frozenset(words),
+        )
+
+    def compatible(self, other: _QuestionGuard) -> bool:
+        return (
+            self.negated == other.negated
+            and self.numbers == other.numbers
+            and self.names <= other.words
+            and other.names <= self.words
+        )
+
+
+def _is_name(token: str, position: int) -> bool:
+    if not token[0].isalpha() or len(token) < 2:
+        return False
+    if token.isupper() or token[1:] != token[1:].lower():   # AWS, S3, PrivateLink
+        return True
+    return position > 0 and token[0].isupper()              # Titan (not a sentence-initial "Does")
+
+
+@dataclass
+class _Entry:
+    stored_at: float
+    data: dict
+    nbytes: int
+    generation: int              # corpus generation the response was computed at
+    doc_ids: frozenset[str]      # docs it was built from
+
+
+class _QuestionIndex:
+    """Unit-normalised question vectors in reusable matrix slots.
+
+    Not thread-safe on its own; :class:`QueryCache` calls it under its lock.
+    """
+
+    def __init__(self, capacity: int = 64) -> None:
+        self._capacity = capacity
+        self._matrix: np.ndarray | None = None       # allocated on first add
+        self._top_k = np.zeros(capacity, dtype=np.int64)
+        self._with_context = np.zeros(capacity, dtype=bool)
+        self._keys: list[str | None] = []
+        self._guards: list[_QuestionGuard | None] = []
+        self._slots: dict[str, int] = {}
+        self._free: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def add(
+        self, key: str, vector: np.ndarray, top_k: int, include_context: bool, guard: _QuestionGuard,
+    ) -> None:
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._free.pop() if self._free else self._grow()
+            self._slots[key] = slot
+            self._keys[slot] = key
+        self._guards[slot] = guard
+        if self._matrix is None:
+            self._matrix = np.zeros((self._capacity, vector.shape[0]), dtype=np.float32)
+        self._matrix[slot] = vector
+        self._top_k[slot] = top_k
+        self._with_context[slot] = include_context
+
+    def remove(self, key: str) -> None:
+        slot = self._slots.pop(key, None)
+        if slot is None:
+            return
+        self._keys[slot] = None
+        self._guards[slot] = None
+        self._top_k[slot] = -1     # out of every scope until reused
+        self._free.append(slot)
+
+    def clear(self) -> None:
+        self.__init__(self._capacity)
+
+    def nearest(
+        self, vector: np.ndarray, top_k: int, include_context: bool,
+        min_score: float, guard: _QuestionGuard,
+    ) -> tuple[str, float] | None:
+        """Most similar compatible question with the same scope, as ``(key, cosine)``.
+
+        Only questions at or above *min_score* whose guard is compatible
+        with *guard* qualify.
+        """
+        if not self._slots or self._matrix is None:
+            return None
+        n = len(self._keys)
+        sims = self._matrix[:n] @ vector
+        in_scope = (self._top_k[:n] == top_k) & (self._with_context[:n] == include_context)
+        candidates = np.flatnonzero(in_scope & (sims >= min_score))
+        for slot in candidates[np.argsort(-sims[candidates], kind="stable")]:
+            stored = self._guards[slot]
+            if stored is not None and stored.compatible(guard):
+                return self._keys[slot], float(sims[slot])
+        return None
+
+    def _grow(self) -> int:
+        slot = len(self._keys)
+        if slot == self._capacity:
+            self._capacity *= 2
+            if self._matrix is not None:
+                grown = np.zeros((self._capacity, self._matrix.shape[1]), dtype=np.float32)
+                grown[:slot] = self._matrix
+                self._matrix = grown
+            self._top_k = np.resize(self._top_k, self._capacity)
+            self._with_context = np.resize(self._with_context, self._capacity)
+        self._keys.append(None)
+        self._guards.append(None)
+        return slot
 
 
 class QueryCache:
-    """Thread-safe in-memory cache with TTL expiration."""
+    """Thread-safe in-memory LRU cache with TTL expiration.
+
+    Bounded by *max_entries* and by *max_bytes* of stored responses,
+    measured as their JSON size; the least recently used entries go first.
+    Pass *embed* (e.g. ``embed_texts``) to enable the semantic tier;
+    *semantic_threshold* is the minimum cosine similarity for a hit.
+    With *corpus*, entries whose source docs were re-ingested are dropped.
 
-    def __init__(self, ttl_sec: int = 300) -> None:
-        self._cache: dict[str, tuple[float, dict]] = {}
+    Storage goes through the ``_lookup`` / ``_store`` / ``_nearest`` /
+    ``_count`` hooks so a shared backend can subclass it
+    (see :mod:`app.retrieval.cache_sqlite`).
+    """
+
+    def __init__(
+        self,
+        ttl_sec: int = 300,
+        embed: EmbedFn | None = None,
+        semantic_threshold: float = 0.95,
+        max_entries: int = MAX_ENTRIES,
+        max_bytes: int = MAX_BYTES,
+        corpus: CorpusVersion | None = None,
+    ) -> None:
+        self._cache: OrderedDict[str, _Entry] = OrderedDict()   # order = recency of use
+        self._corpus = corpus
         self._ttl = ttl_sec
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._bytes = 0
         self._lock = threading.Lock()
-        self._hits = 0
-        self._misses = 0
+        self._counters = dict.fromkeys(_COUNTERS, 0)
+        self._embed = embed
+        self._semantic_threshold = semantic_threshold
+        self._index = _QuestionIndex() if embed is not None else None
+        self._sweeper: threading.Thread | None = None
+        self._stop_sweeper = threading.Event()
 
     # ── stats ──────────────────────────────────────────────────────
 
     @property
     def hits(self) -> int:
-        return self._hits
+        return self._counters["exact_hits"]
+
+    @property
+    def semantic_hits(self) -> int:
+        return self._counters["semantic_hits"]
 
     @property
     def misses(self) -> int:
-        return self._misses
+        return self._counters["misses"]
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self._index is not None
 
     @property
     def size(self) -> int:
         return len(self._cache)
 
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
     # ── key generation ─────────────────────────────────────────────
 
     @staticmethod
@@ -56,55 +268,357 @@ class QueryCache:
     def get(
         self, question: str, top_k: int, include_context: bool = False,
     ) -> dict | None:
-        """Return cached response dict, or ``None`` on miss / expiry."""
+        """Return cached response dict, or ``None`` on miss / expiry.
+
+        An exact-key miss falls back to the semantic tier when enabled.
+        """
         key = self._make_key(question, top_k, include_context)
-        with self._lock:
-            entry = self._cache.get(key)
-            if entry is None:
-                self._misses += 1
-                return None
-            ts, data = entry
-            if time.time() - ts > self._ttl:
-                del self._cache[key]
-                self._misses += 1
-                return None
-            self._hits += 1
+        data = self._lookup(key)
+        if data is not None:
+            self._count("exact_hits")
             logger.debug("Cache HIT (key=%s…)", key[:12])
             return data
 
+        if self._index is not None and self._has_vectors():
+            match = self._nearest(
+                self._embed_question(question), top_k, include_context,
+                _QuestionGuard.from_question(question),
+            )
+            if match is not None:
+                data = self._lookup(match[0])
+                if data is not None:
+                    self._count("semantic_hits")
+                    logger.debug("Semantic cache HIT (cosine=%.3f)", match[1])
+                    return data
+        self._count("misses")
+        return None
+
     def set(
-        self, question: str, top_k: int, data: dict, include_context: bool = False,
+        self,
+        question: str,
+        top_k: int,
+        data: dict,
+        include_context: bool = False,
+        doc_ids: Iterable[str] = (),
+        generation: int | None = None,
     ) -> None:
-        """Store a response in the cache."""
+        """Store a response, evicting least recently used entries over budget.
+
+        *doc_ids* are the docs the response was built from and *generation*
+        the corpus generation read before retrieval (default: current).
+        A response larger than the whole byte budget is not stored.
+        """
         key = self._make_key(question, top_k, include_context)
-        with self._lock:
-            # Lazy eviction of expired entries when cache grows large
-            if len(self._cache) >= MAX_ENTRIES:
-                self._evict_expired_locked()
-            self._cache[key] = (time.time(), data)
+        encoded = json.dumps(data, separators=(",", ":"), default=str).encode()
+        vector = self._embed_question(question) if self._index is not None else None
+        if generation is None:
+            generation = self._corpus.generation if self._corpus is not None else 0
+        doc_ids = frozenset(doc_ids)
+        if self._corpus is not None and not self._corpus.is_fresh(generation, doc_ids):
+            # A source doc was re-ingested while this answer was being produced.
+            self._count("evictions_stale")
+            return
+        self._store(
+            key, data, encoded, vector, top_k, include_context,
+            generation=generation, doc_ids=doc_ids, question=question,
+        )
 
     def clear(self) -> int:
         """Remove all entries. Returns the number removed."""
         with self._lock:
             n = len(self._cache)
             self._cache.clear()
+            self._bytes = 0
+            if self._index is not None:
+                self._index.clear()
             return n
 
+    def sweep(self) -> int:
+        """Drop every expired or stale entry. Returns the number removed."""
+        with self._lock:
+            removed = self._evict_expired_locked()
+            if self._corpus is not None:
+                stale = [k for k, e in self._cache.items() if not self._is_fresh(e)]
+                for k in stale:
+                    self._remove_locked(k)
+                self._counters["evictions_stale"] += len(stale)
+                removed += len(stale)
+            return removed
+
+    def start_sweeper(self, interval_sec: float) -> None:
+        """Run :meth:`sweep` every *interval_sec* on a daemon thread."""
+        if self._sweeper is not None or interval_sec <= 0:
+            return
+        self._stop_sweeper.clear()
+
+        def _loop() -> None:
+            while not self._stop_sweeper.wait(interval_sec):
+                removed = self.sweep()
+                if removed:
+                    logger.debug("Query cache sweep removed %d expired entries", removed)
+
+        self._sweeper = threading.Thread(target=_loop, name="query-cache-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self) -> None:
+        if self._sweeper is None:
+            return
+        self._stop_sweeper.set()
+        self._sweeper.join()
+        self._sweeper = None
+
     def stats(self) -> dict:
         """Return cache statistics."""
+        with self._lock:
+            return self._format_stats(len(self._cache), self._bytes, dict(self._counters))
+
+    # ── storage hooks ──────────────────────────────────────────────
+
+    def _lookup(self, key: str) -> dict | None:
+        """Fresh entry data for *key*, marked recently used; drops it if expired."""
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry.stored_at > self._ttl:
+                self._remove_locked(key)
+                self._counters["evictions_expired"] += 1
+                return None
+            if not self._is_fresh(entry):
+                self._remove_locked(key)
+                self._counters["evictions_stale"] += 1
+                return None
+            self._cache.move_to_end(key)
+            return entry.data
+
+    def _store(
+        self, key: str, data: dict, encoded: bytes,
+        vector: np.ndarray | None, top_k: int, include_context: bool,
+        generation: int, doc_ids: frozenset[str], question: str,
+    ) -> None:
+        nbytes = len(encoded)
+        with self._lock:
+            if key in self._cache:
+                self._remove_locked(key)
+            if nbytes > self._max_bytes:
+                self._counters["evictions_bytes"] += 1
+                logger.debug("Response of %d bytes exceeds the cache budget; not cached", nbytes)
+                return
+            while self._cache and len(self._cache) >= self._max_entries:
+                self._evict_lru_locked("evictions_entries")
+            while self._cache and self._bytes + nbytes > self._max_bytes:
+                self._evict_lru_locked("evictions_bytes")
+            self._cache[key] = _Entry(time.time(), data, nbytes, generation, doc_ids)
+            self._bytes += nbytes
+            if vector is not None:
+                self._index.add(
+                    key, vector, top_k, include_context, _QuestionGuard.from_question(question),
+                )
+
+    def _has_vectors(self) -> bool:
+        """Whether a semantic lookup can match at all (skips embedding if not)."""
+        with self._lock:
+            return len(self._index) > 0
+
+    def _nearest(
+        self, vector: np.ndarray, top_k: int, include_context: bool, guard: _QuestionGuard,
+    ) -> tuple[str, float] | None:
+        with self._lock:
+            return self._index.nearest(vector, top_k, include_context, self._semantic_threshold, guard)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    # ── internal ───────────────────────────────────────────────────
+
+    def _format_stats(self, size: int, nbytes: int, counters: dict[str, int]) -> dict:
         return {
-            "size": self.size,
-            "hits": self._hits,
-            "misses": self._misses,
+            "size": size,
+            "max_entries": self._max_entries,
+            "bytes": nbytes,
+            "max_bytes": self._max_bytes,
+            "hits": counters["exact_hits"] + counters["semantic_hits"],
+            **counters,
             "ttl_sec": self._ttl,
+            "semantic_threshold": self._semantic_threshold if self._index is not None else None,
+            "corpus_generation": self._corpus.generation if self._corpus is not None else None,
         }
 
-    # ── internal ───────────────────────────────────────────────────
+    def _remove_locked(self, key: str) -> None:
+        self._bytes -= self._cache.pop(key).nbytes
+        if self._index is not None:
+            self._index.remove(key)
+
+    def _evict_lru_locked(self, counter: str) -> None:
+        self._remove_locked(next(iter(self._cache)))
+        self._counters[counter] += 1
 
     def _evict_expired_locked(self) -> int:
         """Remove expired entries (caller must hold self._lock)."""
         now = time.time()
-        expired = [k for k, (ts, _) in self._cache.items() if now - ts > self._ttl]
+        expired = [k for k, e in self._cache.items() if now - e.stored_at > self._ttl]
         for k in expired:
-            del self._cache[k]
+            self._remove_locked(k)
+        self._counters["evictions_expired"] += len(expired)
         return len(expired)
+
+    def _is_fresh(self, entry: _Entry) -> bool:
+        return self._corpus is None or self._corpus.is_fresh(entry.generation, entry.doc_ids)
+
+    def _embed_question(self, question: str) -> np.ndarray:
+        vector = np.asarray(self._embed([question.strip()])[0], dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+
+# ── Retrieval-stage cache ──────────────────────────────────────────────
+
+
+@dataclass
+class _PoolEntry:
+    stored_at: float
+    chunks: list[RetrievedChunk]
+    ranked: bool                 # fully reranked: any top_k is a prefix
+    generation: int
+    doc_ids: frozenset[str]
+
+
+class RetrievalCache:
+    """Thread-safe LRU of retrieval candidate pools with TTL expiration.
+
+    Holds the fused (and, with rerank on, fully reranked) pool for one
+    normalised question and pool shape, so requests that differ only in
+    ``include_context`` — or in ``top_k`` while the pool size is fixed by
+    ``RERANK_POOL_SIZE`` — and the streaming endpoint skip embedding,
+    Chroma, BM25 and rerank.  Entries are tagged like :class:`QueryCache`
+    entries and dropped once one of their docs is re-ingested.
+
+    Chunks are copied on the way in and out: later stages adjust
+    ``score`` in place, which must not leak into the stored pool or into
+    a concurrent request served from the same entry.
+    """
+
+    def __init__(
+        self,
+        ttl_sec: int = 3600,
+        max_entries: int = 1024,
+        corpus: CorpusVersion | None = None,
+    ) -> None:
+        self._entries: OrderedDict[str, _PoolEntry] = OrderedDict()
+        self._ttl = ttl_sec
+        self._max_entries = max_entries
+        self._corpus = corpus
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = {"expired": 0, "entries": 0, "stale": 0}
+
+    @staticmethod
+    def make_key(question: str, fetch_k: int, per_doc_limit: int, signature: str = "") -> str:
+        """Key of one pool: question plus everything that shapes the pool."""
+        normalised = " ".join(question.lower().split())
+        raw = f"{normalised}|fetch_k={fetch_k}|per_doc={per_doc_limit}|{signature}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key: str) -> tuple[list[RetrievedChunk], bool] | None:
+        """Return ``(pool, ranked)`` or ``None`` on miss / expiry / stale."""
+        with self._lock:
+            entry = self._entries.get(key)
+            reason = None
+            if entry is None:
+                pass
+            elif time.time() - entry.stored_at > self._ttl:
+                reason = "expired"
+            elif self._corpus is not None and not self._corpus.is_fresh(entry.generation, entry.doc_ids):
+                reason = "stale"
+            else:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return [replace(c) for c in entry.chunks], entry.ranked
+            if reason is not None:
+                del self._entries[key]
+                self._evictions[reason] += 1
+            self._misses += 1
+            return None
+
+    def set(self, key: str, chunks: list[RetrievedChunk], ranked: bool, generation: int = 0) -> None:
+        doc_ids = frozenset(c.doc_id for c in chunks)
+        if self._corpus is not None and not self._corpus.is_fresh(generation, doc_ids):
+            return  # a source doc changed during retrieval
+        with self._lock:
+            self._entries.pop(key, None)
+            while self._entries and len(self._entries) >= self._max_entries:
+                self._entries.popitem(last=False)
+                self._evictions["entries"] += 1
+            self._entries[key] = _PoolEntry(
+                time.time(), [replace(c) for c in chunks], ranked, generation, doc_ids,
+            )
+
+    def clear(self) -> int:
+        """Remove all entries. Returns the number removed."""
+        with self._lock:
+            n = len(self._entries)
+            self._entries.clear()
+            return n
+
+    def stats(self) -> dict:
+        """Return cache statistics."""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_entries": self._max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions_expired": self._evictions["expired"],
+                "evictions_entries": self._evictions["entries"],
+                "evictions_stale": self._evictions["stale"],
+                "ttl_sec": self._ttl,
+            }
+
+
+def make_retrieval_cache() -> RetrievalCache | None:
+    """Instantiate the retrieval-stage cache, or ``None`` when disabled."""
+    from app.config import (
+        RETRIEVAL_CACHE_ENABLED, RETRIEVAL_CACHE_MAX_ENTRIES, RETRIEVAL_CACHE_TTL_SEC,
+    )
+    from app.retrieval.corpus_version import get_corpus_version
+
+    if not RETRIEVAL_CACHE_ENABLED:
+        return None
+    return RetrievalCache(
+        ttl_sec=RETRIEVAL_CACHE_TTL_SEC,
+        max_entries=RETRIEVAL_CACHE_MAX_ENTRIES,
+        corpus=get_corpus_version(),
+    )
+
+
+def make_query_cache(embed: EmbedFn | None = None) -> QueryCache | None:
+    """Instantiate the configured query cache (``QUERY_CACHE_BACKEND``).
+
+    ``memory`` keeps entries per process; ``sqlite`` shares them between
+    all workers through one file.  *embed* enables the semantic tier when
+    ``SEMANTIC_CACHE_ENABLED``.  Entries follow the process-wide corpus
+    version.  Returns ``None`` when caching is off.
+    """
+    from app.config import (
+        QUERY_CACHE_BACKEND, QUERY_CACHE_ENABLED, QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_MAX_MB,
+        QUERY_CACHE_PATH, QUERY_CACHE_TTL_SEC, SEMANTIC_CACHE_ENABLED, SEMANTIC_CACHE_THRESHOLD,
+    )
+    from app.retrieval.corpus_version import get_corpus_version
+
+    if not QUERY_CACHE_ENABLED:
+        return None
+    options = {
+        "ttl_sec": QUERY_CACHE_TTL_SEC,
+        "embed": embed if SEMANTIC_CACHE_ENABLED else None,
+        "semantic_threshold": SEMANTIC_CACHE_THRESHOLD,
+        "max_entries": QUERY_CACHE_MAX_ENTRIES,
+        "max_bytes": QUERY_CACHE_MAX_MB * 1024 * 1024,
+        "corpus": get_corpus_version(),
+    }
+    if QUERY_CACHE_BACKEND == "sqlite":
+        from app.retrieval.cache_sqlite import SqliteQueryCache
+
+        return SqliteQueryCache(QUERY_CACHE_PATH, **options)
+    return QueryCache(**options)
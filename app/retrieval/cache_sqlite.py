@@ -0,0 +1,362 @@
+"""SQLite query-cache backend shared by every worker process.
+
+With several uvicorn workers the in-memory :class:`~app.retrieval.cache.QueryCache`
+is per process: each worker sees roughly 1/N of the hits and
+``/cache/clear`` empties only the worker that served it.  This backend
+keeps entries, LRU order and hit / eviction counters in one SQLite file
+(WAL mode, so readers never block on a writer).  Responses are stored as
+zlib-compressed compact JSON and the byte budget counts those bytes.
+
+Reads take no write lock: a hit's LRU touch and the hit / miss counters
+are kept in memory and written in one transaction by the sweeper, by the
+next store from this worker (before it evicts) and by ``stats()``.  LRU
+order across workers is therefore approximate to one sweep interval.
+
+Entries record the corpus generation they were computed at and, in
+``entry_docs``, the doc_ids they were built from.  When ``/ingest`` bumps
+the corpus version, the rows depending on the changed docs are deleted
+from the file at once, so every worker stops serving them.
+
+The semantic tier still matches in memory: each worker mirrors the
+question vectors stored in the file into its own index, pulling only rows
+added since its last lookup.  A match whose row is gone (evicted or
+cleared by another worker) just misses.
+
+Selected with ``QUERY_CACHE_BACKEND=sqlite``; ``QUERY_CACHE_PATH`` sets
+the file.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from app.retrieval.cache import _COUNTERS, EmbedFn, MAX_BYTES, MAX_ENTRIES, QueryCache, _QuestionGuard
+
+if TYPE_CHECKING:
+    from app.retrieval.corpus_version import CorpusVersion
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA_VERSION = 3   # bump to discard cache files written with another layout
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    seq             INTEGER PRIMARY KEY AUTOINCREMENT,
+    key             TEXT NOT NULL UNIQUE,
+    stored_at       REAL NOT NULL,
+    last_used       REAL NOT NULL,
+    nbytes          INTEGER NOT NULL,
+    top_k           INTEGER NOT NULL,
+    include_context INTEGER NOT NULL,
+    generation      INTEGER NOT NULL,
+    question        TEXT NOT NULL,
+    vector          BLOB,
+    payload         BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+CREATE TABLE IF NOT EXISTS entry_docs (
+    key    TEXT NOT NULL REFERENCES entries (key) ON DELETE CASCADE,
+    doc_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entry_docs_doc ON entry_docs (doc_id);
+CREATE INDEX IF NOT EXISTS entry_docs_key ON entry_docs (key);
+CREATE TABLE IF NOT EXISTS counters (
+    name  TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class SqliteQueryCache(QueryCache):
+    """:class:`QueryCache` stored in a SQLite file shared across processes."""
+
+    def __init__(
+        self,
+        path: str | Path,
+        ttl_sec: int = 300,
+        embed: EmbedFn | None = None,
+        semantic_threshold: float = 0.95,
+        max_entries: int = MAX_ENTRIES,
+        max_bytes: int = MAX_BYTES,
+        corpus: CorpusVersion | None = None,
+    ) -> None:
+        super().__init__(
+            ttl_sec=ttl_sec, embed=embed, semantic_threshold=semantic_threshold,
+            max_entries=max_entries, max_bytes=max_bytes, corpus=corpus,
+        )
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()   # one connection per thread
+        self._synced_seq = 0              # last row mirrored into the semantic index
+        self._pending_lock = threading.Lock()
+        self._pending_touches: dict[str, float] = {}   # key → last hit time, not yet written
+        self._pending_counts: dict[str, int] = {}
+        # Workers starting together serialise here, so none drops tables
+        # another is creating or filling.
+        with self._transaction() as conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                for table in ("entry_docs", "entries", "counters"):
+                    conn.execute(f"DROP TABLE IF EXISTS {table}")
+                conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+            for statement in _SCHEMA.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+            conn.executemany(
+                "INSERT OR IGNORE INTO counters (name, value) VALUES (?, 0)",
+                [(name,) for name in _COUNTERS],
+            )
+        if corpus is not None:
+            corpus.subscribe(self.invalidate_docs)
+
+    # ── stats ──────────────────────────────────────────────────────
+
+    @property
+    def hits(self) -> int:
+        return self._counter_values()["exact_hits"]
+
+    @property
+    def semantic_hits(self) -> int:
+        return self._counter_values()["semantic_hits"]
+
+    @property
+    def misses(self) -> int:
+        return self._counter_values()["misses"]
+
+    @property
+    def size(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    @property
+    def bytes(self) -> int:
+        return self._conn().execute("SELECT COALESCE(SUM(nbytes), 0) FROM entries").fetchone()[0]
+
+    def stats(self) -> dict:
+        """Return cache statistics, aggregated over every worker."""
+        size, nbytes = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM entries",
+        ).fetchone()
+        return self._format_stats(size, nbytes, self._counter_values())
+
+    # ── clear / sweep ──────────────────────────────────────────────
+
+    def clear(self) -> int:
+        """Remove all entries, for every worker. Returns the number removed."""
+        with self._transaction() as conn:
+            self._flush_pending(conn)
+            n = conn.execute("DELETE FROM entries").rowcount
+        with self._lock:
+            if self._index is not None:
+                self._index.clear()
+        return n
+
+    def sweep(self) -> int:
+        """Write pending LRU touches and counters, then drop every expired entry.
+
+        Returns the number removed.
+        """
+        with self._transaction() as conn:
+            self._flush_pending(conn)
+            n = conn.execute(
+                "DELETE FROM entries WHERE stored_at < ?", (time.time() - self._ttl,),
+            ).rowcount
+            self._bump(conn, "evictions_expired", n)
+        return n
+
+    def flush(self) -> None:
+        """Write this worker's pending LRU touches and counters to the file."""
+        with self._pending_lock:
+            if not self._pending_touches and not self._pending_counts:
+                return
+        with self._transaction() as conn:
+            self._flush_pending(conn)
+
+    def stop_sweeper(self) -> None:
+        super().stop_sweeper()
+        self.flush()
+
+    def invalidate_docs(self, doc_ids: set[str], generation: int = 0) -> int:
+        """Delete every entry built from any of *doc_ids*. Returns the number removed.
+
+        Registered as a corpus-version listener, so a re-ingest in any
+        worker purges the dependent answers for all of them.
+        """
+        if not doc_ids:
+            return 0
+        ids = list(doc_ids)
+        with self._transaction() as conn:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS changed_docs (doc_id TEXT PRIMARY KEY)")
+            conn.execute("DELETE FROM changed_docs")
+            conn.executemany("INSERT OR IGNORE INTO changed_docs VALUES (?)", [(d,) for d in ids])
+            n = conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entry_docs"
+                " WHERE doc_id IN (SELECT doc_id FROM changed_docs))",
+            ).rowcount
+            self._bump(conn, "evictions_stale", n)
+        if n:
+            logger.info("Query cache: dropped %d entries for %d changed docs", n, len(ids))
+        return n
+
+    # ── storage hooks ──────────────────────────────────────────────
+
+    def _lookup(self, key: str) -> dict | None:
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT stored_at, payload FROM entries WHERE key = ?", (key,),
+        ).fetchone()
+        if row is None:
+            self._forget(key)
+            return None
+        stored_at, payload = row
+        now = time.time()
+        if now - stored_at > self._ttl:
+            with self._transaction() as conn:
+                removed = conn.execute(
+                    "DELETE FROM entries WHERE key = ? AND stored_at = ?", (key, stored_at),
+                ).rowcount
+                self._bump(conn, "evictions_expired", removed)
+            self._forget(key)
+            return None
+        with self._pending_lock:
+            self._pending_touches[key] = now
+        return json.loads(zlib.decompress(payload))
+
+    def _store(
+        self, key: str, data: dict, encoded: bytes,
+        vector: np.ndarray | None, top_k: int, include_context: bool,
+        generation: int, doc_ids: frozenset[str], question: str,
+    ) -> None:
+        payload = zlib.compress(encoded)
+        nbytes = len(payload)
+        with self._transaction() as conn:
+            self._flush_pending(conn)   # holding the write lock anyway; evict by fresh LRU order
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            if nbytes > self._max_bytes:
+                self._bump(conn, "evictions_bytes")
+                logger.debug("Response of %d bytes exceeds the cache budget; not cached", nbytes)
+                return
+            size, total = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM entries",
+            ).fetchone()
+            self._evict_lru(conn, size, total, nbytes)
+            now = time.time()
+            conn.execute(
+                "INSERT INTO entries (key, stored_at, last_used, nbytes, top_k, include_context,"
+                " generation, question, vector, payload) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key, now, now, nbytes, top_k, int(include_context), generation, question,
+                    vector.astype(np.float32).tobytes() if vector is not None else None,
+                    payload,
+                ),
+            )
+            conn.executemany(
+                "INSERT INTO entry_docs (key, doc_id) VALUES (?, ?)",
+                [(key, doc_id) for doc_id in doc_ids],
+            )
+
+    def _has_vectors(self) -> bool:
+        self._sync_index()
+        return super()._has_vectors()
+
+    def _count(self, name: str) -> None:
+        with self._pending_lock:
+            self._pending_counts[name] = self._pending_counts.get(name, 0) + 1
+
+    # ── internal ───────────────────────────────────────────────────
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; multi-statement writes use _transaction().
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _bump(conn: sqlite3.Connection, name: str, delta: int = 1) -> None:
+        if delta:
+            conn.execute("UPDATE counters SET value = value + ? WHERE name = ?", (delta, name))
+
+    def _flush_pending(self, conn: sqlite3.Connection) -> None:
+        """Write pending touches and counters (caller holds a transaction)."""
+        with self._pending_lock:
+            touches, self._pending_touches = self._pending_touches, {}
+            counts, self._pending_counts = self._pending_counts, {}
+        conn.executemany(
+            "UPDATE entries SET last_used = MAX(last_used, ?) WHERE key = ?",
+            [(used, key) for key, used in touches.items()],
+        )
+        for name, delta in counts.items():
+            self._bump(conn, name, delta)
+
+    def _counter_values(self) -> dict[str, int]:
+        self.flush()
+        rows = dict(self._conn().execute("SELECT name, value FROM counters").fetchall())
+        return {name: rows.get(name, 0) for name in _COUNTERS}
+
+    def _evict_lru(self, conn: sqlite3.Connection, size: int, total: int, incoming: int) -> None:
+        """Delete least recently used rows until one more entry of *incoming* bytes fits."""
+        victims: list[str] = []
+        by_entries = by_bytes = 0
+        for key, nbytes in conn.execute("SELECT key, nbytes FROM entries ORDER BY last_used"):
+            if size < self._max_entries and total + incoming <= self._max_bytes:
+                break
+            if size >= self._max_entries:
+                by_entries += 1
+            else:
+                by_bytes += 1
+            victims.append(key)
+            size -= 1
+            total -= nbytes
+        conn.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k in victims])
+        self._bump(conn, "evictions_entries", by_entries)
+        self._bump(conn, "evictions_bytes", by_bytes)
+
+    def _forget(self, key: str) -> None:
+        """Drop *key* from the local semantic index once its row is gone."""
+        if self._index is not None:
+            with self._lock:
+                self._index.remove(key)
+
+    def _sync_index(self) -> None:
+        """Mirror question vectors stored since the last sync into the local index."""
+        with self._lock:
+            if len(self._index) > 2 * self._max_entries:
+                # Mostly rows other workers evicted; rebuild from what is left.
+                self._index.clear()
+                self._synced_seq = 0
+            rows = self._conn().execute(
+                "SELECT seq, key, top_k, include_context, question, vector FROM entries"
+                " WHERE seq > ? AND vector IS NOT NULL ORDER BY seq",
+                (self._synced_seq,),
+            ).fetchall()
+            for seq, key, top_k, include_context, question, blob in rows:
+                self._index.add(
+                    key, np.frombuffer(blob, dtype=np.float32), top_k, bool(include_context),
+                    _QuestionGuard.from_question(question),
+                )
+                self._synced_seq = seq
@@ -0,0 +1,197 @@
+"""Corpus generation counter for cache invalidation.
+
+Every ingest batch that stores or removes chunks bumps the generation and
+records it against the affected ``doc_id``s.  Cached results are tagged
+with the generation they were computed at and the doc_ids they were built
+from; such an entry is stale once any of those docs changed after it was
+stored.  Answers built only from untouched docs survive a re-ingest, so
+the cache TTL can be long.
+
+Caches that can purge eagerly (e.g. a store shared by several workers)
+register a listener with :meth:`CorpusVersion.subscribe`.
+
+:class:`CorpusVersion` lives in one process.  With several uvicorn workers
+(``QUERY_CACHE_BACKEND=sqlite``) :class:`SharedCorpusVersion` keeps the
+per-doc generations in the shared cache file instead; every worker pulls
+changes from it at most once per *poll_sec*, so an ingest in one worker
+invalidates the in-memory caches of the others within about a second.
+"""
+
+from __future__ import annotations
+
+import logging
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+CorpusListener = Callable[[set[str], int], None]   # (changed doc_ids, new generation)
+
+
+class CorpusVersion:
+    """Thread-safe corpus generation with per-doc change generations."""
+
+    def __init__(self) -> None:
+        self._generation = 0
+        self._doc_generation: dict[str, int] = {}
+        self._listeners: list[CorpusListener] = []
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def bump(self, doc_ids: Iterable[str]) -> int:
+        """Record that *doc_ids* changed; returns the new generation."""
+        changed = set(doc_ids)
+        if not changed:
+            return self._generation
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            for doc_id in changed:
+                self._doc_generation[doc_id] = generation
+        self._notify(changed, generation)
+        return generation
+
+    def is_fresh(self, generation: int, doc_ids: Iterable[str]) -> bool:
+        """True when none of *doc_ids* changed after *generation*."""
+        doc_generation = self._doc_generation
+        return all(doc_generation.get(doc_id, 0) <= generation for doc_id in doc_ids)
+
+    def subscribe(self, listener: CorpusListener) -> None:
+        with self._lock:
+            self._listeners.append(listener)
+
+    def unsubscribe(self, listener: CorpusListener) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"generation": self._generation, "docs_changed": len(self._doc_generation)}
+
+    def _notify(self, changed: set[str], generation: int) -> None:
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(changed, generation)
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("Corpus change listener failed: %s", exc)
+
+
+class SharedCorpusVersion(CorpusVersion):
+    """:class:`CorpusVersion` stored in a SQLite file shared by every worker.
+
+    Each changed doc_id is a row holding the generation it last changed at;
+    the corpus generation is the highest of them.  Listeners run only in
+    the worker that called :meth:`bump`.
+    """
+
+    def __init__(self, path: str | Path, poll_sec: float = 1.0) -> None:
+        super().__init__()
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._poll_sec = poll_sec
+        self._synced_at = 0.0
+        self._local = threading.local()   # one connection per thread
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS corpus_docs"
+                " (doc_id TEXT PRIMARY KEY, generation INTEGER NOT NULL)",
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS corpus_docs_generation ON corpus_docs (generation)")
+        self.sync()
+
+    @property
+    def generation(self) -> int:
+        self._maybe_sync()
+        return self._generation
+
+    def bump(self, doc_ids: Iterable[str]) -> int:
+        """Record that *doc_ids* changed, for every worker; returns the new generation."""
+        changed = set(doc_ids)
+        if not changed:
+            return self.generation
+        with self._transaction() as conn:
+            generation = conn.execute(
+                "SELECT COALESCE(MAX(generation), 0) + 1 FROM corpus_docs",
+            ).fetchone()[0]
+            conn.executemany(
+                "INSERT INTO corpus_docs (doc_id, generation) VALUES (?, ?)"
+                " ON CONFLICT (doc_id) DO UPDATE SET generation = excluded.generation",
+                [(doc_id, generation) for doc_id in changed],
+            )
+        self.sync()
+        self._notify(changed, generation)
+        return generation
+
+    def is_fresh(self, generation: int, doc_ids: Iterable[str]) -> bool:
+        self._maybe_sync()
+        return super().is_fresh(generation, doc_ids)
+
+    def stats(self) -> dict:
+        self._maybe_sync()
+        return super().stats()
+
+    def sync(self) -> None:
+        """Pull doc changes other workers recorded since the last sync."""
+        rows = self._conn().execute(
+            "SELECT doc_id, generation FROM corpus_docs WHERE generation > ?", (self._generation,),
+        ).fetchall()
+        with self._lock:
+            for doc_id, generation in rows:
+                self._doc_generation[doc_id] = max(generation, self._doc_generation.get(doc_id, 0))
+                self._generation = max(self._generation, generation)
+            self._synced_at = time.monotonic()
+
+    def _maybe_sync(self) -> None:
+        if time.monotonic() - self._synced_at >= self._poll_sec:
+            self.sync()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+_corpus_version: CorpusVersion | None = None
+_corpus_version_lock = threading.Lock()
+
+
+def get_corpus_version() -> CorpusVersion:
+    """Return the process-wide corpus version.
+
+    Shared through ``QUERY_CACHE_PATH`` when ``QUERY_CACHE_BACKEND=sqlite``
+    (the multi-worker setup), else local to this process.
+    """
+    global _corpus_version  # noqa: PLW0603
+    with _corpus_version_lock:
+        if _corpus_version is None:
+            from app.config import QUERY_CACHE_BACKEND, QUERY_CACHE_PATH
+
+            if QUERY_CACHE_BACKEND == "sqlite":
+                _corpus_version = SharedCorpusVersion(QUERY_CACHE_PATH)
+            else:
+                _corpus_version = CorpusVersion()
+        return _corpus_version
@@ -7,14 +7,27 @@ relevance using a configurable weighted sum.
 
 from __future__ import annotations
 
+import bisect
+import contextlib
 import copy
+import hashlib
+import heapq
 import logging
 import math
+import mmap
+import os
 import re
 import threading
+import uuid
+from array import array
 from collections import Counter
+from pathlib import Path
 
 from app.db.chroma import RetrievedChunk
+from app.retrieval.bm25_snapshot import (
+    FORMAT_VERSION, MappedPostings, read_snapshot, write_snapshot,
+)
+from app.ingest.chunker import Chunk
 from app.retrieval.detection import is_multihop
 
 logger = logging.getLogger(__name__)
@@ -125,7 +138,15 @@ def _boilerplate_penalty(text: str) -> float:
 
 
 class BM25Index:
-    """In-memory BM25 (Okapi) index over chunk texts.
+    """In-memory BM25 (Okapi) inverted index over chunk texts.
+
+    Each term maps to a postings list of ``(doc slots, term_freqs)`` stored as
+    compact ``array`` columns.  IDF and length norms are derived from the
+    postings length and the running total document length, so the index can
+    be updated in place: chunks are added to new slots, removed chunks leave
+    a tombstone slot, and tombstones are compacted away once they outnumber
+    the live chunks.  A query only touches the documents that contain at
+    least one query term.
 
     Thread-safe: all reads/writes are protected by a reentrant lock.
     """
@@ -136,14 +157,17 @@ class BM25Index:
         self._lock = threading.RLock()
 
         # Index data
-        self._corpus_tfs: list[Counter[str]] = []
-        self._doc_lens: list[int] = []
-        self._avg_dl: float = 0.0
-        self._doc_freqs: Counter[str] = Counter()
-        self._chunk_ids: list[str] = []
+        self._postings: dict[str, tuple[array, array]] = {}
+        #  term → (doc slots ascending, term frequencies)
+        self._doc_lens: array = array("I")   # per slot; 0 for tombstones
+        self._chunk_ids: list[str] = []      # per slot; "" for tombstones
+        self._slots: dict[str, int] = {}     # chunk_id → slot
+        self._doc_chunks: dict[str, set[str]] | None = {}  # doc_id → chunk_ids
         self._chunk_map: dict[str, dict] = {}
+        self._total_len: int = 0
         self._n_docs: int = 0
         self._ready = False
+        self._mapping: mmap.mmap | None = None  # backing file of a loaded snapshot
 
     # ── properties ─────────────────────────────────────────────────
 
@@ -155,6 +179,14 @@ class BM25Index:
     def size(self) -> int:
         return self._n_docs
 
+    @property
+    def vocab_size(self) -> int:
+        return len(self._postings)
+
+    @property
+    def _avg_dl(self) -> float:
+        return self._total_len / self._n_docs if self._n_docs else 0.0
+
     # ── build ──────────────────────────────────────────────────────
 
     def build_from_collection(self, collection) -> int:
@@ -167,84 +199,347 @@ class BM25Index:
         if not ids:
             return 0
 
+        return self.build(ids, documents, metadatas)
+
+    def build(
+        self,
+        ids: list[str],
+        documents: list[str],
+        metadatas: list[dict],
+    ) -> int:
+        """(Re-)build the index from parallel id / text / metadata lists."""
         with self._lock:
-            self._corpus_tfs = []
-            self._doc_lens = []
-            self._doc_freqs = Counter()
+            self._postings = {}
+            self._doc_lens = array("I")
             self._chunk_ids = []
+            self._slots = {}
+            self._doc_chunks = {}
             self._chunk_map = {}
-
+            self._total_len = 0
+            self._n_docs = 0
+            self._mapping = None
             for cid, doc, meta in zip(ids, documents, metadatas):
-                tokens = _tokenize(doc)
-                tf = Counter(tokens)
-                self._corpus_tfs.append(tf)
-                self._doc_lens.append(len(tokens))
-                self._chunk_ids.append(cid)
-                self._chunk_map[cid] = {
-                    "chunk_id": cid,
-                    "doc_id": meta.get("doc_id", ""),
-                    "text": doc,
-                    "source_path": meta.get("source_path", ""),
-                    "content_type": meta.get("content_type", ""),
-                }
-                # Update document frequency (each unique term counted once)
-                for term in tf:
-                    self._doc_freqs[term] += 1
-
-            self._n_docs = len(self._corpus_tfs)
-            self._avg_dl = sum(self._doc_lens) / max(self._n_docs, 1)
+                self._add_locked(cid, doc, meta)
+            self._invalidate_locked()
             self._ready = True
 
         logger.info(
             "BM25 index built: %d documents, %d unique terms",
             self._n_docs,
-            len(self._doc_freqs),
+            len(self._postings),
         )
         return self._n_docs
 
+    # ── incremental updates ────────────────────────────────────────
+
+    def add(
+        self,
+        ids: list[str],
+        documents: list[str],
+        metadatas: list[dict],
+    ) -> int:
+        """Add chunks, replacing any existing chunk with the same ID.
+
+        Chunks whose text and metadata are unchanged are skipped.
+        Returns the number of chunks (re-)indexed.
+        """
+        changed = 0
+        with self._lock:
+            for cid, doc, meta in zip(ids, documents, metadatas):
+                if self._chunk_map.get(cid) == _chunk_record(cid, doc, meta):
+                    continue
+                self._remove_locked(cid)
+                self._add_locked(cid, doc, meta)
+                changed += 1
+            if changed:
+                self._maybe_compact_locked()  # replacements leave tombstones too
+                self._invalidate_locked()
+            self._ready = True
+        return changed
+
+    def remove(self, chunk_ids: list[str]) -> int:
+        """Remove chunks by ID. Returns the number actually removed."""
+        with self._lock:
+            removed = sum(1 for cid in chunk_ids if self._remove_locked(cid))
+            if removed:
+                self._maybe_compact_locked()
+                self._invalidate_locked()
+        return removed
+
+    def remove_doc(self, doc_id: str) -> int:
+        """Remove every chunk belonging to *doc_id*."""
+        with self._lock:
+            return self.remove(list(self._doc_index_locked().get(doc_id, ())))
+
+    def replace_doc(
+        self,
+        doc_id: str,
+        ids: list[str],
+        documents: list[str],
+        metadatas: list[dict],
+    ) -> int:
+        """Replace the indexed chunks of *doc_id* with the given set."""
+        with self._lock:
+            keep = set(ids)
+            stale = [cid for cid in self._doc_index_locked().get(doc_id, ()) if cid not in keep]
+            self.remove(stale)
+            return self.add(ids, documents, metadatas)
+
+    def apply_diff(
+        self,
+        ids: list[str],
+        documents: list[str],
+        metadatas: list[dict],
+        stale_ids: list[str],
+    ) -> int:
+        """Apply an ingest diff: drop *stale_ids*, then upsert the new chunks."""
+        with self._lock:
+            self.remove(stale_ids)
+            changed = self.add(ids, documents, metadatas)
+        logger.info(
+            "BM25 index updated: %d stale removed, %d chunks (re-)indexed, %d total",
+            len(stale_ids), changed, self._n_docs,
+        )
+        return changed
+
+    # ── internal ───────────────────────────────────────────────────
+
+    def _add_locked(self, cid: str, doc: str, meta: dict) -> None:
+        """Append *cid* in a new slot (caller must hold self._lock)."""
+        slot = len(self._chunk_ids)
+        tokens = _tokenize(doc)
+        for term, tf in Counter(tokens).items():
+            plist = self._writable_postings_locked(term)
+            if plist is None:
+                plist = (array("I"), array("I"))
+                self._postings[term] = plist
+            plist[0].append(slot)
+            plist[1].append(tf)
+        record = _chunk_record(cid, doc, meta)
+        self._doc_lens.append(len(tokens))
+        self._chunk_ids.append(cid)
+        self._slots[cid] = slot
+        self._doc_index_locked().setdefault(record["doc_id"], set()).add(cid)
+        self._chunk_map[cid] = record
+        self._total_len += len(tokens)
+        self._n_docs += 1
+
+    def _remove_locked(self, cid: str) -> bool:
+        """Tombstone *cid*'s slot (caller must hold self._lock)."""
+        slot = self._slots.pop(cid, None)
+        if slot is None:
+            return False
+        record = self._chunk_map.pop(cid)
+        for term in set(_tokenize(record["text"])):
+            doc_slots, tfs = self._writable_postings_locked(term)
+            pos = bisect.bisect_left(doc_slots, slot)
+            del doc_slots[pos]
+            del tfs[pos]
+            if not doc_slots:
+                del self._postings[term]
+        doc_index = self._doc_index_locked()
+        siblings = doc_index.get(record["doc_id"])
+        if siblings is not None:
+            siblings.discard(cid)
+            if not siblings:
+                del doc_index[record["doc_id"]]
+        self._total_len -= self._doc_lens[slot]
+        self._doc_lens[slot] = 0
+        self._chunk_ids[slot] = ""
+        self._n_docs -= 1
+        return True
+
+    def _maybe_compact_locked(self) -> None:
+        """Renumber slots once tombstones outnumber live chunks."""
+        tombstones = len(self._chunk_ids) - self._n_docs
+        if tombstones < max(1024, self._n_docs):
+            return
+        remap = array("I", bytes(4 * len(self._chunk_ids)))
+        chunk_ids: list[str] = []
+        doc_lens = array("I")
+        for old, cid in enumerate(self._chunk_ids):
+            if not cid:
+                continue
+            remap[old] = len(chunk_ids)
+            chunk_ids.append(cid)
+            doc_lens.append(self._doc_lens[old])
+        self._postings = {
+            term: (array("I", (remap[s] for s in doc_slots)), array("I", tfs))
+            for term, (doc_slots, tfs) in list(self._postings.items())
+        }
+        self._chunk_ids = chunk_ids
+        self._doc_lens = doc_lens
+        self._slots = {cid: slot for slot, cid in enumerate(chunk_ids)}
+
+    def _writable_postings_locked(self, term: str) -> tuple[array, array] | None:
+        """Return mutable postings for *term* (copied out of a mapped snapshot)."""
+        if isinstance(self._postings, MappedPostings):
+            return self._postings.mutable(term) if term in self._postings else None
+        return self._postings.get(term)
+
+    def _doc_index_locked(self) -> dict[str, set[str]]:
+        """``doc_id → chunk_ids``; rebuilt on first use after a snapshot load."""
+        if self._doc_chunks is None:
+            doc_index: dict[str, set[str]] = {}
+            for cid in self._chunk_ids:
+                if cid:
+                    doc_index.setdefault(self._chunk_map[cid]["doc_id"], set()).add(cid)
+            self._doc_chunks = doc_index
+        return self._doc_chunks
+
+    def _invalidate_locked(self) -> None:
+        """Hook for backends that cache derived weights (caller holds lock)."""
+
+    def _idf(self, df: int) -> float:
+        return math.log((self._n_docs - df + 0.5) / (df + 0.5) + 1.0)
+
+    # ── snapshot ───────────────────────────────────────────────────
+
+    def save_snapshot(self, path: Path, fingerprint: str) -> int:
+        """Write the index to *path* (see :mod:`app.retrieval.bm25_snapshot`)."""
+        with self._lock:
+            size = write_snapshot(
+                path,
+                fingerprint,
+                k1=self._k1,
+                b=self._b,
+                postings=self._postings,
+                doc_lens=self._doc_lens,
+                chunk_ids=self._chunk_ids,
+                chunk_map=self._chunk_map,
+                total_len=self._total_len,
+                n_docs=self._n_docs,
+            )
+        logger.info("BM25 snapshot saved: %s (%d bytes)", path, size)
+        return size
+
+    def load_snapshot(self, path: Path, fingerprint: str) -> bool:
+        """Memory-map a snapshot built for *fingerprint*; False if unusable."""
+        data = read_snapshot(path, fingerprint, k1=self._k1, b=self._b)
+        if data is None:
+            return False
+
+        with self._lock:
+            self._postings = data.postings
+            self._doc_lens = data.doc_lens
+            self._chunk_ids = data.chunk_ids
+            self._slots = {cid: slot for slot, cid in enumerate(data.chunk_ids) if cid}
+            self._doc_chunks = None
+            self._chunk_map = data.chunk_map
+            self._total_len = data.total_len
+            self._n_docs = data.n_docs
+            self._mapping = data.mapping
+            self._invalidate_locked()
+            self._ready = True
+
+        logger.info(
+            "BM25 index loaded from snapshot: %d documents, %d unique terms",
+            self._n_docs,
+            len(self._postings),
+        )
+        return True
+
     # ── query ──────────────────────────────────────────────────────
 
     def query(self, question: str, top_k: int = 20) -> list[tuple[str, float]]:
         """Return top_k ``(chunk_id, bm25_score)`` pairs."""
-        if not self._ready:
-            return []
+        return self.query_many([question], top_k=top_k)[0]
 
-        query_tokens = _tokenize(question)
-        if not query_tokens:
-            return []
+    def query_many(
+        self, questions: list[str], top_k: int = 20,
+    ) -> list[list[tuple[str, float]]]:
+        """Return one ``query()`` result list per question, in order.
 
+        Questions are scored in one pass: a term that several questions
+        share (templated sub-questions, query variants) has its posting
+        list walked once and its per-chunk contributions reused.
+        """
+        if not self._ready or not questions:
+            return [[] for _ in questions]
+
+        term_counts = [Counter(_tokenize(q)) for q in questions]
+        shared = Counter(term for counts in term_counts for term in counts.items())
+
+        k1_plus = self._k1 + 1
         with self._lock:
-            scores: list[float] = [0.0] * self._n_docs
-            for token in query_tokens:
-                df = self._doc_freqs.get(token, 0)
-                if df == 0:
-                    continue
-                idf = math.log((self._n_docs - df + 0.5) / (df + 0.5) + 1.0)
-                for i, tf_map in enumerate(self._corpus_tfs):
-                    tf = tf_map.get(token, 0)
-                    if tf == 0:
+            if not self._n_docs:
+                return [[] for _ in questions]
+            # Length norm k1·(1 - b + b·dl/avgdl) expanded to base + slope·dl.
+            norm_base = self._k1 * (1 - self._b)
+            norm_slope = self._k1 * self._b / (self._avg_dl or 1.0)
+            doc_lens = self._doc_lens
+            reused: dict[tuple[str, int], dict[int, float]] = {}
+
+            results: list[list[tuple[str, float]]] = []
+            for counts in term_counts:
+                scores: dict[int, float] = {}
+                for token, qtf in counts.items():
+                    contrib = reused.get((token, qtf))
+                    if contrib is not None:
+                        for slot, value in contrib.items():
+                            scores[slot] = scores.get(slot, 0.0) + value
+                        continue
+                    plist = self._postings.get(token)
+                    if plist is None:
+                        continue
+                    weight = qtf * self._idf(len(plist[0])) * k1_plus
+                    if shared[(token, qtf)] > 1:
+                        contrib = {
+                            slot: weight * tf / (tf + norm_base + norm_slope * doc_lens[slot])
+                            for slot, tf in zip(plist[0], plist[1])
+                        }
+                        reused[(token, qtf)] = contrib
+                        for slot, value in contrib.items():
+                            scores[slot] = scores.get(slot, 0.0) + value
                         continue
-                    dl = self._doc_lens[i]
-                    numerator = tf * (self._k1 + 1)
-                    denominator = tf + self._k1 * (1 - self._b + self._b * dl / self._avg_dl)
-                    scores[i] += idf * numerator / denominator
-
-            scored = [
-                (self._chunk_ids[i], scores[i])
-                for i in range(self._n_docs)
-                if scores[i] > 0
-            ]
-        scored.sort(key=lambda x: x[1], reverse=True)
-        return scored[:top_k]
+                    for slot, tf in zip(plist[0], plist[1]):
+                        scores[slot] = scores.get(slot, 0.0) + weight * tf / (
+                            tf + norm_base + norm_slope * doc_lens[slot]
+                        )
+
+                top = heapq.nlargest(
+                    top_k, scores.items(), key=lambda item: (item[1], -item[0]),
+                )
+                results.append([(self._chunk_ids[i], s) for i, s in top if s > 0])
+            return results
 
     def get_chunk_data(self, chunk_id: str) -> dict | None:
         """Return stored metadata for a chunk, or None."""
         return self._chunk_map.get(chunk_id)
 
 
+def _chunk_record(chunk_id: str, text: str, meta: dict) -> dict:
+    """Build the per-chunk payload served for BM25-only hits."""
+    return {
+        "chunk_id": chunk_id,
+        "doc_id": meta.get("doc_id", ""),
+        "text": text,
+        "source_path": meta.get("source_path", ""),
+        "content_type": meta.get("content_type", ""),
+    }
+
+
 # ── Module-level singleton ─────────────────────────────────────────────
 
-_bm25_index = BM25Index()
+def _make_bm25_index() -> BM25Index:
+    """Instantiate the configured BM25 backend (``BM25_BACKEND``).
+
+    Falls back to the pure-Python postings index when the sparse backend's
+    optional dependencies are not installed.
+    """
+    from app.config import BM25_BACKEND
+
+    if BM25_BACKEND == "sparse":
+        try:
+            from app.retrieval.sparse_bm25 import SparseBM25Index
+
+            return SparseBM25Index()
+        except ImportError:
+            logger.warning("numpy/scipy not installed — falling back to pure-Python BM25")
+    return BM25Index()
+
+
+_bm25_index = _make_bm25_index()
 
 
 def get_bm25_index() -> BM25Index:
@@ -257,6 +552,184 @@ def rebuild_bm25_index(collection) -> int:
     return _bm25_index.build_from_collection(collection)
 
 
+def _snapshot_marker_path() -> Path:
+    from app.config import BM25_SNAPSHOT_PATH
+
+    return Path(f"{BM25_SNAPSHOT_PATH}.marker")
+
+
+def mark_bm25_snapshot_stale() -> None:
+    """Record that the collection is about to change.
+
+    ``/ingest`` calls this before its first upsert.  A fresh token goes into
+    a sidecar next to the snapshot, so the saved snapshot stops validating
+    until it is re-saved; if the process dies before that, the next start
+    rebuilds instead of loading old postings.
+    """
+    from app.config import BM25_SNAPSHOT_ENABLED, BM25_SNAPSHOT_PATH
+
+    if not BM25_SNAPSHOT_ENABLED:
+        return
+    with _snapshot_writer.updating():
+        path = _snapshot_marker_path()
+        tmp = path.with_name(path.name + ".tmp")
+        try:
+            tmp.write_text(uuid.uuid4().hex)
+            os.replace(tmp, path)
+        except OSError as exc:
+            logger.warning("BM25 snapshot marker update failed (%s); dropping the snapshot", exc)
+            Path(BM25_SNAPSHOT_PATH).unlink(missing_ok=True)
+
+
+def collection_fingerprint(collection) -> str:
+    """Cheap identity of a collection's contents for snapshot versioning.
+
+    Hashes the collection name, chunk count and the marker that ingest
+    renews before changing the collection (:func:`mark_bm25_snapshot_stale`);
+    no chunks are fetched.  Edits made to the collection outside this
+    service are only noticed when they change the chunk count.
+    """
+    try:
+        marker = _snapshot_marker_path().read_text().strip()
+    except OSError:
+        marker = ""
+    key = f"v{FORMAT_VERSION}|{collection.name}|{collection.count()}|{marker}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def load_or_rebuild_bm25_index(collection) -> int:
+    """Load the global BM25 index from its snapshot, else rebuild and save it."""
+    from app.config import BM25_SNAPSHOT_ENABLED, BM25_SNAPSHOT_PATH
+
+    if not BM25_SNAPSHOT_ENABLED:
+        return rebuild_bm25_index(collection)
+
+    path = Path(BM25_SNAPSHOT_PATH)
+    fingerprint = collection_fingerprint(collection)
+    if _bm25_index.load_snapshot(path, fingerprint):
+        return _bm25_index.size
+
+    n_docs = rebuild_bm25_index(collection)
+    if n_docs:
+        try:
+            _bm25_index.save_snapshot(path, fingerprint)
+        except OSError as exc:
+            logger.warning("BM25 snapshot save failed: %s", exc)
+    return n_docs
+
+
+def save_bm25_snapshot(collection) -> int:
+    """Persist the global BM25 index for the collection's current contents."""
+    from app.config import BM25_SNAPSHOT_ENABLED, BM25_SNAPSHOT_PATH
+
+    if not BM25_SNAPSHOT_ENABLED or not _bm25_index.ready:
+        return 0
+    return _bm25_index.save_snapshot(
+        Path(BM25_SNAPSHOT_PATH), collection_fingerprint(collection),
+    )
+
+
+class _SnapshotWriter:
+    """Debounced snapshot writes, off the ingest path.
+
+    Writing the snapshot is O(corpus), so an ingest only schedules it:
+    it runs ``BM25_SNAPSHOT_DELAY_SEC`` after the last ingest finished
+    (0 = only at shutdown), and :meth:`flush` writes any pending save on
+    shutdown.  Saves never overlap an ingest that has renewed the marker
+    but not yet finished updating the index.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._timer: threading.Timer | None = None
+        self._pending = False
+        self._ingesting = False
+        self.saves = 0
+
+    @contextlib.contextmanager
+    def updating(self):
+        """Hold off saves from here until :meth:`finish`."""
+        with self._lock:
+            self._cancel_timer()
+            self._pending = False   # superseded: the next save must include this update
+            self._ingesting = True
+            yield
+
+    def finish(self, save: bool) -> None:
+        """End an update; schedule a save if the index now matches the collection."""
+        from app.config import BM25_SNAPSHOT_DELAY_SEC
+
+        with self._lock:
+            self._ingesting = False
+            if not save:
+                return
+            self._pending = True
+            self._cancel_timer()
+            if BM25_SNAPSHOT_DELAY_SEC > 0:
+                self._timer = threading.Timer(BM25_SNAPSHOT_DELAY_SEC, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        """Write a pending snapshot now (unless an ingest is mid-update)."""
+        from app.db.chroma import get_collection
+
+        with self._lock:
+            self._cancel_timer()
+            if not self._pending or self._ingesting:
+                return
+            self._pending = False
+            try:
+                save_bm25_snapshot(get_collection())
+                self.saves += 1
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("BM25 snapshot save failed: %s", exc)
+
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+
+_snapshot_writer = _SnapshotWriter()
+
+
+def finish_bm25_snapshot_update(save: bool) -> None:
+    """End the update begun by :func:`mark_bm25_snapshot_stale`.
+
+    With *save*, the index reflects the changed collection and a debounced
+    snapshot write is scheduled; otherwise the snapshot stays stale and the
+    next start rebuilds.
+    """
+    _snapshot_writer.finish(save)
+
+
+def flush_bm25_snapshot() -> None:
+    """Write a scheduled BM25 snapshot now (app shutdown)."""
+    _snapshot_writer.flush()
+
+
+def update_bm25_index(chunks: list[Chunk], stale_ids: list[str]) -> int:
+    """Apply an ingest diff to the global BM25 index without a full rebuild.
+
+    *stale_ids* is the same diff :func:`app.db.chroma.upsert_chunks` deletes
+    from Chroma; *chunks* are the freshly upserted chunks.
+    """
+    return _bm25_index.apply_diff(
+        [c.chunk_id for c in chunks],
+        [c.text for c in chunks],
+        [
+            {
+                "doc_id": c.doc_id,
+                "source_path": c.source_path,
+                "content_type": c.content_type,
+            }
+            for c in chunks
+        ],
+        stale_ids,
+    )
+
+
 # ── Hybrid merge (weighted fusion) ─────────────────────────────────────
 
 
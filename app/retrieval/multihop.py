@@ -160,10 +160,11 @@ def retrieve_multihop(
     from app.config import (
         HYBRID_ENABLED, MULTIHOP_KEYWORD_BOOST,
         MULTIHOP_MAX_CHUNKS_PER_DOC,
-        MULTIHOP_MIN_INTENT_MATCHES, RERANK_ENABLED,
+        MULTIHOP_MIN_INTENT_MATCHES, RERANK_ENABLED, RETRIEVAL_DEADLINE_MS,
     )
+    from app.executors import run_arms
     from app.ingest.embedder import embed_texts
-    from app.db.chroma import query_chunks
+    from app.db.chroma import query_chunks_many
     from app.retrieval.hybrid import get_bm25_index
     from app.retrieval.reranker import rerank_chunks
 
@@ -173,34 +174,45 @@ def retrieve_multihop(
     # Run retrieval for original question + each intent sub-query
     queries = [question] + [intent.query for intent in intents]
 
-    for q_text in queries:
-        emb = embed_texts([q_text])[0]
-        dense = query_chunks(emb, top_k=per_k, question=q_text)
+    # Embed the question and all intent sub-queries in one forward pass
+    # before the deadline starts.  The dense arm then fetches every run with
+    # a single Chroma query while the BM25 arm scores the same queries.
+    vectors = embed_texts(queries)
+    arms = {
+        "dense": lambda: query_chunks_many(vectors, top_k=per_k, questions=queries),
+    }
+    bm25_idx = get_bm25_index()
+    if HYBRID_ENABLED and bm25_idx.ready:
+        arms["bm25"] = lambda: bm25_idx.query_many(queries, top_k=per_k)
+    outcome = run_arms(
+        arms, deadline_sec=RETRIEVAL_DEADLINE_MS / 1000 if RETRIEVAL_DEADLINE_MS > 0 else None,
+    )
+    dense_runs = outcome.results.get("dense") or [[] for _ in queries]
+    bm25_runs: list[list[tuple[str, float]]] = outcome.results.get("bm25") or [[] for _ in queries]
+    logger.debug("Multi-hop arms %s, overlap saved %.1f ms", outcome.timings_ms, outcome.saved_ms)
+
+    for dense, bm25_hits in zip(dense_runs, bm25_runs):
         for c in dense:
             prev = best.get(c.chunk_id)
             if prev is None or c.score > prev.score:
                 best[c.chunk_id] = copy.copy(c)
 
-        if HYBRID_ENABLED:
-            bm25_idx = get_bm25_index()
-            if bm25_idx.ready:
-                bm25_hits = bm25_idx.query(q_text, top_k=per_k)
-                if bm25_hits:
-                    mx = max(s for _, s in bm25_hits) or 1.0
-                    for cid, raw in bm25_hits:
-                        if cid in best:
-                            continue
-                        data = bm25_idx.get_chunk_data(cid)
-                        if not data:
-                            continue
-                        best[cid] = RetrievedChunk(
-                            chunk_id=data["chunk_id"],
-                            doc_id=data["doc_id"],
-                            text=data["text"],
-                            score=MULTIHOP_KEYWORD_BOOST * (raw / mx),
-                            source_path=data["source_path"],
-                            content_type=data["content_type"],
-                        )
+        if bm25_hits:
+            mx = max(s for _, s in bm25_hits) or 1.0
+            for cid, raw in bm25_hits:
+                if cid in best:
+                    continue
+                data = bm25_idx.get_chunk_data(cid)
+                if not data:
+                    continue
+                best[cid] = RetrievedChunk(
+                    chunk_id=data["chunk_id"],
+                    doc_id=data["doc_id"],
+                    text=data["text"],
+                    score=MULTIHOP_KEYWORD_BOOST * (raw / mx),
+                    source_path=data["source_path"],
+                    content_type=data["content_type"],
+                )
 
     pool = sorted(best.values(), key=lambda c: c.score, reverse=True)[:pool_size]
     if not pool:
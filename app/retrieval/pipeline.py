@@ -0,0 +1,354 @@
+"""Composable retrieval pipeline shared by ``/query``, ``/query/stream`` and the agent.
+
+A :class:`RetrievalPipeline` runs an ordered list of stages over one
+:class:`RetrievalState`.  Each stage reads what earlier stages produced and
+writes its own output; a stage may set ``state.done`` to skip the rest
+(multi-hop retrieval already selects the final contexts, an empty variant
+list leaves nothing to search).  Wall-clock time is recorded per stage.
+
+:meth:`RetrievalPipeline.run_many` runs several questions through the same
+stages together.  A stage with a ``run_many`` method gets them as one
+batch — :class:`RetrieveStage` embeds, searches and scores every variant
+of every question in a single pass — the others run per question.
+
+Blocking work (BM25 scoring, rerank, multi-hop retrieval) runs on the CPU
+executor so stages can be awaited from the event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Protocol
+
+from app.config import MAX_CHUNKS_PER_DOC
+from app.db.chroma import RetrievedChunk
+from app.executors import gather_arms, run_cpu
+from app.retrieval.detection import is_list_style
+from app.retrieval.hybrid import (
+    BM25Index, expand_query_variants, fuse_bm25_runs, fuse_vector_runs, hybrid_merge,
+    select_multi_hop_contexts,
+)
+from app.retrieval.cache import RetrievalCache
+from app.retrieval.corpus_version import CorpusVersion
+from app.retrieval.multihop import Intent
+
+logger = logging.getLogger(__name__)
+
+# Query texts → one embedding per text.
+QueryEmbed = Callable[[list[str]], Awaitable[list[list[float]]]]
+
+# Dense lookup for ``(variants, top_k)`` groups, given each variant's
+# embedding → one run per variant, per group.
+DenseSearch = Callable[
+    [list[tuple[list[str], int]], dict[str, list[float]]],
+    Awaitable[list[list[list[RetrievedChunk]]]],
+]
+
+
+@dataclass
+class RetrievalState:
+    """Everything one retrieval run knows, filled in stage by stage."""
+
+    question: str
+    top_k: int
+    intents: list[Intent] = field(default_factory=list)
+    intent_covered: list[bool] = field(default_factory=list)
+    variants: list[str] = field(default_factory=list)
+    fetch_k: int = 0                        # candidates fetched per variant
+    per_doc_limit: int = MAX_CHUNKS_PER_DOC
+    chunks: list[RetrievedChunk] = field(default_factory=list)
+    pool: list[RetrievedChunk] = field(default_factory=list)   # fully reranked, before the top_k cut
+    pool_cached: bool = False                                   # retrieve/rerank served from cache
+    rerank_failed: bool = False                                 # pool kept in retrieval order
+    done: bool = False
+    timings_ms: dict[str, float] = field(default_factory=dict)
+    timed_out: list[str] = field(default_factory=list)   # arms dropped at the deadline
+    overlap_saved_ms: float = 0.0                        # vs running the arms serially
+    corpus_generation: int = 0                           # corpus version read before retrieval
+
+    @property
+    def is_multihop(self) -> bool:
+        return bool(self.intents)
+
+
+class Stage(Protocol):
+    """One step of a :class:`RetrievalPipeline`."""
+
+    name: str
+
+    async def run(self, state: RetrievalState) -> None: ...
+
+
+# ── Stages ─────────────────────────────────────────────────────────────
+
+
+@dataclass
+class PlanStage:
+    """Detect multi-hop intents, else expand query variants and size the pool."""
+
+    extract_intents: Callable[[str], list[Intent]]
+    rerank_enabled: bool = False
+    rerank_pool_size: int = 20
+    name: str = "plan"
+
+    async def run(self, state: RetrievalState) -> None:
+        state.intents = self.extract_intents(state.question)
+        if state.intents:
+            return
+
+        state.variants = expand_query_variants(state.question)
+        if not state.variants:
+            state.done = True
+            return
+
+        is_multi_variant = len(state.variants) > 1
+        # When reranking is on, widen the candidate pool so the
+        # cross-encoder can pick the best top_k from a larger set.
+        if self.rerank_enabled:
+            state.fetch_k = max(self.rerank_pool_size, state.top_k * (3 if is_multi_variant else 1))
+        else:
+            state.fetch_k = max(state.top_k * (3 if is_multi_variant else 1), state.top_k)
+        base_per_doc_limit = 1 if is_multi_variant else MAX_CHUNKS_PER_DOC
+        state.per_doc_limit = (
+            max(base_per_doc_limit, min(state.top_k, 2))
+            if is_list_style(state.question) else base_per_doc_limit
+        )
+
+
+@dataclass
+class MultihopStage:
+    """Per-intent retrieval with coverage selection; finishes the run."""
+
+    retrieve: Callable[..., tuple[list[RetrievedChunk], list[bool]]]
+    pool_size: int
+    top_k: int
+    name: str = "multihop"
+
+    async def run(self, state: RetrievalState) -> None:
+        if not state.intents:
+            return
+        state.chunks, state.intent_covered = await run_cpu(
+            self.retrieve, state.question, state.intents,
+            pool_size=self.pool_size, top_k=self.top_k,
+        )
+        state.done = True
+
+
+@dataclass
+class RetrieveStage:
+    """Embed the variants, run the dense and BM25 arms side by side, then fuse.
+
+    Dense search waits on Chroma while BM25 scoring is CPU work, so the
+    arms overlap.  Both run under *deadline_sec*; an arm that misses it is
+    left out of the fusion instead of delaying the answer.  Embedding
+    happens before the arms start, so a slow (or cold) embedder delays the
+    answer rather than silently dropping dense retrieval.
+    """
+
+    embed: QueryEmbed
+    search: DenseSearch
+    get_index: Callable[[], BM25Index] | None = None
+    deadline_sec: float | None = None
+    name: str = "retrieve"
+
+    async def run(self, state: RetrievalState) -> None:
+        await self.run_many([state])
+
+    async def run_many(self, states: list[RetrievalState]) -> None:
+        """Retrieve for all *states* with one dense and one BM25 pass.
+
+        Variants shared between questions are searched once.  Dense lookups
+        are grouped by ``fetch_k`` (per-doc selection is not prefix-safe);
+        BM25 runs once at the largest depth and each question keeps the
+        prefix it would have fetched on its own.
+        """
+        groups: dict[int, list[str]] = {}
+        for state in states:
+            groups.setdefault(state.fetch_k, []).extend(state.variants)
+        groups = {k: list(dict.fromkeys(variants)) for k, variants in groups.items()}
+        all_variants = list(dict.fromkeys(v for state in states for v in state.variants))
+
+        t0 = time.perf_counter()
+        vectors = dict(zip(all_variants, await self.embed(all_variants)))
+        embed_ms = round((time.perf_counter() - t0) * 1000, 2)
+
+        arms: dict[str, Awaitable] = {
+            "dense": self.search([(variants, k) for k, variants in groups.items()], vectors),
+        }
+        bm25_idx = self.get_index() if self.get_index is not None else None
+        if bm25_idx is not None and bm25_idx.ready:
+            bm25_k = max(state.fetch_k for state in states) * 2
+            arms["bm25"] = run_cpu(bm25_idx.query_many, all_variants, top_k=bm25_k)
+
+        outcome = await gather_arms(arms, self.deadline_sec)
+
+        dense_runs: dict[tuple[int, str], list[RetrievedChunk]] = {}
+        for (fetch_k, variants), runs in zip(groups.items(), outcome.results.get("dense", [])):
+            dense_runs.update(((fetch_k, v), run) for v, run in zip(variants, runs))
+        bm25_runs = dict(zip(all_variants, outcome.results["bm25"])) if "bm25" in outcome.results else None
+
+        for state in states:
+            state.timed_out.extend(outcome.timed_out)
+            state.overlap_saved_ms = outcome.saved_ms
+            state.timings_ms[f"{self.name}.embed"] = embed_ms
+            for arm, ms in outcome.timings_ms.items():
+                state.timings_ms[f"{self.name}.{arm}"] = ms
+
+            state.chunks = fuse_vector_runs(
+                state.question,
+                [dense_runs[(state.fetch_k, v)] for v in state.variants if (state.fetch_k, v) in dense_runs],
+                top_k=state.fetch_k,
+                max_per_doc=state.per_doc_limit,
+            )
+            if bm25_runs is not None:
+                bm25_hits = fuse_bm25_runs(
+                    [bm25_runs[v][:state.fetch_k * 2] for v in state.variants],
+                    top_k=state.fetch_k * 3,
+                )
+                state.chunks = hybrid_merge(
+                    state.chunks,
+                    bm25_hits,
+                    bm25_idx,
+                    top_k=state.fetch_k,
+                    max_per_doc=state.per_doc_limit,
+                )
+
+
+@dataclass
+class RerankStage:
+    """Cross-encoder (or Cohere) rerank of the candidate pool down to top_k.
+
+    *rerank* should raise when it cannot rank; the stage then keeps the
+    retrieval order and sets ``state.rerank_failed``.
+    """
+
+    rerank: Callable[..., list[RetrievedChunk]]
+    name: str = "rerank"
+
+    async def run(self, state: RetrievalState) -> None:
+        if len(state.chunks) <= 1:
+            return
+        try:
+            # Rank the whole pool and keep it; the top_k cut is a prefix of it.
+            state.pool = await run_cpu(self.rerank, state.question, state.chunks, top_k=None)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Reranking failed, keeping retrieval order: %s", exc)
+            state.rerank_failed = True
+            return
+        state.chunks = state.pool[:state.top_k]
+
+
+@dataclass
+class PoolCacheStage:
+    """Serve the candidate pool of the wrapped stages from a :class:`RetrievalCache`.
+
+    Wraps the retrieve (and rerank) stages.  A hit restores the cached pool
+    and only redoes the top_k cut; misses run the wrapped stages — batched
+    when they support it — and store what they produced.  *signature*
+    names the retrieval settings the pool depends on.
+    """
+
+    cache: RetrievalCache
+    stages: list[Stage]
+    signature: str = ""
+    name: str = "pool_cache"
+
+    async def run(self, state: RetrievalState) -> None:
+        await self.run_many([state])
+
+    async def run_many(self, states: list[RetrievalState]) -> None:
+        misses: list[RetrievalState] = []
+        for state in states:
+            cached = self.cache.get(self._key(state))
+            if cached is None:
+                misses.append(state)
+                continue
+            pool, ranked = cached
+            state.pool_cached = True
+            if ranked:
+                state.pool = pool
+                state.chunks = pool[:state.top_k]
+            else:
+                state.chunks = pool
+        if not misses:
+            return
+
+        await _run_stages(self.stages, misses)
+        for state in misses:
+            if state.timed_out or state.rerank_failed:
+                continue  # degraded pool (arm missed the deadline / not reranked); don't keep it
+            ranked = bool(state.pool)
+            self.cache.set(
+                self._key(state), state.pool if ranked else state.chunks, ranked,
+                generation=state.corpus_generation,
+            )
+
+    def _key(self, state: RetrievalState) -> str:
+        return self.cache.make_key(state.question, state.fetch_k, state.per_doc_limit, self.signature)
+
+
+@dataclass
+class SelectStage:
+    """Pick the final top_k contexts (coverage-aware for multi-variant queries)."""
+
+    name: str = "select"
+
+    async def run(self, state: RetrievalState) -> None:
+        if len(state.variants) > 1:
+            state.chunks = select_multi_hop_contexts(state.question, state.chunks, top_k=state.top_k)
+        else:
+            state.chunks = state.chunks[:state.top_k]
+
+
+# ── Pipeline ───────────────────────────────────────────────────────────
+
+
+class RetrievalPipeline:
+    """Ordered retrieval stages with per-stage timing.
+
+    With *corpus*, each state records the corpus generation read before its
+    first stage, so results derived from it can be tagged for invalidation.
+    """
+
+    def __init__(self, stages: list[Stage], corpus: CorpusVersion | None = None) -> None:
+        self.stages = list(stages)
+        self.corpus = corpus
+
+    async def run(self, question: str, top_k: int) -> RetrievalState:
+        """Retrieve contexts for *question*; returns the final state."""
+        return (await self.run_many([(question, top_k)]))[0]
+
+    async def run_many(self, requests: list[tuple[str, int]]) -> list[RetrievalState]:
+        """Retrieve for several ``(question, top_k)`` pairs in one pass.
+
+        Returns one final state per request, in order.  Stage timings are
+        those of the shared pass.
+        """
+        generation = self.corpus.generation if self.corpus is not None else 0
+        states = [
+            RetrievalState(question=q, top_k=k, corpus_generation=generation)
+            for q, k in requests
+        ]
+        await _run_stages(self.stages, states)
+        return states
+
+
+async def _run_stages(stages: list[Stage], states: list[RetrievalState]) -> None:
+    """Run *stages* in order over the states not yet done, timing each stage."""
+    for stage in stages:
+        active = [state for state in states if not state.done]
+        if not active:
+            break
+        t0 = time.perf_counter()
+        run_many = getattr(stage, "run_many", None)
+        if run_many is not None:
+            await run_many(active)
+        else:
+            await asyncio.gather(*(stage.run(state) for state in active))
+        elapsed_ms = round((time.perf_counter() - t0) * 1000, 2)
+        for state in active:
+            state.timings_ms[stage.name] = elapsed_ms
@@ -7,14 +7,22 @@ by the confidence gate downstream).
 Feature-flagged via:
   RERANK_ENABLED=true/false
   RERANK_PROVIDER=local|cohere
+
+Local cross-encoder scores are memoised in a bounded LRU keyed by model,
+normalised question, chunk_id and a hash of the chunk text, so a repeated
+question only scores candidates it has not seen.  A re-ingested chunk with
+new text gets a new key; its old score simply ages out.
 """
 
 from __future__ import annotations
 
+import hashlib
 import logging
+import threading
+from collections import OrderedDict
 from typing import TYPE_CHECKING
 
-from app.config import COHERE_API_KEY, RERANK_MODEL, RERANK_PROVIDER
+from app.config import COHERE_API_KEY, RERANK_MODEL, RERANK_PROVIDER, RERANK_SCORE_CACHE_SIZE
 from app.db.chroma import RetrievedChunk
 
 if TYPE_CHECKING:
@@ -22,6 +30,11 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+
+class RerankError(RuntimeError):
+    """The configured reranker could not rank the chunks."""
+
+
 # ── Local cross-encoder singleton ──────────────────────────────────────
 
 _cross_encoder: CrossEncoder | None = None
@@ -39,6 +52,100 @@ def _get_cross_encoder() -> CrossEncoder:
     return _cross_encoder
 
 
+# ── Score cache ────────────────────────────────────────────────────────
+
+
+class RerankScoreCache:
+    """Thread-safe LRU of cross-encoder scores per (question, chunk) pair."""
+
+    def __init__(self, max_entries: int = 20_000) -> None:
+        self._entries: OrderedDict[str, float] = OrderedDict()
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def make_key(model: str, question: str, chunk_id: str, text: str) -> str:
+        normalised = " ".join(question.lower().split())
+        content = hashlib.sha256(text.encode()).hexdigest()
+        return hashlib.sha256(f"{model}\0{normalised}\0{chunk_id}\0{content}".encode()).hexdigest()
+
+    def get(self, key: str) -> float | None:
+        with self._lock:
+            score = self._entries.get(key)
+            if score is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return score
+
+    def set(self, key: str, score: float) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = score
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> int:
+        """Remove all entries. Returns the number removed."""
+        with self._lock:
+            n = len(self._entries)
+            self._entries.clear()
+            return n
+
+    def stats(self) -> dict:
+        """Return cache statistics."""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_entries": self._max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+
+
+_score_cache: RerankScoreCache | None = (
+    RerankScoreCache(RERANK_SCORE_CACHE_SIZE) if RERANK_SCORE_CACHE_SIZE > 0 else None
+)
+
+
+def get_rerank_score_cache() -> RerankScoreCache | None:
+    """Return the process-wide rerank score cache (``None`` when disabled)."""
+    return _score_cache
+
+
+def _cross_encoder_scores(question: str, chunks: list[RetrievedChunk]) -> list[float]:
+    """Cross-encoder score per chunk; cached pairs skip the model."""
+    cache = _score_cache
+    if cache is None:
+        return _get_cross_encoder().predict([(question, c.text) for c in chunks]).tolist()
+
+    keys = [cache.make_key(RERANK_MODEL, question, c.chunk_id, c.text) for c in chunks]
+    scores: list[float | None] = [cache.get(k) for k in keys]
+
+    # First position of every distinct unscored pair.
+    missing: dict[str, int] = {}
+    for i, (key, score) in enumerate(zip(keys, scores)):
+        if score is None and key not in missing:
+            missing[key] = i
+
+    if missing:
+        predicted = _get_cross_encoder().predict(
+            [(question, chunks[i].text) for i in missing.values()],
+        ).tolist()
+        fresh = dict(zip(missing, predicted))
+        for key, score in fresh.items():
+            cache.set(key, score)
+        scores = [fresh[k] if s is None else s for k, s in zip(keys, scores)]
+
+    return scores
+
+
 # ── Reranking implementations ──────────────────────────────────────────
 
 
@@ -51,20 +158,18 @@ def _rerank_local(
 
     Reorders chunks by cross-encoder relevance score.  The original
     ``chunk.score`` (similarity) is preserved for downstream confidence
-    gating; the cross-encoder score is **not** written back.
+    gating; the cross-encoder score is **not** written back.  Scores for
+    pairs seen before come from the score cache.
     """
     try:
-        model = _get_cross_encoder()
-        pairs = [(question, chunk.text) for chunk in chunks]
-        scores = model.predict(pairs).tolist()
-
-        # Sort by cross-encoder score (descending)
-        scored = sorted(zip(scores, chunks), key=lambda x: x[0], reverse=True)
-        result = [chunk for _, chunk in scored]
-        return result[:top_k] if top_k else result
+        scores = _cross_encoder_scores(question, chunks)
     except Exception as exc:
-        logger.warning("Local reranking failed, returning original order: %s", exc)
-        return chunks
+        raise RerankError(f"Local reranking failed: {exc}") from exc
+
+    # Sort by cross-encoder score (descending)
+    scored = sorted(zip(scores, chunks), key=lambda x: x[0], reverse=True)
+    result = [chunk for _, chunk in scored]
+    return result[:top_k] if top_k else result
 
 
 def _rerank_cohere(
@@ -74,12 +179,14 @@ def _rerank_cohere(
 ) -> list[RetrievedChunk]:
     """Rerank using Cohere Rerank API (requires ``cohere`` package)."""
     if not COHERE_API_KEY:
-        logger.warning("COHERE_API_KEY not set — skipping Cohere reranking")
-        return chunks
+        raise RerankError("COHERE_API_KEY not set — skipping Cohere reranking")
 
     try:
         import cohere  # type: ignore
+    except ImportError as exc:
+        raise RerankError("cohere package not installed — skipping Cohere reranking") from exc
 
+    try:
         client = cohere.Client(COHERE_API_KEY)
         docs = [chunk.text for chunk in chunks]
         response = client.rerank(
@@ -88,17 +195,13 @@ def _rerank_cohere(
             top_n=top_k or len(chunks),
             model="rerank-english-v3.0",
         )
-
-        reranked: list[RetrievedChunk] = []
-        for result in response.results:
-            reranked.append(chunks[result.index])
-        return reranked
-    except ImportError:
-        logger.warning("cohere package not installed — skipping Cohere reranking")
-        return chunks
     except Exception as exc:
-        logger.warning("Cohere reranking failed, returning original order: %s", exc)
-        return chunks
+        raise RerankError(f"Cohere reranking failed: {exc}") from exc
+
+    reranked: list[RetrievedChunk] = []
+    for result in response.results:
+        reranked.append(chunks[result.index])
+    return reranked
 
 
 # ── Public API ─────────────────────────────────────────────────────────
@@ -108,14 +211,23 @@ def rerank_chunks(
     question: str,
     chunks: list[RetrievedChunk],
     top_k: int | None = None,
+    strict: bool = False,
 ) -> list[RetrievedChunk]:
     """Rerank chunks using the configured provider.
 
-    Falls back gracefully to the original ordering on any error.
+    Falls back gracefully to the original ordering on any error, unless
+    *strict*, in which case :class:`RerankError` is raised so the caller
+    can tell an unranked pool from a ranked one.
     """
     if len(chunks) <= 1:
         return chunks
 
-    if RERANK_PROVIDER == "cohere" and COHERE_API_KEY:
-        return _rerank_cohere(question, chunks, top_k)
-    return _rerank_local(question, chunks, top_k)
+    try:
+        if RERANK_PROVIDER == "cohere" and COHERE_API_KEY:
+            return _rerank_cohere(question, chunks, top_k)
+        return _rerank_local(question, chunks, top_k)
+    except RerankError as exc:
+        if strict:
+            raise
+        logger.warning("%s; returning original order", exc)
+        return chunks
@@ -0,0 +1,151 @@
+"""SciPy sparse-matrix BM25 scoring backend.
+
+Stores the corpus as a CSR term × document matrix whose cells already hold
+the full BM25 weight ``idf · tf·(k1+1) / (tf + norm_d)``.  A query becomes a
+sparse row-slice sum (``q @ W``) followed by ``argpartition`` for top-k, and
+a batch of query variants is scored in one sparse matrix multiply.
+
+Selected with ``BM25_BACKEND=sparse``; requires ``numpy`` and ``scipy``.
+The postings lists of :class:`~app.retrieval.hybrid.BM25Index` remain the
+source of truth — the matrix is rebuilt from them on the first query after
+the index changes.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections import Counter
+
+import numpy as np
+from scipy import sparse
+
+from app.retrieval.bm25_snapshot import MappedPostings
+from app.retrieval.hybrid import BM25Index, _tokenize
+
+logger = logging.getLogger(__name__)
+
+
+class SparseBM25Index(BM25Index):
+    """BM25 index scored with a precomputed CSR weight matrix."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75) -> None:
+        super().__init__(k1=k1, b=b)
+        self._term_rows: dict[str, int] = {}
+        self._matrix: sparse.csr_matrix | None = None
+
+    # ── derived matrix ─────────────────────────────────────────────
+
+    def build(
+        self,
+        ids: list[str],
+        documents: list[str],
+        metadatas: list[dict],
+    ) -> int:
+        """(Re-)build postings and the CSR matrix eagerly."""
+        with self._lock:
+            n_docs = super().build(ids, documents, metadatas)
+            self._build_matrix_locked()
+        return n_docs
+
+    def _invalidate_locked(self) -> None:
+        # Rebuilt lazily from the postings on the next query, so a burst of
+        # incremental updates pays for one matrix build.
+        self._matrix = None
+
+    def _build_matrix_locked(self) -> sparse.csr_matrix:
+        n_slots = len(self._chunk_ids)
+        postings = self._postings
+        if isinstance(postings, MappedPostings) and postings.pristine:
+            # Freshly loaded snapshot: the mapped columns already are CSR.
+            term_ptr, post_slots, post_tfs = postings.flat()
+            indptr = np.frombuffer(term_ptr, dtype=np.uint64).astype(np.int64)
+            indices = np.frombuffer(post_slots, dtype=np.uint32).astype(np.int32)
+            tf = np.frombuffer(post_tfs, dtype=np.uint32).astype(np.float64)
+            term_rows = dict(zip(postings, range(len(postings))))
+        else:
+            term_rows = {}
+            lengths = np.zeros(len(postings) + 1, dtype=np.int64)
+            slot_parts, tf_parts = [], []
+            for row, (term, (doc_slots, tfs)) in enumerate(postings.items()):
+                term_rows[term] = row
+                lengths[row + 1] = len(doc_slots)
+                slot_parts.append(np.frombuffer(doc_slots, dtype=np.uint32))
+                tf_parts.append(np.frombuffer(tfs, dtype=np.uint32))
+            indptr = np.cumsum(lengths)
+            indices = np.concatenate(slot_parts or [np.empty(0, np.uint32)]).astype(np.int32)
+            tf = np.concatenate(tf_parts or [np.empty(0, np.uint32)]).astype(np.float64)
+
+        doc_lens = np.frombuffer(self._doc_lens, dtype=np.uint32).astype(np.float64)
+        norms = self._k1 * (1 - self._b + self._b * doc_lens / (self._avg_dl or 1.0))
+        # Same IDF as BM25Index._idf, vectorised over all terms.
+        df = np.diff(indptr).astype(np.float64)
+        idf = np.log((self._n_docs - df + 0.5) / (df + 0.5) + 1.0)
+        data = np.repeat(idf, np.diff(indptr)) * tf * (self._k1 + 1) / (tf + norms[indices])
+
+        self._term_rows = term_rows
+        self._matrix = sparse.csr_matrix(
+            (data, indices, indptr), shape=(len(term_rows), n_slots),
+        )
+        return self._matrix
+
+    # ── query ──────────────────────────────────────────────────────
+
+    def query(self, question: str, top_k: int = 20) -> list[tuple[str, float]]:
+        """Return top_k ``(chunk_id, bm25_score)`` pairs."""
+        return self.query_many([question], top_k=top_k)[0]
+
+    def query_many(
+        self, questions: list[str], top_k: int = 20,
+    ) -> list[list[tuple[str, float]]]:
+        """Score all *questions* with one ``Q @ W`` sparse multiply."""
+        if not self._ready or not questions:
+            return [[] for _ in questions]
+
+        with self._lock:
+            if not self._n_docs:
+                return [[] for _ in questions]
+            matrix = self._matrix
+            if matrix is None:
+                matrix = self._build_matrix_locked()
+
+            rows: list[int] = []
+            cols: list[int] = []
+            vals: list[float] = []
+            for qi, question in enumerate(questions):
+                for token, qtf in Counter(_tokenize(question)).items():
+                    term_row = self._term_rows.get(token)
+                    if term_row is None:
+                        continue
+                    rows.append(qi)
+                    cols.append(term_row)
+                    vals.append(float(qtf))
+
+            q_matrix = sparse.csr_matrix(
+                (vals, (rows, cols)), shape=(len(questions), matrix.shape[0]),
+            )
+            scores = (q_matrix @ matrix).tocsr()
+
+            results: list[list[tuple[str, float]]] = []
+            for qi in range(len(questions)):
+                lo, hi = scores.indptr[qi], scores.indptr[qi + 1]
+                results.append(
+                    self._top_k(scores.indices[lo:hi], scores.data[lo:hi], top_k),
+                )
+            return results
+
+    def _top_k(
+        self, doc_idx: np.ndarray, doc_scores: np.ndarray, top_k: int,
+    ) -> list[tuple[str, float]]:
+        positive = doc_scores > 0
+        doc_idx, doc_scores = doc_idx[positive], doc_scores[positive]
+        if top_k <= 0 or doc_idx.size == 0:
+            return []
+        if doc_idx.size > top_k:
+            part = np.argpartition(-doc_scores, top_k - 1)[:top_k]
+            doc_idx, doc_scores = doc_idx[part], doc_scores[part]
+        # Score descending, lower doc index first on ties (matches BM25Index).
+        order = np.lexsort((doc_idx, -doc_scores))
+        return [
+            (self._chunk_ids[int(doc_idx[i])], float(doc_scores[i]))
+            for i in order
+        ]
@@ -0,0 +1,81 @@
+"""Single-flight deduplication of concurrent identical work.
+
+When a popular question arrives many times at once, every copy misses the
+query cache together and would run its own embedding, retrieval and LLM
+call.  :class:`SingleFlight` lets the first caller for a key (the leader)
+compute the result while later callers with the same key (followers) wait
+on it and share its outcome — result or exception.
+
+Followers are shielded: a cancelled follower (client disconnect) does not
+cancel the leader's work.  If the leader itself is cancelled, waiting
+followers compute on their own instead of failing.  Keys are only shared
+within one event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections.abc import Awaitable, Callable, Hashable
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Coalesce concurrent async calls that share a key."""
+
+    def __init__(self) -> None:
+        self._flights: dict[Hashable, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Return ``await fn()``, shared with any in-flight call for *key*."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None or flight.get_loop() is not loop
+            if leader:
+                flight = loop.create_future()
+                self._flights[key] = flight
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if leader:
+            return await self._lead(key, flight, fn)
+        try:
+            return await asyncio.shield(flight)
+        except asyncio.CancelledError:
+            if not flight.cancelled():
+                raise          # this follower was cancelled
+        return await fn()      # the leader was cancelled; don't inherit that
+
+    async def _lead(self, key: Hashable, future: asyncio.Future, fn: Callable[[], Awaitable[T]]) -> T:
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()   # retrieved; followers re-raise it themselves
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                if self._flights.get(key) is future:
+                    del self._flights[key]
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._flights),
+            }
+
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""BM25 latency benchmark on synthetic corpora.
+
+Builds the in-repo ``BM25Index`` (or the numpy/scipy ``SparseBM25Index``)
+over generated chunks (Zipf-distributed vocabulary, ~120 tokens per chunk)
+and reports build time plus query latency percentiles for each corpus size.
+No ChromaDB or embedding model is needed.
+
+Usage:
+    python scripts/bench_bm25.py                         # 10k, 100k, 1M chunks
+    python scripts/bench_bm25.py --sizes 10000 100000    # custom sizes
+    python scripts/bench_bm25.py --queries 200 --top-k 40
+    python scripts/bench_bm25.py --backend sparse --batch 4   # CSR, 4 variants per call
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Ensure project root is on sys.path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.retrieval.hybrid import BM25Index  # noqa: E402
+
+_VOCAB_SIZE = 50_000
+_TOKENS_PER_CHUNK = 120
+
+
+def _make_vocab(size: int) -> list[str]:
+    return [f"term{i}" for i in range(size)]
+
+
+def _zipf_weights(size: int) -> list[float]:
+    return [1.0 / (rank + 1) for rank in range(size)]
+
+
+def make_corpus(
+    n_chunks: int,
+    seed: int = 13,
+) -> tuple[list[str], list[str], list[dict]]:
+    """Generate ``(ids, documents, metadatas)`` for *n_chunks* synthetic chunks."""
+    rng = random.Random(seed)
+    vocab = _make_vocab(_VOCAB_SIZE)
+    cum_weights: list[float] = []
+    total = 0.0
+    for w in _zipf_weights(_VOCAB_SIZE):
+        total += w
+        cum_weights.append(total)
+
+    ids: list[str] = []
+    documents: list[str] = []
+    metadatas: list[dict] = []
+    for i in range(n_chunks):
+        doc_id = f"bench/doc{i // 20:06d}.md"
+        chunk_id = f"{doc_id}#{i % 20:05d}"
+        tokens = rng.choices(vocab, cum_weights=cum_weights, k=_TOKENS_PER_CHUNK)
+        ids.append(chunk_id)
+        documents.append(" ".join(tokens))
+        metadatas.append({
+            "doc_id": doc_id,
+            "source_path": f"/bench/{doc_id}",
+            "content_type": "md",
+        })
+    return ids, documents, metadatas
+
+
+def make_queries(n_queries: int, seed: int = 29) -> list[str]:
+    """Mix of head, torso and tail terms, 3-6 tokens per query."""
+    rng = random.Random(seed)
+    queries: list[str] = []
+    for _ in range(n_queries):
+        n_terms = rng.randint(3, 6)
+        terms = [
+            f"term{rng.randint(0, 50)}" if rng.random() < 0.3
+            else f"term{rng.randint(50, _VOCAB_SIZE - 1)}"
+            for _ in range(n_terms)
+        ]
+        queries.append(" ".join(terms))
+    return queries
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def _make_index(backend: str) -> BM25Index:
+    if backend == "sparse":
+        from app.retrieval.sparse_bm25 import SparseBM25Index
+
+        return SparseBM25Index()
+    return BM25Index()
+
+
+def bench_size(
+    n_chunks: int,
+    queries: list[str],
+    top_k: int,
+    backend: str = "python",
+    batch: int = 1,
+) -> dict:
+    ids, documents, metadatas = make_corpus(n_chunks)
+
+    index = _make_index(backend)
+    t0 = time.perf_counter()
+    index.build(ids, documents, metadatas)
+    build_sec = time.perf_counter() - t0
+    del documents
+
+    # Each timed call scores *batch* variants, like one multi-variant request.
+    latencies_ms: list[float] = []
+    for i in range(0, len(queries), batch):
+        group = queries[i : i + batch]
+        t0 = time.perf_counter()
+        index.query_many(group, top_k=top_k)
+        latencies_ms.append((time.perf_counter() - t0) * 1000)
+
+    return {
+        "backend": backend,
+        "batch": batch,
+        "chunks": n_chunks,
+        "vocab": index.vocab_size,
+        "build_sec": round(build_sec, 2),
+        "query_ms_p50": round(statistics.median(latencies_ms), 3),
+        "query_ms_p95": round(_percentile(latencies_ms, 95), 3),
+        "query_ms_max": round(max(latencies_ms), 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="BM25 query latency benchmark")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+        help="Corpus sizes in chunks (default: 10000 100000 1000000)",
+    )
+    parser.add_argument("--queries", type=int, default=100, help="Queries per size")
+    parser.add_argument("--top-k", type=int, default=40, help="top_k per query")
+    parser.add_argument(
+        "--backend", choices=["python", "sparse"], default="python",
+        help="BM25 scoring backend (default: python)",
+    )
+    parser.add_argument(
+        "--batch", type=int, default=1,
+        help="Query variants scored per call via query_many (default: 1)",
+    )
+    parser.add_argument("--json", action="store_true", help="Print raw JSON rows")
+    args = parser.parse_args()
+
+    queries = make_queries(args.queries)
+    rows = []
+    print(f"backend={args.backend} batch={max(1, args.batch)}")
+    print(f"{'chunks':>10}  {'vocab':>7}  {'build s':>8}  {'p50 ms':>8}  {'p95 ms':>8}  {'max ms':>8}")
+    for size in args.sizes:
+        row = bench_size(size, queries, args.top_k, args.backend, max(1, args.batch))
+        rows.append(row)
+        print(
+            f"{row['chunks']:>10}  {row['vocab']:>7}  {row['build_sec']:>8.2f}  "
+            f"{row['query_ms_p50']:>8.3f}  {row['query_ms_p95']:>8.3f}  {row['query_ms_max']:>8.3f}"
+        )
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
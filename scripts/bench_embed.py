@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Per-request query embedding latency: one call per variant vs. one batch.
+
+For each question the script derives the texts a ``/query`` request embeds
+(``extract_intents`` sub-queries for multi-hop questions, otherwise the
+``expand_query_variants`` output) and times two strategies with the real
+embedding model:
+
+    per-variant   one model forward pass per text (previous behaviour)
+    batched       a single forward pass per request
+
+Both call the encoder directly: ``embed_texts`` sits behind the embedding
+LRU, which would turn every round after the first into a cache hit.
+
+Usage:
+    python scripts/bench_embed.py                  # built-in question set
+    python scripts/bench_embed.py --rounds 20
+    python scripts/bench_embed.py --json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Ensure project root is on sys.path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.ingest.embedder import _encode, get_model  # noqa: E402
+from app.retrieval.hybrid import expand_query_variants  # noqa: E402
+from app.retrieval.multihop import extract_intents  # noqa: E402
+
+QUESTIONS = [
+    "What is Amazon Bedrock?",
+    "Which runtime metrics does Bedrock publish to CloudWatch?",
+    "How do guardrails and knowledge bases work together in Bedrock?",
+    "What is the difference between provisioned throughput and on-demand pricing?",
+    "How do model access and supported regions together affect deployment planning in Bedrock?",
+    "Why are chunking settings and retrieval configuration both important for answer quality?",
+]
+
+
+def request_texts(question: str) -> list[str]:
+    """Texts embedded by one ``/query`` request for *question*."""
+    intents = extract_intents(question)
+    if intents:
+        return [question] + [intent.query for intent in intents]
+    return expand_query_variants(question)
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def _time_ms(fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t0) * 1000
+
+
+def bench(questions: list[str], rounds: int) -> list[dict]:
+    rows = []
+    for question in questions:
+        texts = request_texts(question)
+        per_variant: list[float] = []
+        batched: list[float] = []
+        for _ in range(rounds):
+            per_variant.append(_time_ms(lambda: [_encode([t])[0] for t in texts]))
+            batched.append(_time_ms(lambda: _encode(texts)))
+        rows.append({
+            "question": question,
+            "texts": len(texts),
+            "per_variant_ms_p50": round(statistics.median(per_variant), 2),
+            "per_variant_ms_p95": round(_percentile(per_variant, 95), 2),
+            "batched_ms_p50": round(statistics.median(batched), 2),
+            "batched_ms_p95": round(_percentile(batched, 95), 2),
+        })
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Query embedding batching benchmark")
+    parser.add_argument("--rounds", type=int, default=10, help="Timed rounds per question")
+    parser.add_argument("--json", action="store_true", help="Print raw JSON rows")
+    args = parser.parse_args()
+
+    get_model()
+    _encode(["warm-up"])  # first call pays one-off allocation costs
+
+    rows = bench(QUESTIONS, max(1, args.rounds))
+    print(f"{'texts':>5}  {'loop p50':>9}  {'batch p50':>9}  {'speedup':>7}  question")
+    for row in rows:
+        speedup = row["per_variant_ms_p50"] / max(row["batched_ms_p50"], 1e-9)
+        print(
+            f"{row['texts']:>5}  {row['per_variant_ms_p50']:>9.2f}  "
+            f"{row['batched_ms_p50']:>9.2f}  {speedup:>6.2f}x  {row['question'][:60]}"
+        )
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
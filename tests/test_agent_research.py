@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 
 import pytest
 from fastapi.testclient import TestClient
@@ -17,11 +17,12 @@ def _mock_stack():
 
     with (
         patch("app.ingest.embedder.get_model"),
-        patch("app.main.embed_texts", return_value=[fake_embedding]),
+        patch("app.main.embed_texts", side_effect=lambda texts: [fake_embedding] * len(texts)),
         patch("app.db.chroma.get_client"),
         patch("app.main.heartbeat", return_value=True),
         patch("app.main.check_llm_ready", return_value={"ready": False, "reason": "mocked"}),
         patch("app.main.query_cache", None),
+        patch("app.main.retrieval_cache", None),
         patch("app.main.HYBRID_ENABLED", False),
         patch("app.main.RERANK_ENABLED", False),
     ):
@@ -47,6 +48,11 @@ def _make_chunk(
     )
 
 
+def _dense_runs(chunks):
+    """``query_chunks_many`` side effect returning *chunks* for every query."""
+    return lambda embeddings, **_kwargs: [list(chunks) for _ in embeddings]
+
+
 # ── Helpers ────────────────────────────────────────────────────────────
 
 _VALID_STATUSES = {"answered", "gap", "answered_after_retry"}
@@ -64,8 +70,8 @@ def test_agent_research_returns_structured_response(client: TestClient):
     )
 
     with (
-        patch("app.main.query_chunks", return_value=chunks),
-        patch("app.main.generate_answer", return_value=gen_result),
+        patch("app.main.query_chunks_many", side_effect=_dense_runs(chunks)),
+        patch("app.main.generate_answer_async", new_callable=AsyncMock, return_value=gen_result),
     ):
         resp = client.post("/agent/research", json={
             "topic": "Amazon Bedrock",
@@ -104,8 +110,8 @@ def test_agent_research_marks_gap_on_null_answer(client: TestClient):
     null_result = GeneratedAnswer(answer=None, citations=[])
 
     with (
-        patch("app.main.query_chunks", return_value=[_make_chunk(score=0.2)]),
-        patch("app.main.generate_answer", return_value=null_result),
+        patch("app.main.query_chunks_many", side_effect=_dense_runs([_make_chunk(score=0.2)])),
+        patch("app.main.generate_answer_async", new_callable=AsyncMock, return_value=null_result),
     ):
         resp = client.post("/agent/research", json={
             "topic": "Nonexistent Feature XYZ",
@@ -143,8 +149,8 @@ def test_agent_research_citations_for_answered(client: TestClient):
     )
 
     with (
-        patch("app.main.query_chunks", return_value=chunks),
-        patch("app.main.generate_answer", return_value=gen_result),
+        patch("app.main.query_chunks_many", side_effect=_dense_runs(chunks)),
+        patch("app.main.generate_answer_async", new_callable=AsyncMock, return_value=gen_result),
     ):
         resp = client.post("/agent/research", json={
             "topic": "Amazon Bedrock",
@@ -171,8 +177,8 @@ def test_agent_research_min_subquestions(client: TestClient):
     null_result = GeneratedAnswer(answer=None, citations=[])
 
     with (
-        patch("app.main.query_chunks", return_value=[]),
-        patch("app.main.generate_answer", return_value=null_result),
+        patch("app.main.query_chunks_many", side_effect=_dense_runs([])),
+        patch("app.main.generate_answer_async", new_callable=AsyncMock, return_value=null_result),
     ):
         resp = client.post("/agent/research", json={
             "topic": "Bedrock",
@@ -192,8 +198,8 @@ def test_agent_research_final_summary_nonempty(client: TestClient):
     null_result = GeneratedAnswer(answer=None, citations=[])
 
     with (
-        patch("app.main.query_chunks", return_value=[]),
-        patch("app.main.generate_answer", return_value=null_result),
+        patch("app.main.query_chunks_many", side_effect=_dense_runs([])),
+        patch("app.main.generate_answer_async", new_callable=AsyncMock, return_value=null_result),
     ):
         resp = client.post("/agent/research", json={
             "topic": "Something Unknown",
@@ -232,8 +238,8 @@ def test_agent_retry_resolves_gap(client: TestClient):
         return good_result
 
     with (
-        patch("app.main.query_chunks", return_value=chunks),
-        patch("app.main.generate_answer", side_effect=_alternating_generate),
+        patch("app.main.query_chunks_many", side_effect=_dense_runs(chunks)),
+        patch("app.main.generate_answer_async", new_callable=AsyncMock, side_effect=_alternating_generate),
     ):
         resp = client.post("/agent/research", json={
             "topic": "Amazon Bedrock",
@@ -267,8 +273,8 @@ def test_agent_confidence_fields_bounded(client: TestClient):
     )
 
     with (
-        patch("app.main.query_chunks", return_value=chunks),
-        patch("app.main.generate_answer", return_value=gen_result),
+        patch("app.main.query_chunks_many", side_effect=_dense_runs(chunks)),
+        patch("app.main.generate_answer_async", new_callable=AsyncMock, return_value=gen_result),
     ):
         resp = client.post("/agent/research", json={
             "topic": "Amazon Bedrock",
@@ -314,8 +320,8 @@ def test_agent_possible_conflicts_shape(client: TestClient):
         return answers[(call_count["n"] - 1) % len(answers)]
 
     with (
-        patch("app.main.query_chunks", return_value=chunks),
-        patch("app.main.generate_answer", side_effect=_rotating_answer),
+        patch("app.main.query_chunks_many", side_effect=_dense_runs(chunks)),
+        patch("app.main.generate_answer_async", new_callable=AsyncMock, side_effect=_rotating_answer),
     ):
         resp = client.post("/agent/research", json={
             "topic": "Amazon Bedrock",
@@ -348,8 +354,8 @@ def test_agent_include_context_returns_contexts(client: TestClient):
     )
 
     with (
-        patch("app.main.query_chunks", return_value=chunks),
-        patch("app.main.generate_answer", return_value=gen_result),
+        patch("app.main.query_chunks_many", side_effect=_dense_runs(chunks)),
+        patch("app.main.generate_answer_async", new_callable=AsyncMock, return_value=gen_result),
     ):
         resp = client.post("/agent/research", json={
             "topic": "Amazon Bedrock",
@@ -374,3 +380,167 @@ def test_agent_include_context_returns_contexts(client: TestClient):
             assert "chunk_id" in ctx
             assert "text" in ctx
             assert "score" in ctx
+
+
+# ── Test: sub-questions run concurrently, results keep their order ─────
+
+def test_agent_subquestions_run_concurrently_in_order(client: TestClient):
+    """Sub-questions overlap (bounded by AGENT_CONCURRENCY) yet findings keep order."""
+    import asyncio
+
+    from app.generation.llm import Citation, GeneratedAnswer
+
+    chunks = [_make_chunk()]
+    state = {"in_flight": 0, "peak": 0}
+
+    async def _slow_generate(question, contexts):
+        state["in_flight"] += 1
+        state["peak"] = max(state["peak"], state["in_flight"])
+        # Later sub-questions finish first, so completion order ≠ input order.
+        await asyncio.sleep(0.05 * (6 - len(question) % 5))
+        state["in_flight"] -= 1
+        return GeneratedAnswer(
+            answer=f"Answer to {question} [Chunk 1].",
+            citations=[Citation(doc_id=chunks[0].doc_id, chunk_id=chunks[0].chunk_id)],
+        )
+
+    with (
+        patch("app.main.query_chunks_many", side_effect=_dense_runs(chunks)),
+        patch("app.main.generate_answer_async", side_effect=_slow_generate),
+        patch("app.agent.research.AGENT_CONCURRENCY", 3),
+    ):
+        resp = client.post("/agent/research", json={
+            "topic": "Amazon Bedrock",
+            "max_subquestions": 5,
+        })
+
+    assert resp.status_code == 200
+    data = resp.json()
+    assert state["peak"] == 3
+    assert [f["subquestion"] for f in data["findings"]] == data["subquestions"]
+    for f in data["findings"]:
+        assert f["answer"] == f"Answer to {f['subquestion']} [Chunk 1]."
+
+
+def test_agent_retrieval_runs_as_one_batch(client: TestClient):
+    """All sub-questions share one embedding batch and one dense lookup per pool size."""
+    from app.generation.llm import Citation, GeneratedAnswer
+
+    chunks = [_make_chunk()]
+    fake_embedding = [0.1] * 384
+    answer = GeneratedAnswer(
+        answer="Bedrock is managed [Chunk 1].",
+        citations=[Citation(doc_id=chunks[0].doc_id, chunk_id=chunks[0].chunk_id)],
+    )
+
+    with (
+        patch("app.main.embed_texts", side_effect=lambda texts: [fake_embedding] * len(texts)) as embed,
+        patch("app.main.query_chunks_many", side_effect=_dense_runs(chunks)) as dense,
+        patch("app.main.generate_answer_async", new_callable=AsyncMock, return_value=answer) as generate,
+    ):
+        resp = client.post("/agent/research", json={
+            "topic": "Amazon Bedrock",
+            "max_subquestions": 5,
+        })
+
+    assert resp.status_code == 200
+    data = resp.json()
+    assert len(data["subquestions"]) == 5
+    assert embed.call_count == 1
+    # Single-variant and multi-variant questions fetch different pool sizes.
+    assert dense.call_count <= 2
+    assert generate.await_count == 5
+    assert all(f["status"] == "answered" for f in data["findings"])
+
+
+def test_rate_limiter_spaces_requests_across_threads():
+    import threading
+    import time
+
+    from app.generation.ratelimit import RateLimiter
+
+    limiter = RateLimiter(rate_per_sec=50, burst=2)
+    stamps: list[float] = []
+    lock = threading.Lock()
+
+    def _call():
+        limiter.acquire()
+        with lock:
+            stamps.append(time.monotonic())
+
+    t0 = time.monotonic()
+    threads = [threading.Thread(target=_call) for _ in range(7)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # 2 burst tokens, then 5 more at 50/s → at least ~0.1 s in total.
+    assert max(stamps) - t0 >= 0.09
+    assert limiter.stats()["throttled"] == 5
+
+
+def test_agent_closes_the_llm_client_of_its_loop():
+    """Each agent batch runs its own loop; that loop's AsyncOpenAI client is closed with it."""
+    from unittest.mock import MagicMock
+
+    from app.agent import research
+    from app.generation import llm
+
+    created: list[MagicMock] = []
+
+    def make_client(**_kwargs):
+        client = MagicMock()
+        client.close = AsyncMock()
+        created.append(client)
+        return client
+
+    async def fake_query_many(bodies, concurrency):
+        llm._get_async_client()   # what generate_answer_async does per answer
+        llm._get_async_client()
+        return [RuntimeError("skip")] * len(bodies)
+
+    with (
+        patch("openai.AsyncOpenAI", side_effect=make_client),
+        patch("app.main.query_many", side_effect=fake_query_many),
+    ):
+        research._query_rag_many(["What is Bedrock?"])
+        research._query_rag_many(["What are quotas?"])
+
+    assert len(created) == 2
+    assert all(c.close.await_count == 1 for c in created)
+    assert len(llm._async_clients) == 0
+
+
+def test_agent_closes_the_chroma_pool_of_its_loop():
+    """The async Chroma client's per-loop HTTP pool is closed with the agent's loop."""
+    import asyncio
+    from unittest.mock import MagicMock
+
+    from chromadb.api.async_fastapi import AsyncFastAPI
+
+    from app.agent import research
+
+    created: list[MagicMock] = []
+    other_loop = MagicMock()   # a pool of the app's own loop must survive
+
+    async def fake_query_many(bodies, concurrency):
+        pool = MagicMock()
+        pool.aclose = AsyncMock()
+        created.append(pool)
+        AsyncFastAPI._clients[hash(asyncio.get_running_loop())] = pool  # what _get_client does
+        return [RuntimeError("skip")] * len(bodies)
+
+    with (
+        patch("app.db.chroma._async_client", MagicMock()),
+        patch.dict(AsyncFastAPI._clients, {-1: other_loop}),
+        patch("app.main.query_many", side_effect=fake_query_many),
+    ):
+        research._query_rag_many(["What is Bedrock?"])
+        research._query_rag_many(["What are quotas?"])
+        remaining = dict(AsyncFastAPI._clients)
+
+    assert len(created) == 2
+    assert all(pool.aclose.await_count == 1 for pool in created)
+    assert remaining == {-1: other_loop}
+